@@ -1,11 +1,13 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 import logging
-from config import UPLOAD_FOLDER, MAX_CONTENT_LENGTH
+import os
+import threading
+from config import UPLOAD_FOLDER, MAX_CONTENT_LENGTH, UPLOAD_SWEEP_AGE, UPLOAD_SWEEP_INTERVAL, DOCUMENTS_FOLDER, DOCUMENT_RETENTION, LOG_LEVEL
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['ETag', 'Server-Timing', 'Retry-After'])  # Enable CORS for all routes
 
 # Configuration
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -14,8 +16,10 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 # Ensure upload folder exists
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 
+DOCUMENTS_FOLDER.mkdir(exist_ok=True)
+
 # Logging setup
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 logger = logging.getLogger(__name__)
 
 # Import and register blueprints after app initialization to avoid circular imports
@@ -25,19 +29,65 @@ def register_blueprints():
         from .routes.font_routes import font_bp
         from .routes.ocr_routes import ocr_bp
         from .routes.upload_routes import upload_bp
+        from .routes.cache_routes import cache_bp
+        from .routes.job_routes import job_bp
+        from .routes.metrics_routes import metrics_bp
     except ImportError:
         # Fall back to absolute imports (when run directly)
         from routes.font_routes import font_bp
         from routes.ocr_routes import ocr_bp
         from routes.upload_routes import upload_bp
+        from routes.cache_routes import cache_bp
+        from routes.job_routes import job_bp
+        from routes.metrics_routes import metrics_bp
 
     app.register_blueprint(font_bp)
     app.register_blueprint(ocr_bp)
     app.register_blueprint(upload_bp)
+    app.register_blueprint(cache_bp)
+    app.register_blueprint(job_bp)
+    app.register_blueprint(metrics_bp)
 
 # Register blueprints
 register_blueprints()
 
+# Background threads run in each serving process. Threads do not survive
+# fork, so a pre-fork server starts them in every worker (see gunicorn.conf.py)
+# rather than in the process that imported the app.
+_background_pid = None
+_background_lock = threading.Lock()
+
+def start_background_tasks():
+    """Start the upload sweepers and the metrics writer and resume queued jobs, once per process"""
+    global _background_pid
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+
+    try:
+        from .services.file_service import start_upload_sweeper
+        from .services.metrics_service import start_snapshot_writer
+        from .controllers.job_controller import recover_jobs
+    except ImportError:
+        from services.file_service import start_upload_sweeper
+        from services.metrics_service import start_snapshot_writer
+        from controllers.job_controller import recover_jobs
+
+    # Periodically remove uploads left behind by crashed requests, and stored documents no longer in use
+    start_upload_sweeper(UPLOAD_FOLDER, UPLOAD_SWEEP_AGE, UPLOAD_SWEEP_INTERVAL)
+    start_upload_sweeper(DOCUMENTS_FOLDER, DOCUMENT_RETENTION, UPLOAD_SWEEP_INTERVAL)
+    # Share this process's metrics with the others serving /metrics
+    start_snapshot_writer()
+    # Pick up jobs left over from a previous run and expire finished ones
+    recover_jobs()
+
+@app.before_request
+def ensure_background_tasks():
+    # For servers that fork without calling start_background_tasks()
+    if _background_pid != os.getpid():
+        start_background_tasks()
+
 @app.route('/')
 def home():
     return jsonify({
@@ -45,15 +95,51 @@ def home():
         'endpoints': {
             '/api/upload': 'POST - Upload PDF for font analysis',
             '/api/fonts/basic': 'POST - Basic font analysis using pdfminer',
+            '/api/fonts/list': 'POST - Every font and the pages using it, from page resources without layout',
             '/api/fonts/advanced': 'POST - Advanced font analysis using pdfminer and pdfplumber',
             '/api/fonts/ocr': 'POST - OCR text extraction from PDF images',
-            '/api/health': 'GET - Health check'
+            '/api/fonts/batch': 'POST - Font analysis of several PDFs or ZIP archives with a corpus rollup',
+            '/api/fonts/text': 'POST - Store a PDF and return its font-annotated text from the first page',
+            '/api/fonts/text/<document_id>': 'GET - Next window of font-annotated text, by cursor',
+            '/api/fonts/regions': 'POST - Store a PDF and index its text runs for region queries',
+            '/api/fonts/regions/<document_id>': 'GET - Fonts and text runs at a point or within a rectangle of a page',
+            '/api/fonts/programs': 'GET - Embedded font programs found in the most analyzed documents',
+            '/api/fonts/programs/<hash>': 'GET - One embedded font program and the documents using it',
+            '/api/fonts/advanced/stream': 'POST - Advanced font analysis as NDJSON, one record per page',
+            '/api/fonts/ocr/stream': 'POST - OCR text extraction as NDJSON, one record per page',
+            '/api/jobs': 'POST - Queue an analysis (kind plus file) and return a job id',
+            '/api/jobs/<job_id>': 'GET - Job status and per-page progress',
+            '/api/jobs/<job_id>/result': 'GET - Output of a completed job',
+            '/api/cache/stats': 'GET - Result cache hit/miss counters',
+            '/api/health': 'GET - Health check',
+            '/metrics': 'GET - Stage timings and request metrics in the Prometheus text format'
         }
     })
 
+@app.errorhandler(413)
+def request_too_large(error):
+    # Uploads over MAX_CONTENT_LENGTH are rejected before reaching a route
+    return jsonify({
+        'error': f'Upload too large; the limit is {MAX_CONTENT_LENGTH // (1024 * 1024)}MB (MAX_CONTENT_LENGTH)'
+    }), 413
+
+try:
+    from .services.admission_service import AdmissionRejected
+except ImportError:
+    from services.admission_service import AdmissionRejected
+
+@app.errorhandler(AdmissionRejected)
+def server_busy(error):
+    # Raised by the admission gates in front of the expensive analyses
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'})
 
 if __name__ == '__main__':
+    start_background_tasks()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
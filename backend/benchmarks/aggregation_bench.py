@@ -0,0 +1,93 @@
+"""
+Aggregation micro-benchmark
+Compares the dict-keyed aggregation against the previous linear duplicate scan
+
+Run from the backend directory:
+    python -m benchmarks.aggregation_bench
+"""
+import random
+import time
+from collections import defaultdict
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.aggregation_service import aggregate_page_fonts, new_font_usage_stats
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.aggregation_service import aggregate_page_fonts, new_font_usage_stats
+
+FONT_NAMES = ['Helvetica', 'Times-Roman', 'Courier', 'ABCDEF+Arial-BoldMT']
+FONT_SIZES = [8.0, 9.5, 10.0, 12.0, 14.0]
+COLORS = [(0,), (0, 0, 0), (1, 0, 0), [0.2, 0.2, 0.2, 1]]
+
+
+def make_chars(count, seed=0):
+    """Generate `count` pdfplumber-like character dicts with varied positions"""
+    rnd = random.Random(seed)
+    return [
+        {
+            'fontname': rnd.choice(FONT_NAMES),
+            'size': rnd.choice(FONT_SIZES),
+            'non_stroke_color': rnd.choice(COLORS),
+            'x0': rnd.uniform(0, 612),
+            'top': rnd.uniform(0, 792)
+        }
+        for _ in range(count)
+    ]
+
+
+def linear_scan_aggregate(chars, page_number):
+    """Previous implementation: list membership test for every character"""
+    font_usage_stats = defaultdict(lambda: {'count': 0, 'pages': set()})
+    page_fonts = []
+
+    for char in chars:
+        font_name = char.get('fontname', 'Unknown')
+        font_size = round(char.get('size', 0), 2)
+        font_color = char.get('non_stroke_color', 'Unknown')
+
+        font_key = f"{font_name}_{font_size}"
+        font_usage_stats[font_key]['count'] += 1
+        font_usage_stats[font_key]['pages'].add(page_number)
+
+        page_font_info = {
+            'name': font_name,
+            'size': font_size,
+            'color': font_color,
+            'x': round(char.get('x0', 0), 2),
+            'y': round(char.get('top', 0), 2)
+        }
+
+        if page_font_info not in page_fonts:
+            page_fonts.append(page_font_info)
+
+    return page_fonts
+
+
+def time_call(func, *args, repeat=3):
+    """Best wall time of `repeat` calls"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes=(250, 500, 1000, 2000, 4000)):
+    print(f"{'chars':>8} {'linear scan (ms)':>18} {'hashed (ms)':>12} {'speedup':>8}")
+    for count in sizes:
+        chars = make_chars(count)
+
+        expected = linear_scan_aggregate(chars, 1)
+        actual = aggregate_page_fonts(chars, 1, new_font_usage_stats())
+        assert actual == expected, 'aggregation output differs from the linear scan'
+
+        linear = time_call(linear_scan_aggregate, chars, 1)
+        hashed = time_call(lambda c: aggregate_page_fonts(c, 1, new_font_usage_stats()), chars)
+        print(f"{count:>8} {linear * 1000:>18.1f} {hashed * 1000:>12.2f} {linear / hashed:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Analysis benchmark suite
+Times the font and OCR service functions on a synthetic corpus and compares runs
+
+Run from the backend directory:
+    python -m benchmarks.suite run --output benchmarks/baseline.json
+    python -m benchmarks.suite run --output current.json
+    python -m benchmarks.suite compare benchmarks/baseline.json current.json
+
+`compare` exits with status 1 when a benchmark got slower or used more memory
+than the thresholds allow, so it can gate a CI job.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.synthetic_pdf_service import write_pdf
+    from ..services.font_service import (
+        extract_fonts_basic, extract_fonts_from_pdf, extract_fonts_advanced, extract_text_with_fonts
+    )
+    from ..services.ocr_service import (
+        extract_text_from_images_ocr_simple, extract_text_from_images_ocr, extract_text_selective_ocr, ocr_available
+    )
+    from ..config import PARALLEL_WORKERS, PARALLEL_PAGE_THRESHOLD, OCR_WORKERS
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.synthetic_pdf_service import write_pdf
+    from services.font_service import (
+        extract_fonts_basic, extract_fonts_from_pdf, extract_fonts_advanced, extract_text_with_fonts
+    )
+    from services.ocr_service import (
+        extract_text_from_images_ocr_simple, extract_text_from_images_ocr, extract_text_selective_ocr, ocr_available
+    )
+    from config import PARALLEL_WORKERS, PARALLEL_PAGE_THRESHOLD, OCR_WORKERS
+
+# Synthetic documents: build_pdf() arguments
+CORPUS = {
+    'text-10p': {'pages': 10, 'chars_per_page': 1500},
+    'text-100p': {'pages': 100, 'chars_per_page': 1000},
+    'dense-10p': {'pages': 10, 'chars_per_page': 6000, 'fonts': 8},
+    'unshared-fonts-100p': {'pages': 100, 'chars_per_page': 500, 'fonts': 12, 'shared_resources': False},
+    'scanned-5p': {'pages': 5, 'chars_per_page': 0, 'images_per_page': 1, 'image_size': (600, 800)},
+    'logos-10p': {'pages': 10, 'chars_per_page': 800, 'images_per_page': 2, 'image_size': (160, 120)}
+}
+
+FONT_DOCUMENTS = ['text-10p', 'text-100p', 'dense-10p', 'unshared-fonts-100p', 'logos-10p']
+OCR_DOCUMENTS = ['scanned-5p', 'logos-10p']
+
+# Benchmarked functions and the documents each one runs on
+BENCHMARKS = {
+    'extract_fonts_basic': (extract_fonts_basic, FONT_DOCUMENTS),
+    'extract_fonts_from_pdf': (extract_fonts_from_pdf, FONT_DOCUMENTS),
+    'extract_fonts_advanced': (extract_fonts_advanced, FONT_DOCUMENTS),
+    'extract_text_with_fonts': (extract_text_with_fonts, FONT_DOCUMENTS),
+    'extract_text_from_images_ocr_simple': (extract_text_from_images_ocr_simple, OCR_DOCUMENTS),
+    'extract_text_from_images_ocr': (extract_text_from_images_ocr, OCR_DOCUMENTS),
+    'extract_text_selective_ocr': (extract_text_selective_ocr, OCR_DOCUMENTS)
+}
+OCR_BENCHMARKS = {
+    'extract_text_from_images_ocr_simple', 'extract_text_from_images_ocr', 'extract_text_selective_ocr'
+}
+
+# Differences below these floors are treated as noise by `compare`
+MIN_TIME_DELTA = 0.005  # seconds
+MIN_MEMORY_DELTA = 256 * 1024  # bytes
+
+
+def environment():
+    """Machine and configuration details recorded with each run"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parallel_workers': PARALLEL_WORKERS,
+        'parallel_page_threshold': PARALLEL_PAGE_THRESHOLD,
+        'ocr_workers': OCR_WORKERS,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }
+
+
+def measure(func, pdf_path, repeat):
+    """
+    Wall time of `repeat` calls and the peak Python heap of one more traced call
+
+    Timing and tracing are separate because tracemalloc slows allocation-heavy
+    code down considerably. Memory held by pool worker processes and by C
+    libraries (e.g. PIL image buffers) is not included in the peak. Warnings
+    the services print are discarded.
+    """
+    times = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(pdf_path)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            func(pdf_path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'wall_seconds': round(min(times), 4),
+        'wall_seconds_median': round(statistics.median(times), 4),
+        'peak_memory_bytes': peak,
+        'repeat': repeat
+    }
+
+
+def run(output, repeat=3, only=None):
+    """Run the suite and write the results to `output`"""
+    skip_ocr = not (ocr_available() and shutil.which('tesseract'))
+    if skip_ocr:
+        print('Skipping OCR benchmarks: pytesseract, PIL or the tesseract binary is missing')
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='pdf-bench-') as corpus_dir:
+        paths = {
+            name: write_pdf(os.path.join(corpus_dir, f'{name}.pdf'), **spec)
+            for name, spec in CORPUS.items()
+        }
+
+        for function_name, (func, documents) in BENCHMARKS.items():
+            if skip_ocr and function_name in OCR_BENCHMARKS:
+                continue
+            for document in documents:
+                name = f'{function_name}[{document}]'
+                if only and only not in name:
+                    continue
+
+                results[name] = measure(func, paths[document], repeat)
+                print(f"{name:<60} {results[name]['wall_seconds']:>9.3f}s "
+                      f"{results[name]['peak_memory_bytes'] / 1024 / 1024:>9.1f}MB", flush=True)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'corpus': CORPUS, 'results': results}, f, indent=2, sort_keys=True)
+    print(f'Wrote {len(results)} results to {output}')
+
+
+def compare(baseline_path, current_path, time_threshold=0.15, memory_threshold=0.15):
+    """
+    Print each benchmark's change against the baseline
+
+    Returns the names of benchmarks whose wall time or peak memory grew by
+    more than the threshold fraction (and more than the noise floor).
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)
+
+    if baseline['environment'].get('platform') != current['environment'].get('platform'):
+        print('Warning: the runs are from different platforms; timings may not be comparable')
+
+    regressions = []
+    print(f"{'benchmark':<60} {'time':>9} {'change':>8} {'memory':>9} {'change':>8}")
+    for name, result in sorted(current['results'].items()):
+        previous = baseline['results'].get(name)
+        if previous is None:
+            print(f"{name:<60} {result['wall_seconds']:>8.3f}s {'new':>8}")
+            continue
+
+        time_delta = result['wall_seconds'] - previous['wall_seconds']
+        memory_delta = result['peak_memory_bytes'] - previous['peak_memory_bytes']
+        time_change = time_delta / previous['wall_seconds'] if previous['wall_seconds'] else 0.0
+        memory_change = memory_delta / previous['peak_memory_bytes'] if previous['peak_memory_bytes'] else 0.0
+
+        slower = time_change > time_threshold and time_delta > MIN_TIME_DELTA
+        larger = memory_change > memory_threshold and memory_delta > MIN_MEMORY_DELTA
+        flag = '  REGRESSION' if slower or larger else ''
+        if flag:
+            regressions.append(name)
+
+        print(f"{name:<60} {result['wall_seconds']:>8.3f}s {time_change:>+8.1%} "
+              f"{result['peak_memory_bytes'] / 1024 / 1024:>7.1f}MB {memory_change:>+8.1%}{flag}")
+
+    for name in sorted(set(baseline['results']) - set(current['results'])):
+        print(f"{name:<60} {'missing':>9}")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the PDF analysis services')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite and write a JSON result file')
+    run_parser.add_argument('--output', default='benchmarks/baseline.json')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--only', help='only run benchmarks whose name contains this text')
+
+    compare_parser = commands.add_parser('compare', help='compare a result file against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--time-threshold', type=float, default=0.15)
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.15)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args.output, args.repeat, args.only)
+        return 0
+
+    regressions = compare(args.baseline, args.current, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+        return 1
+    print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Synthetic PDF generator
+Writes deterministic test documents for the benchmark suite without any PDF library
+
+The generator itself is services/synthetic_pdf_service.py. Run from the
+backend directory to write a single document:
+    python -m benchmarks.synthetic_pdf out.pdf --pages 100 --chars-per-page 2000
+"""
+import argparse
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.synthetic_pdf_service import build_pdf, write_pdf
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.synthetic_pdf_service import build_pdf, write_pdf
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic PDF')
+    parser.add_argument('path')
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--chars-per-page', type=int, default=1500)
+    parser.add_argument('--fonts', type=int, default=4)
+    parser.add_argument('--unshared-resources', action='store_true')
+    parser.add_argument('--images-per-page', type=int, default=0)
+    parser.add_argument('--unshared-images', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_pdf(
+        args.path, pages=args.pages, chars_per_page=args.chars_per_page, fonts=args.fonts,
+        shared_resources=not args.unshared_resources, images_per_page=args.images_per_page,
+        shared_images=not args.unshared_images, seed=args.seed
+    )
+
+
+if __name__ == '__main__':
+    main()
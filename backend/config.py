@@ -6,8 +6,11 @@ BASE_DIR = Path(__file__).resolve().parent
 
 # Upload configuration
 UPLOAD_FOLDER = BASE_DIR / 'uploads'
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))  # 16MB; uploads are spooled to disk
 ALLOWED_EXTENSIONS = {'pdf'}
+UPLOAD_MMAP_THRESHOLD = int(os.getenv('UPLOAD_MMAP_THRESHOLD', str(8 * 1024 * 1024)))  # memory-map spooled uploads from 8MB
+UPLOAD_SWEEP_AGE = int(os.getenv('UPLOAD_SWEEP_AGE', '3600'))  # seconds before a leftover upload is removed
+UPLOAD_SWEEP_INTERVAL = int(os.getenv('UPLOAD_SWEEP_INTERVAL', '600'))
 
 # Ensure upload directory exists
 UPLOAD_FOLDER.mkdir(exist_ok=True)
@@ -18,4 +21,83 @@ DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-LOG_FILE = BASE_DIR / 'app.log'
\ No newline at end of file
+LOG_FILE = BASE_DIR / 'app.log'
+
+# Result cache configuration
+CACHE_FOLDER = UPLOAD_FOLDER.parent / 'cache'
+CACHE_MEMORY_ENTRIES = int(os.getenv('CACHE_MEMORY_ENTRIES', '64'))
+CACHE_DISK_MAX_BYTES = int(os.getenv('CACHE_DISK_MAX_BYTES', str(256 * 1024 * 1024)))  # 256MB
+
+# Page-parallel analysis configuration
+PARALLEL_WORKERS = int(os.getenv('PARALLEL_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_PAGE_THRESHOLD = int(os.getenv('PARALLEL_PAGE_THRESHOLD', '50'))  # stay serial below this many pages
+
+# Memory growth one analysis may cause in its process before it is stopped; 0 disables the check
+REQUEST_MEMORY_BUDGET = int(os.getenv('REQUEST_MEMORY_BUDGET', str(1024 * 1024 * 1024)))  # 1GB
+
+# Font identification configuration (see services/fingerprint_service.py)
+FONT_INDEX_FOLDER = Path(os.getenv('FONT_INDEX_FOLDER', str(BASE_DIR / 'font_index')))
+FONT_MATCH_MAX_DISTANCE = float(os.getenv('FONT_MATCH_MAX_DISTANCE', '0.02'))  # RMS width difference in em units
+
+# Embedded font program store, shared by all analyses and server processes
+FONT_STORE_FOLDER = UPLOAD_FOLDER.parent / 'font_store'
+FONT_STORE_DATABASE = FONT_STORE_FOLDER / 'programs.db'
+
+# Background job configuration
+JOBS_FOLDER = UPLOAD_FOLDER.parent / 'jobs'
+JOB_DATABASE = JOBS_FOLDER / 'jobs.db'
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '86400'))  # seconds a finished job and its result are kept
+
+# Stored documents, reused by id across paginated requests
+DOCUMENTS_FOLDER = UPLOAD_FOLDER.parent / 'documents'
+DOCUMENT_RETENTION = int(os.getenv('DOCUMENT_RETENTION', '86400'))  # seconds since last use before a document is removed
+
+# Paginated text configuration
+TEXT_DEFAULT_CHARS = int(os.getenv('TEXT_DEFAULT_CHARS', '10000'))  # characters per response unless `limit` is given
+TEXT_MAX_CHARS = int(os.getenv('TEXT_MAX_CHARS', '100000'))
+TEXT_MAX_PAGES = int(os.getenv('TEXT_MAX_PAGES', '50'))  # pages opened per response
+
+# Region query configuration
+REGION_GRID_CELL = float(os.getenv('REGION_GRID_CELL', '32'))  # grid cell size of the region index, in points
+REGION_INDEX_DOCUMENTS = int(os.getenv('REGION_INDEX_DOCUMENTS', '32'))  # documents whose region index is kept in memory
+
+# Response encoding configuration
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv('RESPONSE_GZIP_MIN_BYTES', '1024'))  # smaller bodies are sent uncompressed
+RESPONSE_GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', '6'))
+
+# Metrics configuration
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'  # stage timings, /metrics and Server-Timing
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '10'))  # slower requests log their stage timings
+# Snapshots through which the server processes share their metrics (see services/metrics_service.py)
+METRICS_FOLDER = UPLOAD_FOLDER.parent / 'metrics'
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # seconds between snapshots of a process
+
+# Production server configuration (see wsgi.py and gunicorn.conf.py)
+WARM_UP = os.getenv('WARM_UP', 'True').lower() == 'true'  # run each analysis once before serving
+
+# Page limits of the advanced and OCR analyses (see services/deadline_service.py); 0 disables a limit
+PAGE_MAX_CHARS = int(os.getenv('PAGE_MAX_CHARS', '100000'))  # characters laid out per page
+PAGE_MAX_SECONDS = float(os.getenv('PAGE_MAX_SECONDS', '60'))  # seconds spent laying out or OCRing one page
+
+# Admission control configuration (see services/admission_service.py)
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+# Request threads the gates may hold, running or queued; by default one gunicorn thread is kept free
+ADMISSION_MAX_REQUESTS = int(os.getenv('ADMISSION_MAX_REQUESTS', str(max(1, int(os.getenv('GUNICORN_THREADS', '4')) - 1))))
+ADMISSION_QUEUE_DEPTH = int(os.getenv('ADMISSION_QUEUE_DEPTH', '4'))  # requests waiting per gate before rejecting outright
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5'))  # seconds a request may wait before a 503
+ADMISSION_LAYOUT_CONCURRENCY = int(os.getenv('ADMISSION_LAYOUT_CONCURRENCY', '2'))  # upload (detailed), advanced, text and region analyses
+ADMISSION_LAYOUT_PAGES = int(os.getenv('ADMISSION_LAYOUT_PAGES', '2000'))  # pages laid out at once
+ADMISSION_OCR_CONCURRENCY = int(os.getenv('ADMISSION_OCR_CONCURRENCY', '1'))
+ADMISSION_OCR_PAGES = int(os.getenv('ADMISSION_OCR_PAGES', '100'))  # pages rendered and recognized at once
+ADMISSION_BATCH_CONCURRENCY = int(os.getenv('ADMISSION_BATCH_CONCURRENCY', '1'))
+
+# Batch analysis configuration
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '1000'))  # PDFs per batch request, archive members included
+BATCH_MAX_MEMBER_BYTES = int(os.getenv('BATCH_MAX_MEMBER_BYTES', str(100 * 1024 * 1024)))  # uncompressed size of one archive member
+
+# OCR configuration
+OCR_DPI = int(os.getenv('OCR_DPI', '300'))
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 1)))
+OCR_MIN_TEXT_CHARS = int(os.getenv('OCR_MIN_TEXT_CHARS', '20'))  # pages with fewer chars count as scanned
+OCR_IMAGE_COVERAGE = float(os.getenv('OCR_IMAGE_COVERAGE', '0.5'))  # pages with more image area count as image-heavy
@@ -0,0 +1,234 @@
+"""
+Shared analysis controller module
+Runs an analysis through the result cache and handles conditional requests
+"""
+import json
+import logging
+import weakref
+from contextlib import ExitStack
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.cache_service import result_cache, file_digest, cache_key, key_from_etag
+    from ..services.metrics_service import timed_stage
+    from ..services.memory_service import memory_budget, MemoryBudgetExceeded
+    from ..services.admission_service import admit, admitted, AdmissionRejected
+    from ..services.deadline_service import parse_deadline, deadline_from_now, deadline_at, depends_on_timing
+    from ..services.file_service import allowed_file, open_upload_buffer
+    from ..services.page_selection_service import (
+        parse_page_selection, document_page_count, select_pages, page_selection_summary
+    )
+    from ..config import UPLOAD_FOLDER
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.cache_service import result_cache, file_digest, cache_key, key_from_etag
+    from services.metrics_service import timed_stage
+    from services.memory_service import memory_budget, MemoryBudgetExceeded
+    from services.admission_service import admit, admitted, AdmissionRejected
+    from services.deadline_service import parse_deadline, deadline_from_now, deadline_at, depends_on_timing
+    from services.file_service import allowed_file, open_upload_buffer
+    from services.page_selection_service import (
+        parse_page_selection, document_page_count, select_pages, page_selection_summary
+    )
+    from config import UPLOAD_FOLDER
+
+logger = logging.getLogger(__name__)
+
+
+def _etag_header(key):
+    return {'ETag': f'"{key}"'}
+
+
+def _matching_cached_tag(kind, if_none_match):
+    """Return the first If-None-Match tag that names a cached result of this kind"""
+    if not if_none_match:
+        return None
+    for tag in if_none_match:
+        if tag.startswith(f"{kind}-") and result_cache.contains(key_from_etag(tag)):
+            return tag
+    return None
+
+
+def _matching_tag(key, if_none_match):
+    """Return the If-None-Match tag naming `key` in any encoding, or None"""
+    if not if_none_match:
+        return None
+    for tag in if_none_match:
+        if key_from_etag(tag) == key:
+            return tag
+    return None
+
+
+def _resolve_page_selection(pdf_source, selection):
+    """Page numbers and response summary of a parsed selection for one document"""
+    page_count = document_page_count(pdf_source)
+    pages = select_pages(selection, page_count)
+    return pages, page_selection_summary(pages, page_count)
+
+
+def run_cached_analysis(file, kind, analyze, result_field, error_message, params=None, if_none_match=None,
+                        pages=None, sample=None, deadline_ms=None, on_analyzed=None):
+    """
+    Run `analyze(pdf_source)` for an upload, serving repeated uploads from the cache
+
+    The analysis reads the spooled upload directly; see open_upload_buffer.
+    With a `pages` range list or a `sample` size, it is called as
+    `analyze(pdf_source, pages=page_numbers)` and the response carries a
+    `page_selection` summary noting whether the result is partial. A fresh
+    (not cached) analysis is passed to `on_analyzed(digest, filename, analysis)`.
+
+    With `deadline_ms`, the analysis runs under that deadline counted from
+    now (see deadline_service) and may return a partial result. A result
+    whose coverage was limited by time is neither cached nor tagged, since
+    another run could get further; a cached result is served whatever the
+    deadline.
+
+    Returns (result, status_code, headers). The ETag is the cache key; see
+    negotiated_response for the suffix each encoding adds. A request whose
+    If-None-Match names a cached result of this kind, in any encoding, gets a
+    304 (echoing that tag) without the file being needed, and
+    one whose analysis outgrows REQUEST_MEMORY_BUDGET gets a 413. Only a cache
+    miss goes through admission control; AdmissionRejected is left to the app's
+    503 handler.
+    """
+    try:
+        selection = parse_page_selection(pages, sample)
+    except ValueError as e:
+        return {'error': f'Invalid page selection: {e}'}, 400, {}
+    if selection is not None:
+        params = dict(params or {}, page_selection=selection)
+
+    try:
+        stop_at = deadline_from_now(parse_deadline(deadline_ms))
+    except ValueError as e:
+        return {'error': f'Invalid deadline: {e}'}, 400, {}
+
+    if file is None:
+        tag = _matching_cached_tag(kind, if_none_match)
+        if tag:
+            return {}, 304, _etag_header(tag)
+        return {'error': 'No PDF file provided'}, 400, {}
+
+    if not allowed_file(file.filename):
+        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400, {}
+
+    with timed_stage('hash'):
+        digest = file_digest(file)
+        key = cache_key(digest, kind, params)
+    tag = _matching_tag(key, if_none_match)
+    if tag and result_cache.contains(key):
+        return {}, 304, _etag_header(tag)
+
+    # Selections are cached together with their summary
+    with timed_stage('cache'):
+        cached = result_cache.get(key)
+    if cached is None:
+        try:
+            with deadline_at(stop_at), memory_budget(), open_upload_buffer(file, UPLOAD_FOLDER) as pdf_source, \
+                    admitted(kind, pdf_source, selection):
+                if selection is None:
+                    cached = analyze(pdf_source)
+                else:
+                    page_numbers, summary = _resolve_page_selection(pdf_source, selection)
+                    cached = {'analysis': analyze(pdf_source, pages=page_numbers), 'page_selection': summary}
+        except AdmissionRejected:
+            raise
+        except MemoryBudgetExceeded as e:
+            logger.warning(f"Stopped {kind} analysis of {file.filename}: {str(e)}")
+            return {'error': f'{error_message}: {str(e)}'}, 413, {}
+        except Exception as e:
+            logger.error(f"Error processing PDF for {kind} analysis: {str(e)}")
+            return {'error': f'{error_message}: {str(e)}'}, 500, {}
+
+        # Results that only carry an error (e.g. missing OCR packages) are not cached
+        analysis = cached if selection is None else cached['analysis']
+        if depends_on_timing(analysis):
+            key = None
+        elif not (isinstance(analysis, dict) and 'error' in analysis):
+            with timed_stage('cache'):
+                result_cache.put(key, cached)
+            if on_analyzed:
+                on_analyzed(digest, file.filename, analysis)
+
+    result = {
+        'success': True,
+        'filename': file.filename
+    }
+    if selection is None:
+        result[result_field] = cached
+    else:
+        result[result_field] = cached['analysis']
+        result['page_selection'] = cached['page_selection']
+    return result, 200, _etag_header(key) if key else {}
+
+
+def stream_analysis(file, kind, records, pages=None, sample=None, deadline_ms=None):
+    """
+    Start a streaming analysis of an upload
+
+    `records(pdf_source)` yields JSON-serializable records. Returns a generator
+    of NDJSON lines and 200, or an error result and its status code when the
+    upload is rejected. The generator reads the spooled upload, so the route
+    must keep the request context alive while streaming. With a page
+    selection, `records` is called with `pages=` and the document record
+    carries the `page_selection` summary.
+
+    The request is admitted before the 200 is sent (AdmissionRejected is left
+    to the app's 503 handler) and holds its admission until the stream ends
+    or is dropped. With `deadline_ms`, `records` runs under that deadline
+    counted from now.
+    """
+    if not allowed_file(file.filename):
+        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
+
+    try:
+        selection = parse_page_selection(pages, sample)
+    except ValueError as e:
+        return {'error': f'Invalid page selection: {e}'}, 400
+
+    try:
+        stop_at = deadline_from_now(parse_deadline(deadline_ms))
+    except ValueError as e:
+        return {'error': f'Invalid deadline: {e}'}, 400
+
+    filename = file.filename
+    # The upload stays open from admission until the stream ends
+    resources = ExitStack()
+    pdf_source = resources.enter_context(open_upload_buffer(file, UPLOAD_FOLDER))
+    try:
+        with deadline_at(stop_at):
+            admission = admit(kind, pdf_source, selection)
+    except BaseException:
+        resources.close()
+        raise
+    if admission is not None:
+        resources.callback(admission.release)
+
+    def generate():
+        try:
+            with deadline_at(stop_at), memory_budget():
+                document_fields = {'filename': filename}
+                if selection is None:
+                    page_records = records(pdf_source)
+                else:
+                    page_numbers, document_fields['page_selection'] = _resolve_page_selection(pdf_source, selection)
+                    page_records = records(pdf_source, pages=page_numbers)
+
+                for record in page_records:
+                    if record.get('type') == 'document':
+                        record = dict(record, **document_fields)
+                    yield json.dumps(record) + '\n'
+        except Exception as e:
+            logger.error(f"Error streaming PDF for {kind} analysis: {str(e)}")
+            yield json.dumps({'type': 'error', 'error': f'Failed to process PDF: {str(e)}'}) + '\n'
+        finally:
+            resources.close()
+
+    stream = generate()
+    # A generator that is never started does not run its finally block
+    weakref.finalize(stream, resources.close)
+    return stream, 200
+
+
+def process_cache_stats():
+    """Report result cache hit/miss counters"""
+    return {'success': True, 'cache': result_cache.stats()}, 200
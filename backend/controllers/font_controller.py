@@ -3,78 +3,180 @@ Font analysis controller module
 Handles the business logic for font analysis endpoints
 """
 import logging
+import re
+import sqlite3
+from functools import partial
 try:
     # Try relative imports first (when run as part of the package)
-    from ..services.font_service import extract_fonts_from_pdf, extract_fonts_basic, extract_fonts_advanced
-    from ..services.file_service import save_uploaded_file, cleanup_file
-    from ..config import UPLOAD_FOLDER
+    from ..services.font_service import extract_fonts_from_pdf, extract_fonts_basic, extract_fonts_advanced, iter_fonts_advanced, list_fonts
+    from ..services.batch_service import analyze_batch, is_archive, BATCH_ANALYSES
+    from ..services.file_service import allowed_file
+    from ..services.font_program_service import font_program_store
+    from ..services.admission_service import admitted, AdmissionRejected
+    from .analysis_controller import run_cached_analysis, stream_analysis
 except ImportError:
     # Fall back to absolute imports (when run directly)
-    from services.font_service import extract_fonts_from_pdf, extract_fonts_basic, extract_fonts_advanced
-    from services.file_service import save_uploaded_file, cleanup_file
-    from config import UPLOAD_FOLDER
+    from services.font_service import extract_fonts_from_pdf, extract_fonts_basic, extract_fonts_advanced, iter_fonts_advanced, list_fonts
+    from services.batch_service import analyze_batch, is_archive, BATCH_ANALYSES
+    from services.file_service import allowed_file
+    from services.font_program_service import font_program_store
+    from services.admission_service import admitted, AdmissionRejected
+    from controllers.analysis_controller import run_cached_analysis, stream_analysis
 
 logger = logging.getLogger(__name__)
 
 
-def process_basic_font_analysis(file):
+def process_basic_font_analysis(file, if_none_match=None):
     """Process basic font analysis using pdfminer"""
-    filepath = save_uploaded_file(file, UPLOAD_FOLDER)
-    if not filepath:
-        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
-    
-    try:
-        font_data = extract_fonts_basic(filepath)
-        return {
-            'success': True,
-            'filename': file.filename,
-            'font_analysis': font_data
-        }, 200
-    except Exception as e:
-        logger.error(f"Error processing PDF for basic analysis: {str(e)}")
-        return {'error': f'Failed to process PDF: {str(e)}'}, 500
-    finally:
-        # Clean up uploaded file after processing
-        cleanup_file(filepath)
+    return run_cached_analysis(
+        file, 'basic', extract_fonts_basic, 'font_analysis', 'Failed to process PDF',
+        if_none_match=if_none_match
+    )
+
 
+def process_font_listing(file, if_none_match=None):
+    """Process the resource-only font listing (every font and the pages referencing it)"""
+    return run_cached_analysis(
+        file, 'list', list_fonts, 'font_analysis', 'Failed to process PDF',
+        if_none_match=if_none_match
+    )
 
-def process_detailed_font_analysis(file):
+
+def process_detailed_font_analysis(file, if_none_match=None, pages=None, sample=None):
     """Process detailed font analysis using pdfplumber (app2.py functionality)"""
-    filepath = save_uploaded_file(file, UPLOAD_FOLDER)
-    if not filepath:
-        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
-    
+    return run_cached_analysis(
+        file, 'detailed', extract_fonts_from_pdf, 'font_analysis', 'Failed to process PDF',
+        if_none_match=if_none_match, pages=pages, sample=sample
+    )
+
+
+# Per-page output formats of the advanced analysis
+ADVANCED_FORMATS = ('fonts', 'spans')
+
+
+def _invalid_format_error():
+    return {'error': f"Invalid format. Expected one of: {', '.join(ADVANCED_FORMATS)}"}
+
+
+def _record_font_programs(digest, filename, analysis):
+    """Record the embedded font programs of a fresh advanced analysis as used by the upload"""
     try:
-        font_data = extract_fonts_from_pdf(filepath)
-        return {
-            'success': True,
-            'filename': file.filename,
-            'font_analysis': font_data
-        }, 200
-    except Exception as e:
-        logger.error(f"Error processing PDF for detailed analysis: {str(e)}")
-        return {'error': f'Failed to process PDF: {str(e)}'}, 500
-    finally:
-        # Clean up uploaded file after processing
-        cleanup_file(filepath)
-
-
-def process_advanced_font_analysis(file):
-    """Process advanced font analysis using both pdfminer and pdfplumber"""
-    filepath = save_uploaded_file(file, UPLOAD_FOLDER)
-    if not filepath:
-        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
-    
+        font_program_store.record_document(digest, filename, analysis)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record the font programs of {filename}: {str(e)}")
+
+
+def process_advanced_font_analysis(file, if_none_match=None, pages=None, sample=None, output_format='fonts',
+                                   deadline_ms=None):
+    """
+    Process advanced font analysis using both pdfminer and pdfplumber
+
+    `output_format='spans'` reports each page as merged text runs instead of
+    one entry per character position.
+    """
+    if output_format not in ADVANCED_FORMATS:
+        return _invalid_format_error(), 400, {}
+
+    if output_format == 'spans':
+        return run_cached_analysis(
+            file, 'advanced', partial(extract_fonts_advanced, spans=True), 'font_analysis', 'Failed to process PDF',
+            params={'format': 'spans'}, if_none_match=if_none_match, pages=pages, sample=sample,
+            deadline_ms=deadline_ms, on_analyzed=_record_font_programs
+        )
+
+    return run_cached_analysis(
+        file, 'advanced', extract_fonts_advanced, 'font_analysis', 'Failed to process PDF',
+        if_none_match=if_none_match, pages=pages, sample=sample, deadline_ms=deadline_ms,
+        on_analyzed=_record_font_programs
+    )
+
+
+def stream_advanced_font_analysis(file, pages=None, sample=None, output_format='fonts', deadline_ms=None):
+    """Stream advanced font analysis as one NDJSON record per page"""
+    if output_format not in ADVANCED_FORMATS:
+        return _invalid_format_error(), 400
+
+    records = partial(iter_fonts_advanced, spans=output_format == 'spans')
+    return stream_analysis(file, 'advanced', records, pages, sample, deadline_ms)
+
+
+def process_batch_font_analysis(files, kind='detailed'):
+    """Process a font analysis of several PDFs and ZIP archives of PDFs"""
+    if kind not in BATCH_ANALYSES:
+        return {'error': f"Invalid batch kind. Expected one of: {', '.join(sorted(BATCH_ANALYSES))}"}, 400
+
+    for file in files:
+        if not (allowed_file(file.filename) or is_archive(file.filename)):
+            return {'error': f'Invalid file type: {file.filename}. Only PDF and ZIP files are allowed.'}, 400
+
     try:
-        font_data = extract_fonts_advanced(filepath)
-        return {
-            'success': True,
-            'filename': file.filename,
-            'font_analysis': font_data
-        }, 200
+        with admitted('batch'):
+            batch = analyze_batch(files, kind)
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        logger.error(f"Error processing PDF for advanced analysis: {str(e)}")
-        return {'error': f'Failed to process PDF: {str(e)}'}, 500
-    finally:
-        # Clean up uploaded file after processing
-        cleanup_file(filepath)
\ No newline at end of file
+        logger.error(f"Error processing batch {kind} analysis: {str(e)}")
+        return {'error': f'Failed to process batch: {str(e)}'}, 500
+
+    return dict(batch, success=True, kind=kind), 200
+
+
+_PROGRAM_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+# Rows returned by the font program queries unless `limit` is given, and at most
+FONT_PROGRAM_DEFAULT_LIMIT = 100
+FONT_PROGRAM_MAX_LIMIT = 1000
+
+
+def _parse_program_limit(limit):
+    if limit is None:
+        return FONT_PROGRAM_DEFAULT_LIMIT
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValueError('limit must be a positive number')
+    return min(int(limit), FONT_PROGRAM_MAX_LIMIT)
+
+
+def _public_program(program):
+    """A font program record without the store's bookkeeping fields"""
+    return {field: value for field, value in program.items() if field != 'index_id'}
+
+
+def process_font_programs(limit=None):
+    """List the embedded font programs used by the most documents"""
+    try:
+        limit = _parse_program_limit(limit)
+    except ValueError as e:
+        return {'error': f'Invalid request: {e}'}, 400
+
+    try:
+        programs = font_program_store.most_shared(limit)
+    except sqlite3.Error as e:
+        logger.error(f"Error reading the font program store: {str(e)}")
+        return {'error': f'Failed to read font programs: {str(e)}'}, 500
+    return {'success': True, 'programs': [_public_program(program) for program in programs]}, 200
+
+
+def process_font_program(program_hash, limit=None):
+    """Describe one embedded font program and the documents it was found in"""
+    if not _PROGRAM_HASH.match(program_hash):
+        return {'error': 'Invalid font program hash'}, 400
+    try:
+        limit = _parse_program_limit(limit)
+    except ValueError as e:
+        return {'error': f'Invalid request: {e}'}, 400
+
+    try:
+        program = font_program_store.get(program_hash)
+        if program is None:
+            return {'error': 'Font program not found'}, 404
+        document_count, documents = font_program_store.documents(program_hash, limit)
+    except sqlite3.Error as e:
+        logger.error(f"Error reading the font program store: {str(e)}")
+        return {'error': f'Failed to read font program: {str(e)}'}, 500
+
+    return {
+        'success': True,
+        'program': _public_program(program),
+        'document_count': document_count,
+        'documents': documents
+    }, 200
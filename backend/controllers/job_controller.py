@@ -0,0 +1,115 @@
+"""
+Job controller module
+Handles the business logic for the asynchronous job endpoints
+"""
+import json
+import logging
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.job_service import job_store, job_runner, JOB_ANALYSES
+    from ..services.cache_service import result_cache, file_digest, cache_key
+    from ..services.metrics_service import timed_stage
+    from ..services.file_service import allowed_file, save_uploaded_file
+    from ..services.ocr_service import OCR_SETTINGS
+    from ..config import JOBS_FOLDER
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.job_service import job_store, job_runner, JOB_ANALYSES
+    from services.cache_service import result_cache, file_digest, cache_key
+    from services.metrics_service import timed_stage
+    from services.file_service import allowed_file, save_uploaded_file
+    from services.ocr_service import OCR_SETTINGS
+    from config import JOBS_FOLDER
+
+logger = logging.getLogger(__name__)
+
+# Response field holding the result of each job kind
+RESULT_FIELDS = {
+    'basic': 'font_analysis',
+    'detailed': 'font_analysis',
+    'advanced': 'font_analysis',
+    'ocr': 'ocr_analysis'
+}
+
+# Parameters that are part of the cache key of each job kind
+CACHE_PARAMS = {
+    'ocr': OCR_SETTINGS
+}
+
+
+def _job_status(job):
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'progress': {
+            'pages_done': job['pages_done'],
+            'pages_total': job['pages_total']
+        },
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+
+
+def process_job_submission(file, kind):
+    """Queue an analysis of the upload and return the new job id"""
+    if kind not in JOB_ANALYSES:
+        return {'error': f"Invalid job kind. Expected one of: {', '.join(sorted(JOB_ANALYSES))}"}, 400
+
+    if not allowed_file(file.filename):
+        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
+
+    with timed_stage('hash'):
+        key = cache_key(file_digest(file), kind, CACHE_PARAMS.get(kind))
+    cached = result_cache.get(key)
+    if cached is not None:
+        job_id = job_store.create_completed(kind, file.filename, cached, key)
+        return {'success': True, 'job_id': job_id, 'status': 'completed'}, 202
+
+    with timed_stage('upload'):
+        filepath = save_uploaded_file(file, JOBS_FOLDER)
+    if not filepath:
+        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
+
+    job_id = job_store.create(kind, file.filename, filepath, key)
+    job_runner.submit(job_id)
+    return {'success': True, 'job_id': job_id, 'status': 'queued'}, 202
+
+
+def process_job_status(job_id):
+    """Report the status and per-page progress of a job"""
+    job = job_store.get(job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    return dict(_job_status(job), success=True), 200
+
+
+def process_job_result(job_id):
+    """Return the output of a completed job"""
+    job = job_store.get(job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+
+    if job['status'] == 'failed':
+        return {'error': f"Job failed: {job['error']}", 'job_id': job_id}, 500
+
+    if job['status'] != 'completed':
+        return dict(_job_status(job), success=True), 202
+
+    return {
+        'success': True,
+        'job_id': job_id,
+        'filename': job['filename'],
+        RESULT_FIELDS[job['kind']]: json.loads(job['result'])
+    }, 200
+
+
+def recover_jobs():
+    """Resubmit jobs interrupted by a restart and start removing expired ones"""
+    job_runner.start_sweeper()
+    recovered = job_runner.recover()
+    if recovered:
+        logger.info(f"Resubmitted {recovered} queued job(s)")
+    return recovered
@@ -0,0 +1,66 @@
+"""
+Metrics controller module
+Handles the business logic for the Prometheus metrics endpoint and per-request stage timings
+"""
+import logging
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.metrics_service import (
+        render_prometheus, request_seconds, start_recording, finish_recording, server_timing, count, timed_stage
+    )
+    from ..config import METRICS_ENABLED, SLOW_REQUEST_SECONDS
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.metrics_service import (
+        render_prometheus, request_seconds, start_recording, finish_recording, server_timing, count, timed_stage
+    )
+    from config import METRICS_ENABLED, SLOW_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def process_metrics():
+    """Return all metrics in the Prometheus text format"""
+    if not METRICS_ENABLED:
+        return 'Metrics are disabled\n', 404
+    return render_prometheus(), 200
+
+
+def begin_request(request):
+    """
+    Start recording a request; returns its recorder, or None when metrics are disabled
+
+    Multipart bodies are parsed here so receiving and spooling the upload is
+    timed as the `upload` stage.
+    """
+    recorder = start_recording()
+    if recorder is not None and request.mimetype == 'multipart/form-data':
+        count('upload_bytes', request.content_length or 0)
+        with timed_stage('upload'):
+            request.files
+    return recorder
+
+
+def server_timing_header(recorder):
+    """Server-Timing value of the stages recorded so far"""
+    return server_timing(recorder)
+
+
+def end_request(recorder, method, endpoint, status_code):
+    """
+    Observe a finished request's stage timings and wall time
+
+    Streamed responses finish after their last record is sent, so their
+    stages are counted here even though their Server-Timing header could
+    only report the work done before streaming started.
+    """
+    if recorder is None:
+        return
+    elapsed = recorder.elapsed()
+    finish_recording(recorder)
+    request_seconds.observe(elapsed, method, endpoint, status_code)
+
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        stages = ', '.join(f'{stage}={seconds:.3f}s' for stage, seconds in
+                           sorted(recorder.stages.items(), key=lambda item: -item[1]))
+        logger.warning(f"Slow request {method} {endpoint} took {elapsed:.3f}s: {stages or 'no stages recorded'}")
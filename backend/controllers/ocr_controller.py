@@ -5,34 +5,75 @@ Handles the business logic for OCR analysis endpoints
 import logging
 try:
     # Try relative imports first (when run as part of the package)
-    from ..services.ocr_service import extract_text_from_images_ocr_simple
-    from ..services.file_service import save_uploaded_file, cleanup_file
-    from ..config import UPLOAD_FOLDER
+    from ..services.ocr_service import (
+        extract_text_from_images_ocr, extract_text_from_images_ocr_simple, extract_text_selective_ocr,
+        iter_text_selective_ocr, ocr_available, OCR_MISSING_ERROR, OCR_SETTINGS, FULL_OCR_SETTINGS, IMAGE_OCR_SETTINGS
+    )
+    from ..services.deadline_service import PageCoverage
+    from .analysis_controller import run_cached_analysis, stream_analysis
 except ImportError:
     # Fall back to absolute imports (when run directly)
-    from services.ocr_service import extract_text_from_images_ocr_simple
-    from services.file_service import save_uploaded_file, cleanup_file
-    from config import UPLOAD_FOLDER
+    from services.ocr_service import (
+        extract_text_from_images_ocr, extract_text_from_images_ocr_simple, extract_text_selective_ocr,
+        iter_text_selective_ocr, ocr_available, OCR_MISSING_ERROR, OCR_SETTINGS, FULL_OCR_SETTINGS, IMAGE_OCR_SETTINGS
+    )
+    from services.deadline_service import PageCoverage
+    from controllers.analysis_controller import run_cached_analysis, stream_analysis
 
 logger = logging.getLogger(__name__)
 
 
-def process_ocr_analysis(file):
-    """Process OCR analysis to extract text from PDF images"""
-    filepath = save_uploaded_file(file, UPLOAD_FOLDER)
-    if not filepath:
-        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
-    
-    try:
-        ocr_data = extract_text_from_images_ocr_simple(filepath)
-        return {
-            'success': True,
-            'filename': file.filename,
-            'ocr_analysis': ocr_data
-        }, 200
-    except Exception as e:
-        logger.error(f"Error processing PDF for OCR: {str(e)}")
-        return {'error': f'Failed to process PDF for OCR: {str(e)}'}, 500
-    finally:
-        # Clean up uploaded file after processing
-        cleanup_file(filepath)
\ No newline at end of file
+def process_ocr_analysis(file, if_none_match=None, mode='selective', pages=None, sample=None, deadline_ms=None):
+    """
+    Process OCR analysis to extract text from PDF images
+
+    The default `selective` mode only OCRs pages without a usable text layer;
+    `full` renders and OCRs every page; `images` OCRs each distinct embedded
+    image once.
+    """
+    if mode == 'full':
+        return run_cached_analysis(
+            file, 'ocr', extract_text_from_images_ocr_simple, 'ocr_analysis', 'Failed to process PDF for OCR',
+            params=FULL_OCR_SETTINGS, if_none_match=if_none_match, pages=pages, sample=sample,
+            deadline_ms=deadline_ms
+        )
+    if mode == 'images':
+        return run_cached_analysis(
+            file, 'ocr', extract_text_from_images_ocr, 'ocr_analysis', 'Failed to process PDF for OCR',
+            params=IMAGE_OCR_SETTINGS, if_none_match=if_none_match, pages=pages, sample=sample,
+            deadline_ms=deadline_ms
+        )
+    if mode != 'selective':
+        return {'error': "Invalid OCR mode. Expected 'selective', 'full' or 'images'"}, 400, {}
+
+    return run_cached_analysis(
+        file, 'ocr', extract_text_selective_ocr, 'ocr_analysis', 'Failed to process PDF for OCR',
+        params=OCR_SETTINGS, if_none_match=if_none_match, pages=pages, sample=sample, deadline_ms=deadline_ms
+    )
+
+
+def _ocr_records(pdf_source, pages=None):
+    """NDJSON records for a streamed OCR analysis"""
+    if not ocr_available():
+        yield {'type': 'error', 'error': OCR_MISSING_ERROR}
+        return
+
+    yield {'type': 'document'}
+    pages_processed = 0
+    ocr_pages = 0
+    coverage = PageCoverage()
+    for result in iter_text_selective_ocr(pdf_source, pages=pages, coverage=coverage):
+        pages_processed += 1
+        ocr_pages += result['source'] == 'ocr'
+        yield dict(result, type='page')
+    yield {
+        'type': 'summary',
+        'pages_processed': pages_processed,
+        'ocr_pages': ocr_pages,
+        'coverage': coverage.summary()
+    }
+
+
+def stream_ocr_analysis(file, pages=None, sample=None, deadline_ms=None):
+    """Stream OCR analysis as one NDJSON record per page"""
+    return stream_analysis(file, 'ocr', _ocr_records, pages, sample, deadline_ms)
@@ -0,0 +1,140 @@
+"""
+Region query controller module
+Handles the business logic for "which font is at this point" queries on stored documents
+"""
+import logging
+import math
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.region_service import region_indexes, summarize_fonts
+    from ..services.document_service import document_store
+    from ..services.metrics_service import timed_stage
+    from ..services.memory_service import memory_budget, MemoryBudgetExceeded
+    from ..services.admission_service import AdmissionRejected
+    from ..services.file_service import allowed_file
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.region_service import region_indexes, summarize_fonts
+    from services.document_service import document_store
+    from services.metrics_service import timed_stage
+    from services.memory_service import memory_budget, MemoryBudgetExceeded
+    from services.admission_service import AdmissionRejected
+    from services.file_service import allowed_file
+
+logger = logging.getLogger(__name__)
+
+
+def _coordinate(args, name):
+    value = args.get(name)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number') from None
+    if not math.isfinite(number):
+        raise ValueError(f'{name} must be a number')
+    return number
+
+
+def parse_region(args):
+    """
+    (page, [x0, top, x1, bottom]) of a query from its parameters
+
+    A point is given as `x` and `y`, a rectangle as `x0`, `top`, `x1` and
+    `bottom`, in PDF points from the top-left corner of the page. Raises
+    ValueError for missing or malformed parameters.
+    """
+    page = args.get('page', '')
+    if not page.isdigit() or int(page) < 1:
+        raise ValueError('page must be a positive page number')
+
+    if 'x' in args or 'y' in args:
+        x, y = _coordinate(args, 'x'), _coordinate(args, 'y')
+        return int(page), [x, y, x, y]
+
+    x0, top, x1, bottom = (_coordinate(args, name) for name in ('x0', 'top', 'x1', 'bottom'))
+    if x1 < x0 or bottom < top:
+        raise ValueError('the rectangle must have x0 <= x1 and top <= bottom')
+    return int(page), [x0, top, x1, bottom]
+
+
+def _load_index(document_id):
+    """Region index of a stored document, building it from the stored file if needed"""
+    index = region_indexes.get(document_id)
+    if index is None:
+        pdf_path = document_store.path(document_id)
+        if pdf_path is not None:
+            index = region_indexes.get(document_id, pdf_path)
+    return index
+
+
+def process_region_upload(file):
+    """Store an upload and build its region index, returning the document id and its pages"""
+    if not allowed_file(file.filename):
+        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
+
+    try:
+        with timed_stage('upload'):
+            document_id = document_store.put(file)
+    except OSError as e:
+        logger.error(f"Error storing uploaded document: {str(e)}")
+        return {'error': f'Failed to store PDF: {str(e)}'}, 500
+
+    try:
+        with memory_budget():
+            index = region_indexes.get(document_id, document_store.path(document_id))
+    except AdmissionRejected:
+        raise
+    except MemoryBudgetExceeded as e:
+        logger.warning(f"Stopped indexing {file.filename}: {str(e)}")
+        return {'error': f'Failed to process PDF: {str(e)}'}, 413
+    except Exception as e:
+        logger.error(f"Error indexing {file.filename}: {str(e)}")
+        return {'error': f'Failed to process PDF: {str(e)}'}, 500
+
+    pages = index.summary()
+    return {
+        'success': True,
+        'document_id': document_id,
+        'filename': file.filename,
+        'page_count': len(pages),
+        'pages': pages
+    }, 200
+
+
+def process_region_query(document_id, args):
+    """Return the text runs and fonts of a stored document within a point or rectangle"""
+    try:
+        page_number, region = parse_region(args)
+    except ValueError as e:
+        return {'error': f'Invalid request: {e}'}, 400
+
+    try:
+        with memory_budget():
+            index = _load_index(document_id)
+    except AdmissionRejected:
+        raise
+    except MemoryBudgetExceeded as e:
+        logger.warning(f"Stopped indexing document {document_id}: {str(e)}")
+        return {'error': f'Failed to process PDF: {str(e)}'}, 413
+    except Exception as e:
+        logger.error(f"Error indexing document {document_id}: {str(e)}")
+        return {'error': f'Failed to process PDF: {str(e)}'}, 500
+
+    if index is None:
+        return {'error': 'Document not found. Upload it again to query it.'}, 404
+    found = index.page(page_number)
+    if found is None:
+        return {'error': f'Page {page_number} not found; the document has {len(index.pages)} pages'}, 404
+
+    _, grid = found
+    with timed_stage('lookup'):
+        spans = grid.query(*region)
+
+    return {
+        'success': True,
+        'document_id': document_id,
+        'page': page_number,
+        'region': region,
+        'fonts': summarize_fonts(spans),
+        'spans': spans
+    }, 200
@@ -0,0 +1,110 @@
+"""
+Text analysis controller module
+Handles the business logic for the paginated font-annotated text endpoint
+"""
+import base64
+import json
+import logging
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.font_service import extract_text_columns
+    from ..services.document_service import document_store
+    from ..services.metrics_service import timed_stage
+    from ..services.memory_service import memory_budget, MemoryBudgetExceeded
+    from ..services.admission_service import admitted, AdmissionRejected
+    from ..services.file_service import allowed_file
+    from ..config import TEXT_DEFAULT_CHARS, TEXT_MAX_CHARS, TEXT_MAX_PAGES
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_service import extract_text_columns
+    from services.document_service import document_store
+    from services.metrics_service import timed_stage
+    from services.memory_service import memory_budget, MemoryBudgetExceeded
+    from services.admission_service import admitted, AdmissionRejected
+    from services.file_service import allowed_file
+    from config import TEXT_DEFAULT_CHARS, TEXT_MAX_CHARS, TEXT_MAX_PAGES
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(position):
+    """Opaque cursor for a (page, char) position"""
+    page, char = position
+    return base64.urlsafe_b64encode(json.dumps([page, char]).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(page, char) position of a cursor; raises ValueError for a malformed one"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        page, char = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('malformed cursor') from e
+    if not isinstance(page, int) or not isinstance(char, int) or page < 1 or char < 0:
+        raise ValueError('malformed cursor')
+    return page, char
+
+
+def _parse_limit(limit):
+    if limit is None:
+        return TEXT_DEFAULT_CHARS
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValueError('limit must be a positive number of characters')
+    return min(int(limit), TEXT_MAX_CHARS)
+
+
+def _text_window(document_id, cursor, limit):
+    """Read one window of a stored document"""
+    try:
+        start_page, start_char = decode_cursor(cursor) if cursor else (1, 0)
+        max_chars = _parse_limit(limit)
+    except ValueError as e:
+        return {'error': f'Invalid request: {e}'}, 400
+
+    pdf_path = document_store.path(document_id)
+    if pdf_path is None:
+        return {'error': 'Document not found. Upload it again to continue.'}, 404
+
+    try:
+        with memory_budget(), admitted('text', pdf_path, max_pages=TEXT_MAX_PAGES):
+            window = extract_text_columns(pdf_path, start_page, start_char, max_chars, TEXT_MAX_PAGES)
+    except AdmissionRejected:
+        raise
+    except MemoryBudgetExceeded as e:
+        logger.warning(f"Stopped text extraction for document {document_id}: {str(e)}")
+        return {'error': f'Failed to process PDF: {str(e)}'}, 413
+    except Exception as e:
+        logger.error(f"Error extracting text for document {document_id}: {str(e)}")
+        return {'error': f'Failed to process PDF: {str(e)}'}, 500
+
+    next_position = window['next_position']
+    return {
+        'success': True,
+        'document_id': document_id,
+        'page_count': window['page_count'],
+        'pages': window['pages'],
+        'next_cursor': encode_cursor(next_position) if next_position else None
+    }, 200
+
+
+def process_text_upload(file, limit=None):
+    """Store an upload and return the first window of its font-annotated text"""
+    if not allowed_file(file.filename):
+        return {'error': 'Invalid file type. Only PDF files are allowed.'}, 400
+
+    try:
+        with timed_stage('upload'):
+            document_id = document_store.put(file)
+    except OSError as e:
+        logger.error(f"Error storing uploaded document: {str(e)}")
+        return {'error': f'Failed to store PDF: {str(e)}'}, 500
+
+    result, status_code = _text_window(document_id, None, limit)
+    if status_code == 200:
+        result['filename'] = file.filename
+    return result, status_code
+
+
+def process_text_page(document_id, cursor=None, limit=None):
+    """Return the window of a stored document's font-annotated text at `cursor`"""
+    return _text_window(document_id, cursor, limit)
@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration
+Production server settings for `gunicorn -c gunicorn.conf.py wsgi:app`
+
+The app is loaded and warmed up once in the master (preload_app) and the
+workers are forked from it. Each worker runs its own page and OCR process
+pools, so keep GUNICORN_WORKERS * PARALLEL_WORKERS near the CPU count.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Threads let a worker keep serving status polls and small requests while
+# its process pools work through a large document
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = True
+# Analyses of large documents run far longer than gunicorn's 30s default
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    # Threads started in the master would not exist in the worker
+    from app import start_background_tasks
+    start_background_tasks()
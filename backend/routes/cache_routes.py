@@ -0,0 +1,20 @@
+"""
+Cache routes module
+Defines endpoints for inspecting the analysis result cache
+"""
+from flask import Blueprint, jsonify
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..controllers.analysis_controller import process_cache_stats
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from controllers.analysis_controller import process_cache_stats
+
+cache_bp = Blueprint('cache', __name__, url_prefix='/api/cache')
+
+
+@cache_bp.route('/stats', methods=['GET'])
+def cache_stats():
+    """Result cache hit/miss counters"""
+    result, status_code = process_cache_stats()
+    return jsonify(result), status_code
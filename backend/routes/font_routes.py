@@ -2,13 +2,19 @@
 Font analysis routes module
 Defines all font-related API endpoints
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 try:
     # Try relative imports first (when run as part of the package)
-    from ..controllers.font_controller import process_basic_font_analysis, process_detailed_font_analysis, process_advanced_font_analysis
+    from ..controllers.font_controller import process_basic_font_analysis, process_font_listing, process_detailed_font_analysis, process_advanced_font_analysis, stream_advanced_font_analysis, process_batch_font_analysis, process_font_programs, process_font_program
+    from ..controllers.text_controller import process_text_upload, process_text_page
+    from ..controllers.region_controller import process_region_upload, process_region_query
+    from .negotiation import negotiated_response
 except ImportError:
     # Fall back to absolute imports (when run directly)
-    from controllers.font_controller import process_basic_font_analysis, process_detailed_font_analysis, process_advanced_font_analysis
+    from controllers.font_controller import process_basic_font_analysis, process_font_listing, process_detailed_font_analysis, process_advanced_font_analysis, stream_advanced_font_analysis, process_batch_font_analysis, process_font_programs, process_font_program
+    from controllers.text_controller import process_text_upload, process_text_page
+    from controllers.region_controller import process_region_upload, process_region_query
+    from routes.negotiation import negotiated_response
 
 font_bp = Blueprint('font', __name__, url_prefix='/api/fonts')
 
@@ -16,6 +22,48 @@ font_bp = Blueprint('font', __name__, url_prefix='/api/fonts')
 @font_bp.route('/basic', methods=['POST'])
 def basic_analysis():
     """Basic font analysis using pdfminer"""
+    # The file may be omitted when If-None-Match names a cached result
+    file = request.files.get('pdf_file')
+    
+    if file is not None and file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    result, status_code, headers = process_basic_font_analysis(file, request.if_none_match)
+    return negotiated_response(result, status_code, headers)
+
+
+@font_bp.route('/list', methods=['POST'])
+def font_listing():
+    """Every font of a PDF and the pages referencing it, read from resources only"""
+    # The file may be omitted when If-None-Match names a cached result
+    file = request.files.get('pdf_file')
+    
+    if file is not None and file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    result, status_code, headers = process_font_listing(file, request.if_none_match)
+    return negotiated_response(result, status_code, headers)
+
+
+@font_bp.route('/advanced', methods=['POST'])
+def advanced_analysis():
+    """Advanced font analysis using both pdfminer and pdfplumber"""
+    # The file may be omitted when If-None-Match names a cached result
+    file = request.files.get('pdf_file')
+    
+    if file is not None and file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    result, status_code, headers = process_advanced_font_analysis(
+        file, request.if_none_match, request.args.get('pages'), request.args.get('sample'),
+        request.args.get('format', 'fonts'), request.args.get('deadline_ms')
+    )
+    return negotiated_response(result, status_code, headers)
+
+
+@font_bp.route('/advanced/stream', methods=['POST'])
+def advanced_analysis_stream():
+    """Advanced font analysis streamed as one NDJSON record per page"""
     if 'pdf_file' not in request.files:
         return jsonify({'error': 'No PDF file provided'}), 400
     
@@ -24,13 +72,53 @@ def basic_analysis():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    result, status_code = process_basic_font_analysis(file)
-    return jsonify(result), status_code
+    result, status_code = stream_advanced_font_analysis(
+        file, request.args.get('pages'), request.args.get('sample'), request.args.get('format', 'fonts'),
+        request.args.get('deadline_ms')
+    )
+    if status_code != 200:
+        return jsonify(result), status_code
+    return Response(stream_with_context(result), mimetype='application/x-ndjson')
 
 
-@font_bp.route('/advanced', methods=['POST'])
-def advanced_analysis():
-    """Advanced font analysis using both pdfminer and pdfplumber"""
+
+@font_bp.route('/batch', methods=['POST'])
+def batch_analysis():
+    """Font analysis of several PDFs and ZIP archives of PDFs, with a corpus rollup"""
+    files = [file for file in request.files.getlist('pdf_files') if file.filename != '']
+    
+    if not files:
+        return jsonify({'error': 'No PDF files provided'}), 400
+    
+    result, status_code = process_batch_font_analysis(files, request.args.get('kind', 'detailed'))
+    return negotiated_response(result, status_code)
+
+
+@font_bp.route('/text', methods=['POST'])
+def text_analysis():
+    """Store a PDF and return the first window of its font-annotated text"""
+    if 'pdf_file' not in request.files:
+        return jsonify({'error': 'No PDF file provided'}), 400
+    
+    file = request.files['pdf_file']
+    
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    result, status_code = process_text_upload(file, request.args.get('limit'))
+    return negotiated_response(result, status_code)
+
+
+@font_bp.route('/text/<document_id>', methods=['GET'])
+def text_analysis_page(document_id):
+    """Font-annotated text of a stored PDF from a cursor"""
+    result, status_code = process_text_page(document_id, request.args.get('cursor'), request.args.get('limit'))
+    return negotiated_response(result, status_code)
+
+
+@font_bp.route('/regions', methods=['POST'])
+def region_index():
+    """Store a PDF and index its text runs for point and rectangle queries"""
     if 'pdf_file' not in request.files:
         return jsonify({'error': 'No PDF file provided'}), 400
     
@@ -39,5 +127,26 @@ def advanced_analysis():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    result, status_code = process_advanced_font_analysis(file)
-    return jsonify(result), status_code
\ No newline at end of file
+    result, status_code = process_region_upload(file)
+    return negotiated_response(result, status_code)
+
+
+@font_bp.route('/regions/<document_id>', methods=['GET'])
+def region_query(document_id):
+    """Fonts and text runs of a stored PDF at a point or within a rectangle"""
+    result, status_code = process_region_query(document_id, request.args)
+    return negotiated_response(result, status_code)
+
+
+@font_bp.route('/programs', methods=['GET'])
+def font_programs():
+    """Embedded font programs found in the most documents"""
+    result, status_code = process_font_programs(request.args.get('limit'))
+    return negotiated_response(result, status_code)
+
+
+@font_bp.route('/programs/<program_hash>', methods=['GET'])
+def font_program(program_hash):
+    """One embedded font program and the documents it was found in"""
+    result, status_code = process_font_program(program_hash, request.args.get('limit'))
+    return negotiated_response(result, status_code)
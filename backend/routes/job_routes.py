@@ -0,0 +1,47 @@
+"""
+Job routes module
+Defines the asynchronous job API endpoints
+"""
+from flask import Blueprint, request, jsonify, url_for
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..controllers.job_controller import process_job_submission, process_job_status, process_job_result
+    from .negotiation import negotiated_response
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from controllers.job_controller import process_job_submission, process_job_status, process_job_result
+    from routes.negotiation import negotiated_response
+
+job_bp = Blueprint('job', __name__, url_prefix='/api/jobs')
+
+
+@job_bp.route('', methods=['POST'])
+def submit_job():
+    """Queue an analysis (kind plus file) and return a job id"""
+    if 'pdf_file' not in request.files:
+        return jsonify({'error': 'No PDF file provided'}), 400
+    
+    file = request.files['pdf_file']
+    
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    result, status_code = process_job_submission(file, request.form.get('kind', ''))
+    headers = {}
+    if status_code == 202:
+        headers['Location'] = url_for('job.job_status', job_id=result['job_id'])
+    return jsonify(result), status_code, headers
+
+
+@job_bp.route('/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Job status and per-page progress"""
+    result, status_code = process_job_status(job_id)
+    return jsonify(result), status_code
+
+
+@job_bp.route('/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Output of a completed job"""
+    result, status_code = process_job_result(job_id)
+    return negotiated_response(result, status_code)
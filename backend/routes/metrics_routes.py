@@ -0,0 +1,41 @@
+"""
+Metrics routes module
+Defines the Prometheus metrics endpoint and the hooks that time every request
+"""
+from flask import Blueprint, Response, request, g
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..controllers.metrics_controller import process_metrics, begin_request, server_timing_header, end_request
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from controllers.metrics_controller import process_metrics, begin_request, server_timing_header, end_request
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.before_app_request
+def start_request_timing():
+    g.stage_recorder = begin_request(request)
+
+
+@metrics_bp.after_app_request
+def add_server_timing(response):
+    recorder = g.get('stage_recorder')
+    if recorder is not None:
+        response.headers['Server-Timing'] = server_timing_header(recorder)
+        g.status_code = response.status_code
+    return response
+
+
+@metrics_bp.teardown_app_request
+def finish_request_timing(exception=None):
+    recorder = g.pop('stage_recorder', None)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    end_request(recorder, request.method, endpoint, g.get('status_code', 500))
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage timings, request durations and work counters in the Prometheus text format"""
+    body, status_code = process_metrics()
+    return Response(body, status=status_code, mimetype='text/plain; version=0.0.4')
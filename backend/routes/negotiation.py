@@ -0,0 +1,63 @@
+"""
+Response negotiation module
+Encodes API results as JSON or MessagePack and gzips them per the request headers
+"""
+import gzip
+from flask import Response, request, jsonify
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..services.metrics_service import timed_stage, count
+    from ..config import RESPONSE_GZIP_MIN_BYTES, RESPONSE_GZIP_LEVEL
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.metrics_service import timed_stage, count
+    from config import RESPONSE_GZIP_MIN_BYTES, RESPONSE_GZIP_LEVEL
+
+try:
+    import msgpack
+except ImportError:
+    # MessagePack is optional; clients asking for it get JSON instead
+    msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def negotiated_response(result, status_code, headers=None):
+    """
+    Build the response for an API result in the representation the client accepts
+
+    `Accept: application/msgpack` selects MessagePack when the msgpack package
+    is installed, and bodies of at least RESPONSE_GZIP_MIN_BYTES are gzipped
+    for clients sending `Accept-Encoding: gzip`. An ETag in `headers` gets a
+    `-msgpack` and/or `-gzip` suffix so each encoding has its own strong
+    validator; a 304 keeps the tag the client sent.
+    """
+    mimetype = 'application/json'
+    if msgpack is not None:
+        mimetype = request.accept_mimetypes.best_match(('application/json',) + MSGPACK_MIMETYPES, 'application/json')
+
+    with timed_stage('serialization'):
+        if mimetype == 'application/json':
+            response = jsonify(result)
+        else:
+            response = Response(msgpack.packb(result, use_bin_type=True, default=str), mimetype=mimetype)
+
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.vary.update(('Accept', 'Accept-Encoding'))
+
+    if 'gzip' in request.accept_encodings and response.content_length >= RESPONSE_GZIP_MIN_BYTES:
+        with timed_stage('compression'):
+            response.set_data(gzip.compress(response.get_data(), RESPONSE_GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+
+    tag, weak = response.get_etag()
+    if tag and status_code != 304:
+        if mimetype != 'application/json':
+            tag += '-msgpack'
+        if response.headers.get('Content-Encoding') == 'gzip':
+            tag += '-gzip'
+        response.set_etag(tag, weak)
+
+    count('response_bytes', response.content_length)
+    return response
@@ -2,13 +2,15 @@
 OCR analysis routes module
 Defines OCR-related API endpoints
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 try:
     # Try relative imports first (when run as part of the package)
-    from ..controllers.ocr_controller import process_ocr_analysis
+    from ..controllers.ocr_controller import process_ocr_analysis, stream_ocr_analysis
+    from .negotiation import negotiated_response
 except ImportError:
     # Fall back to absolute imports (when run directly)
-    from controllers.ocr_controller import process_ocr_analysis
+    from controllers.ocr_controller import process_ocr_analysis, stream_ocr_analysis
+    from routes.negotiation import negotiated_response
 
 ocr_bp = Blueprint('ocr', __name__, url_prefix='/api/fonts')
 
@@ -16,6 +18,22 @@ ocr_bp = Blueprint('ocr', __name__, url_prefix='/api/fonts')
 @ocr_bp.route('/ocr', methods=['POST'])
 def ocr_analysis():
     """OCR text extraction from PDF images"""
+    # The file may be omitted when If-None-Match names a cached result
+    file = request.files.get('pdf_file')
+    
+    if file is not None and file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    result, status_code, headers = process_ocr_analysis(
+        file, request.if_none_match, request.args.get('mode', 'selective'),
+        request.args.get('pages'), request.args.get('sample'), request.args.get('deadline_ms')
+    )
+    return negotiated_response(result, status_code, headers)
+
+
+@ocr_bp.route('/ocr/stream', methods=['POST'])
+def ocr_analysis_stream():
+    """OCR text extraction streamed as one NDJSON record per page"""
     if 'pdf_file' not in request.files:
         return jsonify({'error': 'No PDF file provided'}), 400
     
@@ -24,5 +42,9 @@ def ocr_analysis():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    result, status_code = process_ocr_analysis(file)
-    return jsonify(result), status_code
\ No newline at end of file
+    result, status_code = stream_ocr_analysis(
+        file, request.args.get('pages'), request.args.get('sample'), request.args.get('deadline_ms')
+    )
+    if status_code != 200:
+        return jsonify(result), status_code
+    return Response(stream_with_context(result), mimetype='application/x-ndjson')
@@ -6,9 +6,11 @@ from flask import Blueprint, request, jsonify
 try:
     # Try relative imports first (when run as part of the package)
     from ..controllers.font_controller import process_detailed_font_analysis
+    from .negotiation import negotiated_response
 except ImportError:
     # Fall back to absolute imports (when run directly)
     from controllers.font_controller import process_detailed_font_analysis
+    from routes.negotiation import negotiated_response
 
 upload_bp = Blueprint('upload', __name__)
 
@@ -16,13 +18,13 @@ upload_bp = Blueprint('upload', __name__)
 @upload_bp.route('/api/upload', methods=['POST'])
 def upload_analysis():
     """Detailed font analysis using pdfplumber (app2.py functionality)"""
-    if 'pdf_file' not in request.files:
-        return jsonify({'error': 'No PDF file provided'}), 400
+    # The file may be omitted when If-None-Match names a cached result
+    file = request.files.get('pdf_file')
     
-    file = request.files['pdf_file']
-    
-    if file.filename == '':
+    if file is not None and file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    result, status_code = process_detailed_font_analysis(file)
-    return jsonify(result), status_code
\ No newline at end of file
+    result, status_code, headers = process_detailed_font_analysis(
+        file, request.if_none_match, request.args.get('pages'), request.args.get('sample')
+    )
+    return negotiated_response(result, status_code, headers)
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+Admission control service module
+Handles limiting how much expensive analysis one server process takes on at once
+
+Each class of expensive request passes a gate before its analysis starts.
+A gate bounds the requests running at once and the sum of their costs, the
+pages they are expected to lay out (see estimate_cost). A request that does
+not fit waits in the gate's first-come, first-served queue for up to
+ADMISSION_QUEUE_TIMEOUT seconds; when the queue is full or the wait runs
+out it is rejected with AdmissionRejected, which the app answers with a 503
+and a Retry-After estimated from how long admitted requests have been
+taking. A request costing more than a gate's whole budget is admitted once
+the gate is idle, so it is never starved.
+
+All gates together hold at most ADMISSION_MAX_REQUESTS request threads,
+running or queued, which leaves a server thread free for health checks,
+job polls and cached results.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .file_service import is_file_path
+    from .page_selection_service import document_page_count, select_pages
+    from .deadline_service import seconds_left
+    from .metrics_service import (
+        timed_stage, admission_in_flight, admission_in_flight_cost, admission_queue_depth, admission_admitted,
+        admission_rejected, admission_wait_seconds
+    )
+    from ..config import (
+        ADMISSION_ENABLED, ADMISSION_MAX_REQUESTS, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT,
+        ADMISSION_LAYOUT_CONCURRENCY, ADMISSION_LAYOUT_PAGES, ADMISSION_OCR_CONCURRENCY, ADMISSION_OCR_PAGES,
+        ADMISSION_BATCH_CONCURRENCY
+    )
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.file_service import is_file_path
+    from services.page_selection_service import document_page_count, select_pages
+    from services.deadline_service import seconds_left
+    from services.metrics_service import (
+        timed_stage, admission_in_flight, admission_in_flight_cost, admission_queue_depth, admission_admitted,
+        admission_rejected, admission_wait_seconds
+    )
+    from config import (
+        ADMISSION_ENABLED, ADMISSION_MAX_REQUESTS, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT,
+        ADMISSION_LAYOUT_CONCURRENCY, ADMISSION_LAYOUT_PAGES, ADMISSION_OCR_CONCURRENCY, ADMISSION_OCR_PAGES,
+        ADMISSION_BATCH_CONCURRENCY
+    )
+
+# Pages assumed per this many bytes when the page tree cannot be read
+BYTES_PER_PAGE_ESTIMATE = 100 * 1024
+
+# Bounds of the Retry-After suggested to rejected requests, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+# Weight of the latest request in the running mean of admitted request durations
+DURATION_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away; `retry_after` is the suggested wait in seconds"""
+
+    def __init__(self, gate, reason, retry_after):
+        super().__init__(f'Server busy ({gate} analyses: {reason}); retry in {retry_after}s')
+        self.gate = gate
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _RequestSlots:
+    """Process-wide count of request threads held by the gates"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.held >= self.limit:
+                return False
+            self.held += 1
+            return True
+
+    def give_back(self):
+        with self._lock:
+            self.held -= 1
+
+
+_request_slots = _RequestSlots(ADMISSION_MAX_REQUESTS)
+
+
+class Admission:
+    """An admitted request; release() frees its place in the gate and may be called more than once"""
+
+    def __init__(self, gate, cost):
+        self.gate = gate
+        self.cost = cost
+        self.started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.gate._finish(self)
+
+
+class AdmissionGate:
+    """Concurrency and cost budget for one class of requests, with a short FIFO queue"""
+
+    def __init__(self, name, max_concurrent, max_cost, queue_depth=ADMISSION_QUEUE_DEPTH,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_cost = max_cost
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.active_cost = 0
+        self._waiting = []
+        self._mean_seconds = None
+        self._condition = threading.Condition()
+        self._publish()
+
+    def _fits(self, cost):
+        if self.active >= self.max_concurrent:
+            return False
+        return self.active == 0 or self.active_cost + cost <= self.max_cost
+
+    def _publish(self):
+        admission_in_flight.set(self.active, self.name)
+        admission_in_flight_cost.set(self.active_cost, self.name)
+        admission_queue_depth.set(len(self._waiting), self.name)
+
+    def retry_after(self):
+        """Seconds until the queue ahead of a new request is likely to have drained"""
+        if self._mean_seconds is None:
+            estimate = self.queue_timeout
+        else:
+            estimate = self._mean_seconds * (len(self._waiting) + 1) / self.max_concurrent
+        return min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(estimate)))
+
+    def _reject(self, reason):
+        admission_rejected.inc(self.name, reason)
+        raise AdmissionRejected(self.name, reason, self.retry_after())
+
+    def acquire(self, cost, timeout=None):
+        """
+        Admit a request of `cost`, waiting in the queue if needed; raises AdmissionRejected
+
+        The wait is at most the gate's queue timeout, or `timeout` seconds if shorter.
+        """
+        if not _request_slots.take():
+            with self._condition:
+                self._reject('server threads busy')
+
+        try:
+            queued = time.monotonic()
+            with self._condition:
+                if not self._waiting and self._fits(cost):
+                    return self._start(cost, queued)
+                if len(self._waiting) >= self.queue_depth:
+                    self._reject('queue full')
+
+                ticket = object()
+                self._waiting.append(ticket)
+                self._publish()
+                deadline = queued + (self.queue_timeout if timeout is None else min(self.queue_timeout, timeout))
+                try:
+                    while not (self._waiting[0] is ticket and self._fits(cost)):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject('queue timeout')
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting.remove(ticket)
+                    # The next request in line may fit now
+                    self._condition.notify_all()
+                    self._publish()
+                return self._start(cost, queued)
+        except BaseException:
+            _request_slots.give_back()
+            raise
+
+    def _start(self, cost, queued):
+        self.active += 1
+        self.active_cost += cost
+        self._publish()
+        admission_admitted.inc(self.name)
+        admission_wait_seconds.observe(time.monotonic() - queued, self.name)
+        return Admission(self, cost)
+
+    def _finish(self, admission):
+        duration = time.monotonic() - admission.started
+        with self._condition:
+            self.active -= 1
+            self.active_cost -= admission.cost
+            if self._mean_seconds is None:
+                self._mean_seconds = duration
+            else:
+                self._mean_seconds += DURATION_SMOOTHING * (duration - self._mean_seconds)
+            self._publish()
+            self._condition.notify_all()
+        _request_slots.give_back()
+
+
+# Gates by analysis kind; kinds without a gate (cheap ones, and queued jobs,
+# which JOB_WORKERS already bounds) are always admitted
+_layout_gate = AdmissionGate('layout', ADMISSION_LAYOUT_CONCURRENCY, ADMISSION_LAYOUT_PAGES)
+_ocr_gate = AdmissionGate('ocr', ADMISSION_OCR_CONCURRENCY, ADMISSION_OCR_PAGES)
+_batch_gate = AdmissionGate('batch', ADMISSION_BATCH_CONCURRENCY, ADMISSION_BATCH_CONCURRENCY)
+
+GATES = {
+    'detailed': _layout_gate,
+    'advanced': _layout_gate,
+    'text': _layout_gate,
+    'regions': _layout_gate,
+    'ocr': _ocr_gate,
+    'batch': _batch_gate
+}
+
+
+def _source_size(pdf_source):
+    if is_file_path(pdf_source):
+        return os.path.getsize(pdf_source)
+    pdf_source.seek(0, os.SEEK_END)
+    return pdf_source.tell()
+
+
+def estimate_cost(pdf_source, selection=None, max_pages=None):
+    """
+    Pages an analysis of `pdf_source` is expected to lay out
+
+    Read from the page tree and narrowed by a parsed page `selection` or
+    `max_pages`; when the page tree cannot be read, guessed from the file
+    size instead.
+    """
+    try:
+        pages = document_page_count(pdf_source)
+        if selection is not None:
+            pages = len(select_pages(selection, pages))
+    except Exception:
+        try:
+            pages = math.ceil(_source_size(pdf_source) / BYTES_PER_PAGE_ESTIMATE)
+        except (OSError, ValueError, AttributeError):
+            pages = 1
+    if max_pages is not None:
+        pages = min(pages, max_pages)
+    return max(1, pages)
+
+
+def admit(kind, pdf_source=None, selection=None, max_pages=None):
+    """
+    Admit a `kind` request, returning an Admission to release() when its work is done, or None
+
+    The cost is estimated from `pdf_source` (see estimate_cost), or 1 without
+    one. A request never waits past its analysis deadline, if any. Returns
+    None when admission control is off or the kind has no gate. Raises
+    AdmissionRejected when the request cannot be admitted in time.
+    """
+    gate = GATES.get(kind)
+    if gate is None or not ADMISSION_ENABLED:
+        return None
+    cost = estimate_cost(pdf_source, selection, max_pages) if pdf_source is not None else 1
+    with timed_stage('admission'):
+        return gate.acquire(cost, seconds_left())
+
+
+@contextmanager
+def admitted(kind, pdf_source=None, selection=None, max_pages=None):
+    """Context manager holding an admission (see admit) for the duration of the block"""
+    admission = admit(kind, pdf_source, selection, max_pages)
+    try:
+        yield
+    finally:
+        if admission is not None:
+            admission.release()
@@ -0,0 +1,208 @@
+"""
+Font aggregation service module
+Handles de-duplication and usage counting of character-level font data
+"""
+from collections import defaultdict
+
+# Character positions are bucketed by rounding to this many decimals
+POSITION_PRECISION = 2
+
+# A horizontal gap wider than this fraction of the font size is a word break in a text run
+SPAN_SPACE_GAP = 0.25
+
+
+def _hashable(value):
+    """Turn a pdfplumber color value into a dict key that compares like the value"""
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_hashable(item) for item in value)
+    return value
+
+
+def char_font_info(char):
+    """Build the per-page font entry for a single pdfplumber character"""
+    return {
+        'name': char.get('fontname', 'Unknown'),
+        'size': round(char.get('size', 0), 2),
+        'color': char.get('non_stroke_color', 'Unknown'),
+        'x': round(char.get('x0', 0), POSITION_PRECISION),
+        'y': round(char.get('top', 0), POSITION_PRECISION)
+    }
+
+
+def page_font_key(font_info):
+    """Key a per-page font entry by (fontname, size, color, position bucket)"""
+    return (
+        font_info['name'],
+        font_info['size'],
+        _hashable(font_info['color']),
+        font_info['x'],
+        font_info['y']
+    )
+
+
+def new_font_usage_stats():
+    """Create an empty usage table keyed by (font name, rounded size)"""
+    return defaultdict(lambda: {'count': 0, 'pages': set()})
+
+
+def aggregate_page_fonts(chars, page_number, font_usage_stats):
+    """
+    De-duplicate the font entries of one page and count font usage
+
+    Returns the distinct entries in first-seen order. Runs in linear time in
+    the number of characters.
+    """
+    page_fonts = {}
+
+    for char in chars:
+        font_info = char_font_info(char)
+
+        stats = font_usage_stats[(font_info['name'], font_info['size'])]
+        stats['count'] += 1
+        stats['pages'].add(page_number)
+
+        key = page_font_key(font_info)
+        if key not in page_fonts:
+            page_fonts[key] = font_info
+
+    return list(page_fonts.values())
+
+
+def aggregate_page_spans(chars, page_number, font_usage_stats):
+    """
+    Merge consecutive characters of one page into text runs and count font usage
+
+    A run continues while the font, size and color stay the same and the
+    characters stay on the same line, left to right. Each run carries its text
+    and bounding box, which is far smaller than one entry per character
+    position. Runs in linear time in the number of characters.
+    """
+    spans = []
+    span = None
+    span_key = None
+
+    for char in chars:
+        font_name = char.get('fontname', 'Unknown')
+        font_size = round(char.get('size', 0), 2)
+        color = char.get('non_stroke_color', 'Unknown')
+
+        stats = font_usage_stats[(font_name, font_size)]
+        stats['count'] += 1
+        stats['pages'].add(page_number)
+
+        x0, top = char.get('x0', 0), char.get('top', 0)
+        x1, bottom = char.get('x1', x0), char.get('bottom', top)
+        key = (font_name, font_size, _hashable(color))
+        tolerance = max(font_size, 1) * 0.5
+
+        if (span is not None and key == span_key and abs(top - span['bbox'][1]) <= tolerance
+                and x0 >= span['bbox'][2] - tolerance):
+            bbox = span['bbox']
+            if x0 - bbox[2] > font_size * SPAN_SPACE_GAP and not span['text'].endswith(' '):
+                span['text'] += ' '
+            span['text'] += char.get('text', '')
+            bbox[1], bbox[2], bbox[3] = min(bbox[1], top), max(bbox[2], x1), max(bbox[3], bottom)
+        else:
+            span = {
+                'text': char.get('text', ''),
+                'font': font_name,
+                'size': font_size,
+                'color': color,
+                'bbox': [x0, top, x1, bottom]
+            }
+            span_key = key
+            spans.append(span)
+
+    for span in spans:
+        span['bbox'] = [round(value, POSITION_PRECISION) for value in span['bbox']]
+    return spans
+
+
+def build_font_statistics(font_usage_stats):
+    """Convert a usage table into the `statistics` section of the response"""
+    statistics = {}
+    for (font_name, font_size), stats in font_usage_stats.items():
+        statistics[f"{font_name}_{font_size}"] = {
+            'font_name': font_name,
+            'font_size': float(font_size),
+            'usage_count': stats['count'],
+            'pages_used': sorted(stats['pages'])
+        }
+    return statistics
+
+
+def first_seen_fonts(pages_chars):
+    """
+    List each distinct (fontname, size) once, with the page it first appears on
+
+    `pages_chars` yields (page_number, chars) pairs in page order.
+    """
+    fonts_info = {}
+
+    for page_number, chars in pages_chars:
+        for char in chars:
+            font_name = char.get('fontname', 'Unknown')
+            font_size = char.get('size', 0)
+
+            key = (font_name, font_size)
+            if key not in fonts_info:
+                fonts_info[key] = {
+                    'name': font_name,
+                    'size': font_size,
+                    'page': page_number
+                }
+
+    return list(fonts_info.values())
+
+
+def merge_font_usage_stats(font_usage_stats, other):
+    """Fold the usage table of a later page range into `font_usage_stats`"""
+    for key, stats in other.items():
+        merged = font_usage_stats[key]
+        merged['count'] += stats['count']
+        merged['pages'].update(stats['pages'])
+    return font_usage_stats
+
+
+def merge_first_seen_fonts(font_lists):
+    """Merge first-seen font lists of consecutive page ranges, keeping the earliest page"""
+    fonts_info = {}
+    for fonts in font_lists:
+        for font in fonts:
+            fonts_info.setdefault((font['name'], font['size']), font)
+    return list(fonts_info.values())
+
+
+def new_corpus_rollup():
+    """Create an empty corpus rollup keyed by (font name, rounded size)"""
+    return defaultdict(lambda: {'documents': [], 'usage_count': 0})
+
+
+def add_document_fonts(rollup, document, fonts):
+    """
+    Record the fonts of one document in a corpus rollup
+
+    `fonts` yields (font name, size, usage count) triples; the count may be
+    None when the analysis does not report one.
+    """
+    for font_name, font_size, usage_count in fonts:
+        entry = rollup[(font_name, round(font_size, 2))]
+        if not entry['documents'] or entry['documents'][-1] != document:
+            entry['documents'].append(document)
+        entry['usage_count'] += usage_count or 0
+
+
+def build_corpus_rollup(rollup):
+    """Convert a corpus rollup into response entries, most widely used fonts first"""
+    entries = [
+        {
+            'font_name': font_name,
+            'font_size': float(font_size),
+            'document_count': len(entry['documents']),
+            'documents': entry['documents'],
+            'usage_count': entry['usage_count']
+        }
+        for (font_name, font_size), entry in rollup.items()
+    ]
+    entries.sort(key=lambda entry: (-entry['document_count'], entry['font_name'], entry['font_size']))
+    return entries
@@ -0,0 +1,195 @@
+"""
+Batch analysis service module
+Handles analyzing many PDFs, given as uploads or ZIP archive members, in one request
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .font_service import extract_fonts_from_pdf, extract_fonts_advanced
+    from .aggregation_service import new_corpus_rollup, add_document_fonts, build_corpus_rollup
+    from .cache_service import result_cache, cache_key
+    from .file_service import allowed_file, cleanup_file
+    from .parallel_service import get_executor, pool_task, POOL_WORKERS
+    from .metrics_service import merge_recorded
+    from .font_program_service import font_program_store
+    from ..config import UPLOAD_FOLDER, BATCH_MAX_FILES, BATCH_MAX_MEMBER_BYTES
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_service import extract_fonts_from_pdf, extract_fonts_advanced
+    from services.aggregation_service import new_corpus_rollup, add_document_fonts, build_corpus_rollup
+    from services.cache_service import result_cache, cache_key
+    from services.file_service import allowed_file, cleanup_file
+    from services.parallel_service import get_executor, pool_task, POOL_WORKERS
+    from services.metrics_service import merge_recorded
+    from services.font_program_service import font_program_store
+    from config import UPLOAD_FOLDER, BATCH_MAX_FILES, BATCH_MAX_MEMBER_BYTES
+
+# Analyses a batch can run; they share cache entries with the single-file endpoints
+BATCH_ANALYSES = {
+    'detailed': extract_fonts_from_pdf,
+    'advanced': extract_fonts_advanced
+}
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def is_archive(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'zip'
+
+
+def _analyze_member(kind, pdf_path):
+    """Run one batch analysis in a pool worker"""
+    return BATCH_ANALYSES[kind](pdf_path)
+
+
+def _document_fonts(kind, analysis):
+    """(font name, size, usage count) triples of one document's analysis"""
+    if kind == 'advanced':
+        for stats in analysis.get('statistics', {}).values():
+            yield stats['font_name'], stats['font_size'], stats['usage_count']
+    else:
+        for font in analysis:
+            yield font['name'], font['size'], None
+
+
+def iter_batch_members(files):
+    """
+    Yield (filename, archive, stream, size) for each PDF in a batch upload
+
+    `files` are uploads that are either PDFs or ZIP archives of PDFs. Archive
+    members are read one at a time from the spooled upload, so an archive is
+    never extracted as a whole. Other archive members are skipped; `size` is
+    None for plain uploads, and `stream` is None for an unreadable archive.
+    """
+    for file in files:
+        if not is_archive(file.filename):
+            file.stream.seek(0)
+            yield file.filename, None, file.stream, None
+            continue
+
+        try:
+            archive = zipfile.ZipFile(file.stream)
+        except zipfile.BadZipFile:
+            yield file.filename, None, None, None
+            continue
+
+        with archive:
+            for member in archive.infolist():
+                if member.is_dir() or not allowed_file(member.filename):
+                    continue
+                with archive.open(member) as stream:
+                    yield member.filename, file.filename, stream, member.file_size
+
+
+def _spool_member(stream):
+    """Copy a member to a temporary file in UPLOAD_FOLDER, returning its path and SHA-256"""
+    digest = hashlib.sha256()
+    fd, filepath = tempfile.mkstemp(suffix='.pdf', dir=UPLOAD_FOLDER)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        cleanup_file(filepath)
+        raise
+    return filepath, digest.hexdigest()
+
+
+def analyze_batch(files, kind='detailed'):
+    """
+    Analyze every PDF of a batch upload and roll their fonts up across documents
+
+    Members are spooled to disk one at a time and analyzed concurrently on the
+    page process pool, with at most two members per worker in flight. Results
+    already in the result cache are reused and new ones are stored, so a batch
+    and the single-file endpoints share work.
+
+    Returns the per-file results in upload order and the corpus rollup. The
+    embedded font programs found by fresh advanced analyses are recorded in
+    the font program store.
+    """
+    executor = get_executor()
+    max_in_flight = 2 * POOL_WORKERS['pages']
+
+    results = []
+    in_flight = {}
+    truncated = False
+
+    def collect(futures):
+        for future in futures:
+            index, filepath, key, digest = in_flight.pop(future)
+            cleanup_file(filepath)
+            try:
+                analysis = merge_recorded(future.result())
+            except Exception as e:
+                results[index].update(success=False, error=f'Failed to process PDF: {e}')
+                continue
+            result_cache.put(key, analysis)
+            results[index].update(success=True, font_analysis=analysis)
+            if kind == 'advanced':
+                try:
+                    font_program_store.record_document(digest, results[index]['filename'], analysis)
+                except sqlite3.Error as e:
+                    print(f"Warning: Could not record the font programs of {results[index]['filename']}: {e}")
+
+    try:
+        for filename, archive, stream, size in iter_batch_members(files):
+            if len(results) == BATCH_MAX_FILES:
+                truncated = True
+                break
+
+            result = {'filename': filename}
+            if archive:
+                result['archive'] = archive
+            results.append(result)
+
+            if stream is None:
+                result.update(success=False, error='Invalid ZIP archive')
+                continue
+            if size is not None and size > BATCH_MAX_MEMBER_BYTES:
+                result.update(success=False, error='File is too large to analyze in a batch')
+                continue
+
+            try:
+                filepath, digest = _spool_member(stream)
+            except (zipfile.BadZipFile, OSError, EOFError) as e:
+                result.update(success=False, error=f'Could not read file: {e}')
+                continue
+            key = cache_key(digest, kind)
+            cached = result_cache.get(key)
+            if cached is not None:
+                cleanup_file(filepath)
+                result.update(success=True, font_analysis=cached)
+                continue
+
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight[executor.submit(pool_task, _analyze_member, kind, filepath)] = (len(results) - 1, filepath, key, digest)
+
+        collect(wait(in_flight).done)
+    finally:
+        # Only reached with work in flight when reading the upload failed
+        for future, (_, filepath, _, _) in list(in_flight.items()):
+            future.cancel()
+            cleanup_file(filepath)
+
+    rollup = new_corpus_rollup()
+    for result in results:
+        if result['success']:
+            add_document_fonts(rollup, result['filename'], _document_fonts(kind, result['font_analysis']))
+
+    return {
+        'files': results,
+        'files_processed': sum(1 for result in results if result['success']),
+        'files_failed': sum(1 for result in results if not result['success']),
+        'truncated': truncated,
+        'font_rollup': build_corpus_rollup(rollup)
+    }
@@ -0,0 +1,188 @@
+"""
+Result cache service module
+Handles content-addressed caching of analysis results in memory and on disk
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..config import CACHE_FOLDER, CACHE_MEMORY_ENTRIES, CACHE_DISK_MAX_BYTES, PAGE_MAX_CHARS
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from config import CACHE_FOLDER, CACHE_MEMORY_ENTRIES, CACHE_DISK_MAX_BYTES, PAGE_MAX_CHARS
+
+# Bump when an analysis changes its output so stale entries are not served
+CACHE_VERSION = 5
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file):
+    """Compute the SHA-256 of an uploaded file without consuming its stream"""
+    stream = file.stream if hasattr(file, 'stream') else file
+    position = stream.tell()
+    stream.seek(0)
+
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+        digest.update(chunk)
+
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+def cache_key(digest, kind, params=None):
+    """
+    Build the cache key (also the ETag, see ETAG_SUFFIXES) for an analysis of a file
+
+    The key starts with the analysis kind so a tag sent to one endpoint never
+    matches a result cached by another. PAGE_MAX_CHARS truncates pages of any
+    analysis that lays them out, so it is part of every key.
+    """
+    material = json.dumps({
+        'version': CACHE_VERSION,
+        'page_max_chars': PAGE_MAX_CHARS,
+        'sha256': digest,
+        'kind': kind,
+        'params': params or {}
+    }, sort_keys=True)
+    return f"{kind}-{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+
+# Suffixes negotiated_response() adds to an ETag for each encoding of a result, so
+# every representation has its own strong validator
+ETAG_SUFFIXES = ('-gzip', '-msgpack')
+
+
+def key_from_etag(tag):
+    """The cache key named by an ETag of any representation of a result"""
+    for suffix in ETAG_SUFFIXES:
+        tag = tag.removesuffix(suffix)
+    return tag
+
+
+class ResultCache:
+    """Two-tier result cache: an in-memory LRU in front of a size-bounded directory"""
+
+    def __init__(self, folder, memory_entries, disk_max_bytes):
+        self.folder = folder
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        self.folder.mkdir(exist_ok=True)
+
+    def _path(self, key):
+        return self.folder / f"{key}.json"
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # Refresh the modification time so disk eviction is least-recently-used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters['misses'] += 1
+            return None
+
+        with self._lock:
+            self._counters['disk_hits'] += 1
+            self._remember(key, value)
+        return value
+
+    def contains(self, key):
+        """Check for `key` without loading it or touching the counters"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self._path(key).exists()
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under `key` in both tiers"""
+        with self._lock:
+            self._remember(key, value)
+            self._counters['stores'] += 1
+
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write cache entry {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._enforce_disk_limit()
+
+    def _enforce_disk_limit(self):
+        """Delete the least recently used files until the folder fits the size bound"""
+        entries = []
+        total = 0
+        for path in self.folder.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.disk_max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._counters['evictions'] += 1
+            if total <= self.disk_max_bytes:
+                break
+
+    def stats(self):
+        """Hit/miss counters and current tier sizes"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['memory_entries'] = len(self._memory)
+
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_ratio'] = round((counters['memory_hits'] + counters['disk_hits']) / lookups, 4) if lookups else 0.0
+        counters['disk_bytes'] = 0
+        for path in self.folder.glob('*.json'):
+            try:
+                counters['disk_bytes'] += path.stat().st_size
+            except OSError:
+                # Evicted by another thread or process since the glob
+                continue
+        return counters
+
+
+result_cache = ResultCache(CACHE_FOLDER, CACHE_MEMORY_ENTRIES, CACHE_DISK_MAX_BYTES)
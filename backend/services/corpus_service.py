@@ -0,0 +1,376 @@
+"""
+Corpus export service module
+Handles analyzing directory trees of PDFs offline into Parquet or Arrow files
+
+Run from the backend directory:
+    python -m services.corpus_service /data/pdfs --output /data/font-audit
+    python -m services.corpus_service /data/pdfs --output /data/font-audit --format arrow --ocr
+
+Files are analyzed one per worker of the page process pool (PARALLEL_WORKERS)
+without going through the HTTP API. The output folder holds one dataset
+folder per table, each made of numbered part files:
+
+- chars: one row per character (path, page, text, fontname, size, x, y)
+- fonts: one row per font resource of each file, as in basic_info
+- pages: with --ocr, the selective OCR text of each page
+
+manifest.jsonl lists every finished file with the part holding its rows. A
+rerun with the same output folder skips the files listed there, so an
+interrupted run resumes where it left off; parts written after the last
+manifest entry are removed first, so no rows are written twice.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .font_service import extract_document_columns
+    from .ocr_service import iter_text_selective_ocr, ocr_available, OCR_MISSING_ERROR
+    from .file_service import allowed_file
+    from .parallel_service import get_executor, pool_task, POOL_WORKERS
+    from .metrics_service import merge_recorded
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_service import extract_document_columns
+    from services.ocr_service import iter_text_selective_ocr, ocr_available, OCR_MISSING_ERROR
+    from services.file_service import allowed_file
+    from services.parallel_service import get_executor, pool_task, POOL_WORKERS
+    from services.metrics_service import merge_recorded
+
+# Output formats and their part file extensions
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+
+TABLES = ('chars', 'fonts', 'pages')
+
+# A part is written once this many characters, or files, have been analyzed
+BATCH_ROWS = 1_000_000
+BATCH_FILES = 1000
+
+MANIFEST_NAME = 'manifest.jsonl'
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _schemas():
+    import pyarrow as pa
+
+    labels = pa.dictionary(pa.int32(), pa.string())
+    return {
+        'chars': pa.schema([
+            ('path', labels), ('page', pa.int32()), ('text', pa.string()), ('fontname', labels),
+            ('size', pa.float64()), ('x', pa.float64()), ('y', pa.float64())
+        ]),
+        'fonts': pa.schema([
+            ('path', pa.string()), ('name', pa.string()), ('subtype', pa.string()), ('basefont', pa.string()),
+            ('object_id', pa.int64()), ('pages', pa.list_(pa.int32())), ('program_hash', pa.string()),
+            ('program_type', pa.string()), ('glyph_count', pa.int32()), ('identified_as', pa.string()),
+            ('identified_distance', pa.float64())
+        ]),
+        'pages': pa.schema([
+            ('path', pa.string()), ('page', pa.int32()), ('source', pa.string()), ('reason', pa.string()),
+            ('text', pa.string())
+        ])
+    }
+
+
+def find_pdfs(root):
+    """Paths of the PDFs under `root`, relative to it, in a stable order"""
+    for folder, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if allowed_file(filename):
+                yield Path(folder, filename).relative_to(root).as_posix()
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _document_tables(relative, analysis, ocr_results):
+    """Rows of one file for each table, as pyarrow tables"""
+    import pyarrow as pa
+
+    schemas = _schemas()
+    chars = analysis['chars']
+    char_count = len(chars['text'])
+    fonts = analysis['fonts']
+
+    tables = {
+        'chars': pa.Table.from_arrays([
+            pa.DictionaryArray.from_arrays(pa.array([0] * char_count, pa.int32()), pa.array([relative])),
+            pa.array(chars['page'], pa.int32()),
+            pa.array(chars['text'], pa.string()),
+            pa.array(chars['fontname'], pa.string()).dictionary_encode(),
+            pa.array(chars['size'], pa.float64()),
+            pa.array(chars['x'], pa.float64()),
+            pa.array(chars['y'], pa.float64())
+        ], schema=schemas['chars']),
+        'fonts': pa.Table.from_pylist([
+            {
+                'path': relative,
+                'name': font['name'],
+                'subtype': font['subtype'],
+                'basefont': font['basefont'],
+                'object_id': font['object_id'],
+                'pages': font['pages'],
+                'program_hash': (font['font_program'] or {}).get('hash'),
+                'program_type': (font['font_program'] or {}).get('type'),
+                'glyph_count': (font['font_program'] or {}).get('glyph_count'),
+                'identified_as': (font['identified_as'] or {}).get('name'),
+                'identified_distance': (font['identified_as'] or {}).get('distance')
+            }
+            for font in fonts
+        ], schema=schemas['fonts'])
+    }
+    if ocr_results is not None:
+        tables['pages'] = pa.Table.from_pylist([
+            {'path': relative, 'page': result['page'], 'source': result['source'],
+             'reason': result['reason'], 'text': result['extracted_text']}
+            for result in ocr_results
+        ], schema=schemas['pages'])
+    return tables
+
+
+def _export_file(root, relative, ocr=False):
+    """Analyze one file in a pool worker, returning its manifest entry and its table rows"""
+    path = os.path.join(root, relative)
+    stat = os.stat(path)
+    analysis = extract_document_columns(path)
+    ocr_results = list(iter_text_selective_ocr(path)) if ocr else None
+    tables = _document_tables(relative, analysis, ocr_results)
+
+    entry = {
+        'path': relative,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': _file_digest(path),
+        'page_count': analysis['page_count'],
+        'char_count': tables['chars'].num_rows,
+        'font_count': tables['fonts'].num_rows
+    }
+    return entry, tables
+
+
+class Manifest:
+    """Append-only JSON lines record of the files an export has finished, by relative path"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.recorded_parts = set()
+        if not path.exists():
+            return
+
+        with open(path, 'rb+') as f:
+            data = f.read()
+            # Drop a last line cut short by an interrupted write, so appends start on a new line
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                f.truncate(complete)
+        for line in data[:complete].splitlines():
+            entry = json.loads(line)
+            self.entries[entry['path']] = entry
+            self.recorded_parts.add(entry['part'])
+
+    def append(self, entries):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.update((entry['path'], entry) for entry in entries)
+        self.recorded_parts.update(entry['part'] for entry in entries)
+
+
+class PartWriter:
+    """Buffers the rows of analyzed files and writes them as one numbered part file per table"""
+
+    def __init__(self, output, fmt, part):
+        self.output = output
+        self.extension = FORMATS[fmt]
+        self.part = part
+        self.entries = []
+        self.tables = {table: [] for table in TABLES}
+        self.rows = 0
+
+    def add(self, entry, tables):
+        self.entries.append(entry)
+        for table, rows in tables.items():
+            if rows.num_rows:
+                self.tables[table].append(rows)
+        self.rows += entry.get('char_count', 0)
+
+    def full(self, batch_rows, batch_files):
+        return self.rows >= batch_rows or len(self.entries) >= batch_files
+
+    def _write(self, table, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Dictionaries differ per file; the Arrow file format needs one per column
+        table = pa.concat_tables(table).unify_dictionaries()
+        if self.extension == '.parquet':
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def flush(self, manifest):
+        """Write the buffered rows, then record their files in the manifest; returns those entries"""
+        if not self.entries:
+            return []
+
+        for table, rows in self.tables.items():
+            if not rows:
+                continue
+            folder = self.output / table
+            folder.mkdir(exist_ok=True)
+            path = folder / f'part-{self.part:05d}{self.extension}'
+            temporary = path.with_name(path.name + '.tmp')
+            self._write(rows, temporary)
+            os.replace(temporary, path)
+
+        entries = [dict(entry, part=self.part) for entry in self.entries]
+        manifest.append(entries)
+        self.part += 1
+        self.entries = []
+        self.tables = {table: [] for table in TABLES}
+        self.rows = 0
+        return entries
+
+
+def _remove_unrecorded_parts(output, manifest, fmt):
+    """Delete parts written after the last manifest entry, returning the next part number"""
+    recorded = manifest.recorded_parts
+    for table in TABLES:
+        folder = output / table
+        if not folder.is_dir():
+            continue
+        for path in folder.iterdir():
+            name, _, extension = path.name.partition('.')
+            if not name.startswith('part-'):
+                continue
+            if path.suffix == '.tmp' or int(name[5:]) not in recorded:
+                path.unlink()
+            elif '.' + extension != FORMATS[fmt]:
+                raise ValueError(f'{output} holds {extension} parts; resume it with the same format')
+    return max(recorded, default=-1) + 1
+
+
+def export_corpus(root, output, fmt='parquet', ocr=False, batch_rows=BATCH_ROWS, batch_files=BATCH_FILES,
+                  retry_failed=False, log=print):
+    """
+    Analyze every PDF under `root` into part files in `output`, resuming an earlier run
+
+    Files already in the output's manifest are skipped, including ones that
+    failed unless `retry_failed`. Files are analyzed on the page process pool
+    with at most two per worker in flight, and a part is written every
+    `batch_rows` characters or `batch_files` files. Returns counts of the
+    files skipped, exported and failed and of the characters written.
+    """
+    root = Path(root)
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    manifest = Manifest(output / MANIFEST_NAME)
+    writer = PartWriter(output, fmt, _remove_unrecorded_parts(output, manifest, fmt))
+    executor = get_executor()
+    max_in_flight = 2 * POOL_WORKERS['pages']
+
+    summary = {'skipped': 0, 'exported': 0, 'failed': 0, 'chars': 0}
+    in_flight = {}
+
+    def flush():
+        entries = writer.flush(manifest)
+        if entries:
+            failed = sum(1 for entry in entries if 'error' in entry)
+            chars = sum(entry.get('char_count', 0) for entry in entries)
+            summary['exported'] += len(entries) - failed
+            summary['failed'] += failed
+            summary['chars'] += chars
+            log(f'Wrote part {entries[0]["part"]}: {len(entries)} files ({failed} failed), {chars} characters')
+
+    def collect(futures):
+        for future in futures:
+            relative = in_flight.pop(future)
+            try:
+                entry, tables = merge_recorded(future.result())
+            except Exception as e:
+                entry, tables = {'path': relative, 'error': f'Failed to process PDF: {e}'}, {}
+            writer.add(entry, tables)
+            if writer.full(batch_rows, batch_files):
+                flush()
+
+    try:
+        for relative in find_pdfs(root):
+            recorded = manifest.entries.get(relative)
+            if recorded is not None and not (retry_failed and 'error' in recorded):
+                summary['skipped'] += 1
+                continue
+
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight[executor.submit(pool_task, _export_file, str(root), relative, ocr)] = relative
+
+        collect(wait(in_flight).done)
+    except KeyboardInterrupt:
+        # Keep what has been analyzed so far; the rest is picked up on the next run
+        for future in in_flight:
+            future.cancel()
+        collect([future for future in in_flight if future.done() and not future.cancelled() and future.exception() is None])
+        flush()
+        raise
+    flush()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze a directory tree of PDFs into Parquet or Arrow files')
+    parser.add_argument('root', help='directory searched for .pdf files')
+    parser.add_argument('--output', required=True, help='output folder; rerun with the same folder to resume')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet', help='part file format')
+    parser.add_argument('--ocr', action='store_true', help='also write the selective OCR text of every page')
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help='characters per part file')
+    parser.add_argument('--batch-files', type=int, default=BATCH_FILES, help='files per part file')
+    parser.add_argument('--retry-failed', action='store_true', help='analyze files that failed in an earlier run again')
+    args = parser.parse_args(argv)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print('The corpus export requires pyarrow')
+        return 1
+    if args.ocr and not ocr_available():
+        print(OCR_MISSING_ERROR)
+        return 1
+
+    try:
+        summary = export_corpus(args.root, args.output, args.format, args.ocr, args.batch_rows,
+                                args.batch_files, args.retry_failed)
+    except KeyboardInterrupt:
+        print('Interrupted; run the same command again to resume')
+        return 130
+    except ValueError as e:
+        print(e)
+        return 1
+
+    print(f"Exported {summary['exported']} files ({summary['chars']} characters), "
+          f"{summary['failed']} failed, {summary['skipped']} already exported")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
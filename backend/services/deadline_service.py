@@ -0,0 +1,221 @@
+"""
+Deadline service module
+Handles the per-request time budget and the per-page limits of page-by-page analyses
+
+A request may give a `deadline_ms` budget. The page loops of the advanced
+and OCR analyses check it before each page and stop when it has passed,
+returning what they have so far; pages are also cut short by it. Each page
+is limited on its own as well: laying out a page stops after PAGE_MAX_CHARS
+characters or PAGE_MAX_SECONDS seconds, and so does running Tesseract on it.
+
+What was done is reported by a PageCoverage summary listing the pages
+completed, truncated (analyzed in part) and skipped, each with a reason:
+
+- max_chars: the page has more than PAGE_MAX_CHARS characters
+- page_time: the page took longer than PAGE_MAX_SECONDS
+- deadline: the request's deadline passed
+- error: the page could not be analyzed
+
+The deadline is a wall-clock time, so it can be handed to pool workers
+(see pool_task) and holds across processes.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..config import PAGE_MAX_CHARS, PAGE_MAX_SECONDS
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from config import PAGE_MAX_CHARS, PAGE_MAX_SECONDS
+
+# Reasons that depend on how fast the server was, so results reporting them are not cached
+TIMING_REASONS = ('page_time', 'deadline')
+
+# Wall-clock time at which the analysis running in this context must stop
+_current_deadline = ContextVar('analysis_deadline', default=None)
+
+
+class PageLimitReached(Exception):
+    """Raised while processing a page that reached a per-page limit or the deadline; `reason` names which"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def parse_deadline(value):
+    """Validate the `deadline_ms` request parameter; returns milliseconds or None"""
+    if not value:
+        return None
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError('deadline_ms must be a positive number of milliseconds')
+    return int(value)
+
+
+def deadline_from_now(deadline_ms):
+    """Wall-clock time `deadline_ms` from now, or None without a deadline"""
+    return None if deadline_ms is None else time.time() + deadline_ms / 1000
+
+
+@contextmanager
+def deadline_at(stop_at):
+    """Make `stop_at` (see deadline_from_now) the deadline of the analyses run in the block"""
+    if stop_at is None:
+        yield
+        return
+
+    token = _current_deadline.set(stop_at)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline():
+    """Deadline of the analysis running in this context, or None"""
+    return _current_deadline.get()
+
+
+def seconds_left():
+    """Seconds until the deadline (at least 0), or None without one"""
+    stop_at = _current_deadline.get()
+    return None if stop_at is None else max(0.0, stop_at - time.time())
+
+
+def deadline_passed():
+    stop_at = _current_deadline.get()
+    return stop_at is not None and time.time() >= stop_at
+
+
+def page_time_left(started):
+    """
+    (seconds, reason) left for a page started at `started` under PAGE_MAX_SECONDS and the deadline
+
+    `reason` is the limit that will stop the page. Returns (None, None) when
+    neither applies.
+    """
+    stop_at, reason = None, None
+    if PAGE_MAX_SECONDS:
+        stop_at, reason = started + PAGE_MAX_SECONDS, 'page_time'
+    deadline = _current_deadline.get()
+    if deadline is not None and (stop_at is None or deadline < stop_at):
+        stop_at, reason = deadline, 'deadline'
+    if stop_at is None:
+        return None, None
+    return stop_at - time.time(), reason
+
+
+@lru_cache(maxsize=None)
+def _limited_aggregator_class():
+    """pdfplumber's page aggregator, stopping the content stream at a character count or a time"""
+    from pdfplumber.page import PDFPageAggregatorWithMarkedContent
+
+    class LimitedPageAggregator(PDFPageAggregatorWithMarkedContent):
+        def __init__(self, *args, max_chars=0, stop_at=None, time_reason=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.max_chars = max_chars
+            self.stop_at = stop_at
+            self.time_reason = time_reason
+            self.char_count = 0
+
+        def _check_time(self):
+            if self.stop_at is not None and time.time() >= self.stop_at:
+                raise PageLimitReached(self.time_reason)
+
+        def render_char(self, *args, **kwargs):
+            if self.max_chars and self.char_count >= self.max_chars:
+                raise PageLimitReached('max_chars')
+            self._check_time()
+            self.char_count += 1
+            return super().render_char(*args, **kwargs)
+
+        def paint_path(self, *args, **kwargs):
+            self._check_time()
+            return super().paint_path(*args, **kwargs)
+
+        def render_image(self, *args, **kwargs):
+            self._check_time()
+            return super().render_image(*args, **kwargs)
+
+    return LimitedPageAggregator
+
+
+def lay_out_page(page):
+    """
+    Lay out a pdfplumber page within PAGE_MAX_CHARS, PAGE_MAX_SECONDS and the deadline
+
+    The layout is left on the page for page.chars and page.images, as
+    page.layout would leave it. Returns the reason the content stream was cut
+    short ('max_chars', 'page_time' or 'deadline'), or None if the whole page
+    was laid out.
+    """
+    from pdfminer.pdfinterp import PDFPageInterpreter
+
+    if hasattr(page, '_layout'):
+        return None
+    time_left, time_reason = page_time_left(time.time())
+    if not PAGE_MAX_CHARS and time_left is None:
+        return None
+
+    device = _limited_aggregator_class()(
+        page.pdf.rsrcmgr, pageno=page.page_number, laparams=page.pdf.laparams, max_chars=PAGE_MAX_CHARS,
+        stop_at=None if time_left is None else time.time() + time_left, time_reason=time_reason
+    )
+    interpreter = PDFPageInterpreter(page.pdf.rsrcmgr, device)
+    reason = None
+    try:
+        interpreter.process_page(page.page_obj)
+    except PageLimitReached as e:
+        # Close the Form XObjects left open and finish the page with what was laid out so far
+        while device._stack:
+            device.end_figure(None)
+        device.end_page(page.page_obj)
+        reason = e.reason
+
+    page._layout = device.get_result()
+    return reason
+
+
+class PageCoverage:
+    """Which pages of an analysis were completed, truncated or skipped, and why"""
+
+    def __init__(self):
+        self.completed = []
+        self.truncated = {}
+        self.skipped = {}
+
+    def page_done(self, page_number, truncated=None):
+        """Record a page as analyzed, in part if `truncated` gives a reason"""
+        if truncated:
+            self.truncated[page_number] = truncated
+        else:
+            self.completed.append(page_number)
+
+    def page_skipped(self, page_number, reason):
+        self.skipped[page_number] = reason
+
+    def merge(self, summary):
+        """Add the pages of another coverage's summary, e.g. from a pool worker"""
+        self.completed.extend(summary['pages_completed'])
+        self.truncated.update((entry['page'], entry['reason']) for entry in summary['pages_truncated'])
+        self.skipped.update((entry['page'], entry['reason']) for entry in summary['pages_skipped'])
+
+    def summary(self):
+        return {
+            'complete': not self.truncated and not self.skipped,
+            'pages_completed': sorted(self.completed),
+            'pages_truncated': [{'page': page, 'reason': reason} for page, reason in sorted(self.truncated.items())],
+            'pages_skipped': [{'page': page, 'reason': reason} for page, reason in sorted(self.skipped.items())]
+        }
+
+
+def depends_on_timing(analysis):
+    """Whether an analysis result's coverage was limited by time, so another run could differ"""
+    coverage = analysis.get('coverage') if isinstance(analysis, dict) else None
+    if not coverage:
+        return False
+    entries = coverage['pages_truncated'] + coverage['pages_skipped']
+    return any(entry['reason'] in TIMING_REASONS for entry in entries)
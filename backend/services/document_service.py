@@ -0,0 +1,74 @@
+"""
+Document store service module
+Handles keeping uploaded PDFs by content hash so later requests can refer to them by id
+"""
+import os
+import re
+import shutil
+import tempfile
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .cache_service import file_digest
+    from .file_service import cleanup_file
+    from ..config import DOCUMENTS_FOLDER
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.cache_service import file_digest
+    from services.file_service import cleanup_file
+    from config import DOCUMENTS_FOLDER
+
+_DOCUMENT_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+class DocumentStore:
+    """
+    Content-addressed directory of PDFs
+
+    A document's id is the SHA-256 of its bytes, so uploading the same file
+    twice stores it once. Files are removed by the upload sweeper once they
+    have not been used for DOCUMENT_RETENTION seconds.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.folder.mkdir(exist_ok=True)
+
+    def _path(self, document_id):
+        return self.folder / f"{document_id}.pdf"
+
+    def put(self, file):
+        """Store an upload and return its document id"""
+        document_id = file_digest(file)
+        path = self._path(document_id)
+        if path.exists():
+            os.utime(path)
+            return document_id
+
+        stream = file.stream if hasattr(file, 'stream') else file
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                stream.seek(0)
+                shutil.copyfileobj(stream, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            cleanup_file(tmp_path)
+            raise
+        return document_id
+
+    def path(self, document_id):
+        """Path of a stored document, or None for an unknown or malformed id"""
+        if not document_id or not _DOCUMENT_ID.match(document_id):
+            return None
+
+        path = self._path(document_id)
+        try:
+            # Using a document keeps it from being swept
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+
+document_store = DocumentStore(DOCUMENTS_FOLDER)
@@ -2,10 +2,24 @@
 File handling service module
 Handles file validation, saving, and cleanup operations
 """
+import io
+import mmap
 import os
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from werkzeug.utils import secure_filename
 
+try:
+    # Try relative imports first (when run as part of the package)
+    from .metrics_service import timed_stage
+    from ..config import UPLOAD_MMAP_THRESHOLD
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.metrics_service import timed_stage
+    from config import UPLOAD_MMAP_THRESHOLD
+
 
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'pdf'}
@@ -32,6 +46,143 @@ def cleanup_file(filepath):
         pass
     return False
 
+def is_file_path(source):
+    """Whether a PDF source is a filesystem path rather than an open buffer"""
+    return isinstance(source, (str, os.PathLike))
+
+@contextmanager
+def open_binary(source):
+    """Open a path for binary reading, or rewind an already open buffer"""
+    if is_file_path(source):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+def open_pdf(source, pages=None):
+    """
+    Open a PDF path or buffer with pdfplumber, limited to `pages` if given
+
+    The cross-reference table and page tree are read here, timed as the
+    `parse` stage, rather than on first use of `pdf.pages`.
+    """
+    import pdfplumber
+
+    with timed_stage('parse'):
+        pdf = pdfplumber.open(source, pages=pages)
+        try:
+            pdf.pages
+        except Exception:
+            pdf.close()
+            raise
+    return pdf
+
+class MappedFile(io.RawIOBase):
+    """Read-only file object over a memory map of an open file"""
+
+    def __init__(self, fileobj):
+        super().__init__()
+        self._map = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._map[self._position:self._position + len(buffer)]
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._map)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._map.close()
+        super().close()
+
+@contextmanager
+def open_upload_buffer(file, upload_folder):
+    """
+    Yield something pdfminer and pdfplumber can read an upload from
+
+    Werkzeug spools uploads to memory or an anonymous temporary file, so the
+    spooled buffer is used directly (memory-mapped from UPLOAD_MMAP_THRESHOLD
+    bytes). Only a stream that cannot be seeked is saved to `upload_folder`,
+    in which case a path is yielded and the file is removed afterwards.
+    """
+    stream = file.stream
+    # SpooledTemporaryFile keeps its BytesIO or temporary file in `_file`
+    buffer = getattr(stream, '_file', stream)
+
+    if isinstance(buffer, io.BytesIO):
+        buffer.seek(0)
+        yield buffer
+        return
+
+    try:
+        size = os.fstat(buffer.fileno()).st_size if buffer.seekable() else None
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        size = None
+
+    if size is not None:
+        if size >= UPLOAD_MMAP_THRESHOLD:
+            mapped = MappedFile(buffer)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+        else:
+            buffer.seek(0)
+            yield buffer
+        return
+
+    with timed_stage('upload'):
+        filepath = save_uploaded_file(file, upload_folder)
+    try:
+        yield filepath
+    finally:
+        cleanup_file(filepath)
+
+def sweep_stale_uploads(upload_folder, max_age):
+    """Remove files older than `max_age` seconds left behind by crashed requests"""
+    removed = 0
+    cutoff = time.time() - max_age
+    for entry in os.scandir(upload_folder):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+def start_upload_sweeper(upload_folder, max_age, interval):
+    """Sweep `upload_folder` now and then every `interval` seconds on a daemon thread"""
+    def sweep():
+        while True:
+            removed = sweep_stale_uploads(upload_folder, max_age)
+            if removed:
+                print(f"Removed {removed} stale upload(s) from {upload_folder}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=sweep, name='upload-sweeper', daemon=True)
+    thread.start()
+    return thread
+
 def format_font_data_for_response(font_data):
     """Format font data for API response"""
     return {
@@ -0,0 +1,437 @@
+"""
+Font fingerprint service module
+Handles identifying PDF fonts by their metrics against an index of known fonts
+
+A fingerprint is a vector of the advance widths of the printable ASCII
+characters (in em units) followed by a few FontDescriptor metrics. Characters
+a font does not cover are NaN, so a subset font is compared only on the glyphs
+it kept. Names play no part: `ABCDEF+Arial` or a renamed font match on their
+metrics alone.
+
+The index is a NumPy array of fingerprints, memory-mapped from
+FONT_INDEX_FOLDER, with a JSON list of the fonts it describes. Build it from
+local font files, run from the backend directory:
+    python -m services.fingerprint_service /usr/share/fonts ~/.fonts
+
+Without a built index the 14 standard PDF fonts are matched from pdfminer's
+bundled metrics. Identification needs numpy and, to build from font files,
+PIL; without numpy no font is identified.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .metrics_service import timed_stage
+    from ..config import FONT_INDEX_FOLDER, FONT_MATCH_MAX_DISTANCE
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.metrics_service import timed_stage
+    from config import FONT_INDEX_FOLDER, FONT_MATCH_MAX_DISTANCE
+
+# Fingerprint layout: one width per probe character, then the metrics
+PROBE_CHARS = ''.join(chr(code) for code in range(0x20, 0x7F))
+METRIC_FIELDS = ('ascent', 'descent', 'cap_height', 'x_height', 'italic')
+# Relative weight of each metric against one width. Producers copy the
+# vertical metrics from different font tables or guess them, so they count for
+# less than a width
+METRIC_WEIGHTS = (0.25, 0.25, 0.5, 0.5, 1.0)
+# Width and metric differences are capped at this many ems, so one wrong
+# metric or glyph mapping cannot outweigh dozens of matching widths; an
+# italic mismatch is never capped
+MAX_DIFFERENCE = 0.1
+
+# Fonts with fewer known widths than this are not identified
+MIN_KNOWN_WIDTHS = 8
+# Share of the query's weight an indexed font must cover to be considered
+MIN_COVERAGE = 0.9
+# Fonts ranked by the approximate distance that get the exact one
+RERANK_CANDIDATES = 16
+# Matches this close to the best one are tied and compared by name
+TIE_DISTANCE = 0.0005
+TIE_CANDIDATES = 4
+
+FONT_FILE_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+# Styles that are not added to the family name of a match
+REGULAR_STYLES = {'regular', 'roman', 'book', 'normal', 'medium'}
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def fingerprint_available():
+    """Check if numpy is available for font identification"""
+    try:
+        import numpy
+        return True
+    except ImportError:
+        return False
+
+
+def _new_fingerprint():
+    import numpy as np
+
+    return np.full(len(PROBE_CHARS) + len(METRIC_FIELDS), np.nan, dtype=np.float32)
+
+
+def _weights():
+    import numpy as np
+
+    return np.array((1.0,) * len(PROBE_CHARS) + METRIC_WEIGHTS, dtype=np.float32)
+
+
+def _difference_limits():
+    import numpy as np
+
+    limits = np.full(len(PROBE_CHARS) + len(METRIC_FIELDS), MAX_DIFFERENCE, dtype=np.float32)
+    limits[len(PROBE_CHARS) + METRIC_FIELDS.index('italic')] = 1.0
+    return limits
+
+
+def _set_metrics(fingerprint, metrics):
+    """Write the non-zero `metrics` (a dict keyed by METRIC_FIELDS) into a fingerprint"""
+    for offset, field in enumerate(METRIC_FIELDS):
+        value = metrics.get(field)
+        if value is not None and (value or field == 'italic'):
+            fingerprint[len(PROBE_CHARS) + offset] = value
+
+
+def _comparable_name(name):
+    """Font name without a subset prefix, spaces or punctuation, lowercased"""
+    name = str(name)
+    if len(name) > 7 and name[6] == '+':
+        name = name[7:]
+    return ''.join(char for char in name.lower() if char.isalnum())
+
+
+def _style_of(name):
+    """Style part of a PostScript name such as Helvetica-BoldOblique"""
+    return name.split('-', 1)[1] if '-' in name else 'Regular'
+
+
+def pdf_font_fingerprint(spec, rsrcmgr=None, objid=None):
+    """
+    Fingerprint of a resolved PDF font dictionary, or None
+
+    The dictionary is loaded through pdfminer, which applies /FirstChar and
+    /Widths (or /W for CID fonts), the encoding and /ToUnicode, and supplies
+    the metrics of the standard 14 fonts. Passing the document's resource
+    manager and the font's object id shares the loaded font with page layout.
+    """
+    from pdfminer.pdffont import PDFType3Font, PDFUnicodeNotDefined
+    from pdfminer.pdfinterp import PDFResourceManager
+    from pdfminer.pdftypes import num_value, resolve1
+
+    try:
+        font = (rsrcmgr or PDFResourceManager(caching=False)).get_font(objid, spec)
+    except Exception:
+        return None
+
+    fingerprint = _new_fingerprint()
+    probe_index = {char: index for index, char in enumerate(PROBE_CHARS)}
+    known = 0
+    for code, width in font.widths.items():
+        # The standard 14 fonts' widths are keyed by character, others by code
+        if isinstance(code, str):
+            char = code
+        else:
+            try:
+                char = font.to_unichr(code)
+            except (PDFUnicodeNotDefined, KeyError, TypeError, ValueError):
+                continue
+        index = probe_index.get(char)
+        if index is None or not width or not isinstance(width, (int, float)):
+            continue
+        if fingerprint[index] != fingerprint[index]:  # NaN: first code for this character
+            known += 1
+        fingerprint[index] = width * font.hscale
+
+    if known < MIN_KNOWN_WIDTHS:
+        return None
+
+    # Type 3 metrics are in glyph space rather than thousandths of an em
+    if not isinstance(font, PDFType3Font):
+        descriptor = font.descriptor or {}
+        _set_metrics(fingerprint, {
+            'ascent': font.ascent / 1000,
+            'descent': font.descent / 1000,
+            'cap_height': num_value(resolve1(descriptor.get('CapHeight', 0))) / 1000,
+            'x_height': num_value(resolve1(descriptor.get('XHeight', 0))) / 1000,
+            'italic': 1.0 if font.italic_angle else 0.0
+        })
+    return fingerprint
+
+
+def standard_font_entries():
+    """(font, fingerprint) of the 14 standard PDF fonts, from pdfminer's metrics"""
+    from pdfminer.fontmetrics import FONT_METRICS
+
+    entries = []
+    for name, (descriptor, widths) in FONT_METRICS.items():
+        # pdfminer also lists aliases such as Arial under the metrics of Helvetica
+        if descriptor.get('FontName') != name:
+            continue
+        fingerprint = _new_fingerprint()
+        for index, char in enumerate(PROBE_CHARS):
+            if widths.get(char):
+                fingerprint[index] = widths[char] / 1000
+        _set_metrics(fingerprint, {
+            'ascent': descriptor.get('Ascent', 0) / 1000,
+            'descent': descriptor.get('Descent', 0) / 1000,
+            'cap_height': descriptor.get('CapHeight', 0) / 1000,
+            'x_height': descriptor.get('XHeight', 0) / 1000,
+            'italic': 1.0 if descriptor.get('ItalicAngle') else 0.0
+        })
+        font = {
+            'name': name,
+            'family': descriptor.get('FontFamily', name.split('-')[0]),
+            'style': _style_of(name),
+            'source': 'standard'
+        }
+        entries.append((font, fingerprint))
+    return entries
+
+
+def font_file_fingerprint(font):
+    """Fingerprint of a PIL FreeTypeFont loaded at size 1000"""
+    fingerprint = _new_fingerprint()
+
+    # Missing characters are drawn with the .notdef glyph
+    def signature(char):
+        return font.getlength(char), font.getbbox(char)
+
+    notdef = signature('\U000FFFFD')
+    for index, char in enumerate(PROBE_CHARS):
+        if char == ' ' or signature(char) != notdef:
+            fingerprint[index] = font.getlength(char) / 1000
+
+    def height(char):
+        if fingerprint[PROBE_CHARS.index(char)] != fingerprint[PROBE_CHARS.index(char)]:
+            return None
+        return -font.getbbox(char, anchor='ls')[1] / 1000
+
+    ascent, descent = font.getmetrics()
+    style = font.getname()[1] or ''
+    _set_metrics(fingerprint, {
+        'ascent': ascent / 1000,
+        'descent': -descent / 1000,
+        'cap_height': height('H'),
+        'x_height': height('x'),
+        'italic': 1.0 if 'italic' in style.lower() or 'oblique' in style.lower() else 0.0
+    })
+    return fingerprint
+
+
+def _font_file_faces(path):
+    """PIL fonts of every face in a font file (several for .ttc collections)"""
+    from PIL import ImageFont
+
+    face = 0
+    while True:
+        try:
+            yield ImageFont.truetype(path, size=1000, index=face)
+        except OSError:
+            return
+        if not path.lower().endswith('.ttc'):
+            return
+        face += 1
+
+
+def font_file_entries(font_dirs):
+    """(font, fingerprint) of every face of the font files under `font_dirs`"""
+    entries = []
+    for font_dir in font_dirs:
+        for root, _, filenames in os.walk(os.path.expanduser(font_dir)):
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(FONT_FILE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                for face in _font_file_faces(path):
+                    try:
+                        fingerprint = font_file_fingerprint(face)
+                    except Exception as e:
+                        print(f"Warning: Could not fingerprint {path}: {e}")
+                        continue
+                    family, style = face.getname()
+                    style = style or 'Regular'
+                    name = family if style.lower() in REGULAR_STYLES else f'{family} {style}'
+                    entries.append(({'name': name, 'family': family, 'style': style, 'source': path}, fingerprint))
+    return entries
+
+
+class FontIndex:
+    """
+    Fingerprints of known fonts with a vectorized nearest-neighbour lookup
+
+    `terms` holds three rows per font: its fingerprint with unknown
+    dimensions zeroed, their squares, and a 0/1 mask of the known ones. The
+    weighted squared distance of every font to a query, over the dimensions
+    both know, is then a single matrix product; the closest RERANK_CANDIDATES
+    are reranked with the exact capped distance.
+    """
+
+    def __init__(self, terms, fonts, identity='standard'):
+        self.terms = terms
+        self.fonts = fonts
+        # Changes whenever the index is rebuilt, for callers that keep matches
+        self.identity = identity
+
+    @classmethod
+    def from_entries(cls, entries):
+        import numpy as np
+
+        fingerprints = np.stack([fingerprint for _, fingerprint in entries])
+        values = np.nan_to_num(fingerprints, nan=0.0)
+        terms = np.stack([values, values * values, ~np.isnan(fingerprints)], axis=1).astype(np.float32)
+        return cls(terms, [font for font, _ in entries])
+
+    @classmethod
+    def load(cls, folder):
+        """Memory-map an index written by save(); None if there is none or it does not fit this layout"""
+        import numpy as np
+
+        try:
+            with open(folder / 'fonts.json', encoding='utf-8') as f:
+                manifest = json.load(f)
+            terms = np.load(folder / 'fingerprints.npy', mmap_mode='r')
+            identity = str(os.stat(folder / 'fingerprints.npy').st_mtime_ns)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Warning: Could not load the font index in {folder}: {e}")
+            return None
+
+        if (manifest.get('probe_chars') != PROBE_CHARS or manifest.get('metrics') != list(METRIC_FIELDS)
+                or terms.shape != (len(manifest['fonts']), 3, len(PROBE_CHARS) + len(METRIC_FIELDS))):
+            print(f"Warning: The font index in {folder} does not match this version; rebuild it")
+            return None
+        return cls(terms, manifest['fonts'], identity)
+
+    def save(self, folder):
+        """Write the index to `folder`, replacing any previous index"""
+        import numpy as np
+
+        folder.mkdir(parents=True, exist_ok=True)
+        manifest = {'probe_chars': PROBE_CHARS, 'metrics': list(METRIC_FIELDS), 'fonts': self.fonts}
+        # Each file is replaced whole; load() rejects a mismatched pair
+        for filename, write in (
+            ('fingerprints.npy', lambda f: np.save(f, np.ascontiguousarray(self.terms, dtype=np.float32))),
+            ('fonts.json', lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+        ):
+            temp_path = folder / f'{filename}.tmp'
+            with open(temp_path, 'wb') as f:
+                write(f)
+            os.replace(temp_path, folder / filename)
+
+    def nearest(self, fingerprint, limit=1):
+        """
+        Closest indexed fonts to a fingerprint as (font, distance) pairs
+
+        The distance is the weighted RMS difference, capped per dimension (see
+        MAX_DIFFERENCE), over the dimensions known in both fingerprints, in em
+        units. Fonts covering less than MIN_COVERAGE of the query are skipped.
+        """
+        import numpy as np
+
+        known = ~np.isnan(fingerprint)
+        query = np.where(known, fingerprint, 0.0).astype(np.float32)
+        weights = _weights() * known
+
+        # sum(w * present * (x - q)^2) = sum(w * x^2) - 2 sum(w * q * x) + sum(w * q^2 * present)
+        coefficients = np.concatenate([-2 * weights * query, weights, weights * query * query])
+        squared = self.terms.reshape(len(self.fonts), -1) @ coefficients
+        total = self.terms[:, 2] @ weights
+
+        covered = np.flatnonzero(total >= MIN_COVERAGE * weights.sum())
+        if len(covered) > RERANK_CANDIDATES:
+            approximate = squared[covered] / total[covered]
+            covered = covered[np.argpartition(approximate, RERANK_CANDIDATES)[:RERANK_CANDIDATES]]
+
+        columns = np.flatnonzero(known)
+        candidates = np.asarray(self.terms[covered][:, :, columns])
+        values, present = candidates[:, 0], candidates[:, 2]
+        limits = _difference_limits()[columns]
+        diff = np.clip(values - query[columns], -limits, limits) * present
+        weight = present * weights[columns]
+        distance = np.sqrt((diff * diff * weight).sum(axis=1) / weight.sum(axis=1))
+
+        order = np.argsort(distance, kind='stable')[:limit]
+        return [(self.fonts[covered[i]], float(distance[i])) for i in order]
+
+
+def get_font_index():
+    """The index in FONT_INDEX_FOLDER, or of the standard fonts; None without numpy"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if not fingerprint_available():
+                    _index = False
+                else:
+                    _index = FontIndex.load(FONT_INDEX_FOLDER) or FontIndex.from_entries(standard_font_entries())
+    return _index or None
+
+
+def font_index_identity():
+    """Identity of the loaded font index (see FontIndex.identity), or None without numpy"""
+    index = get_font_index()
+    return index.identity if index is not None else None
+
+
+def identify_font(spec, rsrcmgr=None, objid=None):
+    """
+    Closest known font to a resolved PDF font dictionary (see pdf_font_fingerprint)
+
+    Returns {'name', 'family', 'style', 'distance'}, or None when the font has
+    too few widths, numpy is missing or nothing is within
+    FONT_MATCH_MAX_DISTANCE. Fonts the metrics cannot tell apart (e.g. the
+    regular and bold weights of a monospaced family) are tie-broken by the
+    declared /BaseFont.
+    """
+    from pdfminer.psparser import literal_name
+    from pdfminer.pdftypes import resolve1
+
+    with timed_stage('identify'):
+        index = get_font_index()
+        if index is None:
+            return None
+        fingerprint = pdf_font_fingerprint(spec, rsrcmgr, objid)
+        if fingerprint is None:
+            return None
+        matches = index.nearest(fingerprint, TIE_CANDIDATES)
+
+    if not matches or matches[0][1] > FONT_MATCH_MAX_DISTANCE:
+        return None
+    declared = _comparable_name(literal_name(resolve1(spec.get('BaseFont', ''))))
+    tied = [match for match in matches if match[1] - matches[0][1] <= TIE_DISTANCE]
+    font, distance = min(tied, key=lambda match: _comparable_name(match[0]['name']) != declared)
+    return {'name': font['name'], 'family': font['family'], 'style': font['style'], 'distance': round(distance, 4)}
+
+
+def build_index(font_dirs, folder=FONT_INDEX_FOLDER):
+    """Fingerprint the standard fonts and the font files under `font_dirs` into a new index"""
+    entries = standard_font_entries() + font_file_entries(font_dirs)
+    FontIndex.from_entries(entries).save(folder)
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the font fingerprint index from local font files')
+    parser.add_argument('font_dirs', nargs='*', help='directories searched for .ttf, .otf and .ttc files')
+    parser.add_argument('--output', default=str(FONT_INDEX_FOLDER), help='index folder (FONT_INDEX_FOLDER)')
+    args = parser.parse_args(argv)
+
+    if not fingerprint_available():
+        print('Building the font index requires numpy')
+        return 1
+
+    count = build_index(args.font_dirs, Path(args.output))
+    print(f'Indexed {count} fonts in {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Font program store service module
+Handles keeping what is known about embedded font programs across documents
+
+An embedded font program (the FontFile, FontFile2 or FontFile3 stream of a
+font descriptor) is keyed by the SHA-256 of its decoded bytes, so the same
+program embedded in many documents is described and identified once. The store
+also records which documents use each program, for "where else is this font
+used" queries.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .fingerprint_service import identify_font, font_index_identity
+    from ..config import FONT_STORE_DATABASE
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.fingerprint_service import identify_font, font_index_identity
+    from config import FONT_STORE_DATABASE
+
+# Programs kept in memory per process in front of the database
+MEMORY_ENTRIES = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS font_programs (
+    hash TEXT PRIMARY KEY,
+    font_type TEXT NOT NULL,
+    glyph_count INTEGER,
+    size INTEGER NOT NULL,
+    identified_as TEXT,
+    index_id TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS font_program_uses (
+    hash TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    basefont TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (hash, document_id, basefont)
+);
+CREATE INDEX IF NOT EXISTS font_program_uses_document ON font_program_uses (document_id);
+"""
+
+
+def embedded_program(spec):
+    """(descriptor key, stream) of the font program embedded in a resolved font dictionary, or None"""
+    from pdfminer.pdftypes import resolve1, PDFStream
+    from pdfminer.psparser import PSLiteral
+
+    subtype = resolve1(spec.get('Subtype'))
+    if isinstance(subtype, PSLiteral) and subtype.name == 'Type0':
+        # The program of a composite font is described by its descendant font
+        descendants = resolve1(spec.get('DescendantFonts')) or []
+        spec = resolve1(descendants[0]) if descendants else {}
+    descriptor = resolve1(spec.get('FontDescriptor')) if hasattr(spec, 'get') else None
+    if not hasattr(descriptor, 'get'):
+        return None
+
+    for key in ('FontFile', 'FontFile2', 'FontFile3'):
+        stream = resolve1(descriptor.get(key))
+        if isinstance(stream, PDFStream):
+            return key, stream
+    return None
+
+
+def _cff_index(data, offset):
+    """(end offset, items) of the CFF INDEX starting at `offset`"""
+    count = int.from_bytes(data[offset:offset + 2], 'big')
+    if count == 0:
+        return offset + 2, []
+    off_size = data[offset + 2]
+    start = offset + 3
+    offsets = [
+        int.from_bytes(data[start + i * off_size:start + (i + 1) * off_size], 'big')
+        for i in range(count + 1)
+    ]
+    base = start + (count + 1) * off_size - 1
+    return base + offsets[-1], [data[base + offsets[i]:base + offsets[i + 1]] for i in range(count)]
+
+
+def _cff_dict(data):
+    """Operator -> operands of a CFF DICT (real-number operands are skipped)"""
+    entries = {}
+    operands = []
+    i = 0
+    while i < len(data):
+        b0 = data[i]
+        if b0 <= 21:
+            operator = 1200 + data[i + 1] if b0 == 12 else b0
+            i += 2 if b0 == 12 else 1
+            entries[operator] = operands
+            operands = []
+        elif b0 == 28:
+            operands.append(int.from_bytes(data[i + 1:i + 3], 'big', signed=True))
+            i += 3
+        elif b0 == 29:
+            operands.append(int.from_bytes(data[i + 1:i + 5], 'big', signed=True))
+            i += 5
+        elif b0 == 30:
+            i += 1
+            while i < len(data) and (data[i] & 0x0F) != 0x0F and (data[i] >> 4) != 0x0F:
+                i += 1
+            i += 1
+            operands.append(None)
+        elif b0 <= 246:
+            operands.append(b0 - 139)
+            i += 1
+        elif b0 <= 250:
+            operands.append((b0 - 247) * 256 + data[i + 1] + 108)
+            i += 2
+        elif b0 <= 254:
+            operands.append(-(b0 - 251) * 256 - data[i + 1] - 108)
+            i += 2
+        else:
+            i += 1
+    return entries
+
+
+def _cff_glyph_count(data):
+    """Number of CharStrings of the first font in a CFF program"""
+    offset, _ = _cff_index(data, data[2])  # Name INDEX after the header
+    _, top_dicts = _cff_index(data, offset)
+    charstrings = _cff_dict(top_dicts[0])[17][-1]
+    return int.from_bytes(data[charstrings:charstrings + 2], 'big')
+
+
+def _sfnt_glyph_count(data):
+    """numGlyphs of the maxp table of a TrueType or OpenType program"""
+    for record in range(12, 12 + 16 * int.from_bytes(data[4:6], 'big'), 16):
+        if data[record:record + 4] == b'maxp':
+            table = int.from_bytes(data[record + 8:record + 12], 'big')
+            return int.from_bytes(data[table + 4:table + 6], 'big')
+    return None
+
+
+def _type1_glyph_count(data, length1):
+    """Size of the /CharStrings dictionary in the eexec-encrypted part of a Type 1 program"""
+    encrypted = data[length1:] if length1 else data[data.index(b'eexec') + 5:]
+    encrypted = encrypted.lstrip(b'\r\n\t ')
+    if re.fullmatch(rb'[0-9A-Fa-f\s]+', encrypted[:64]):
+        encrypted = bytes.fromhex(re.sub(rb'[^0-9A-Fa-f]', b'', encrypted).decode('ascii'))
+
+    key = 55665
+    decrypted = bytearray()
+    for byte in encrypted:
+        decrypted.append(byte ^ (key >> 8))
+        key = ((byte + key) * 52845 + 22719) & 0xFFFF
+        if len(decrypted) % 4096 == 0 and b'/CharStrings' in decrypted[-4200:]:
+            break
+    match = re.search(rb'/CharStrings\s+(\d+)', bytes(decrypted))
+    return int(match.group(1)) if match else None
+
+
+def describe_program(key, stream, data):
+    """Font type and glyph count of a decoded font program; the count is None if it cannot be read"""
+    from pdfminer.pdftypes import resolve1
+    from pdfminer.psparser import literal_name
+
+    if key == 'FontFile':
+        font_type = 'Type1'
+    elif key == 'FontFile2':
+        font_type = 'TrueType'
+    else:
+        font_type = literal_name(resolve1(stream.get('Subtype', 'Unknown')))
+
+    try:
+        if data[:4] in (b'\x00\x01\x00\x00', b'true', b'OTTO'):
+            glyph_count = _sfnt_glyph_count(data)
+        elif font_type == 'Type1':
+            glyph_count = _type1_glyph_count(data, resolve1(stream.get('Length1', 0)))
+        else:
+            glyph_count = _cff_glyph_count(data)
+    except (IndexError, KeyError, ValueError, TypeError):
+        glyph_count = None
+    return {'font_type': font_type, 'glyph_count': glyph_count}
+
+
+class FontProgramStore:
+    """SQLite table of embedded font programs by content hash, with the documents using them"""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.parent.mkdir(exist_ok=True)
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _remember(self, record):
+        with self._memory_lock:
+            self._memory[record['hash']] = record
+            self._memory.move_to_end(record['hash'])
+            if len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def get(self, digest):
+        """The stored program record, or None"""
+        with self._memory_lock:
+            record = self._memory.get(digest)
+        if record is not None:
+            return record
+
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM font_programs WHERE hash = ?', (digest,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        record = dict(row, identified_as=json.loads(row['identified_as'] or 'null'))
+        self._remember(record)
+        return record
+
+    def put(self, record):
+        """Insert or replace a program record"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO font_programs '
+                    '(hash, font_type, glyph_count, size, identified_as, index_id, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (record['hash'], record['font_type'], record['glyph_count'], record['size'],
+                     json.dumps(record['identified_as']), record['index_id'], record['created_at'])
+                )
+        finally:
+            conn.close()
+        self._remember(record)
+
+    def record_document(self, document_id, filename, analysis):
+        """Record the embedded programs named in an extract_fonts_advanced result as used by a document"""
+        uses = {
+            (font['font_program']['hash'], font['basefont'])
+            for font in analysis.get('basic_info', [])
+            if font.get('font_program')
+        }
+        if not uses:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO font_program_uses (hash, document_id, filename, basefont, last_seen) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(digest, document_id, filename, basefont, now) for digest, basefont in uses]
+                )
+        finally:
+            conn.close()
+
+    def documents(self, digest, limit=100):
+        """(document count, most recent uses) of a program"""
+        conn = self._connect()
+        try:
+            document_count = conn.execute(
+                'SELECT COUNT(DISTINCT document_id) FROM font_program_uses WHERE hash = ?', (digest,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                'SELECT document_id, filename, basefont, last_seen FROM font_program_uses '
+                'WHERE hash = ? ORDER BY last_seen DESC LIMIT ?',
+                (digest, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return document_count, [dict(row) for row in rows]
+
+    def most_shared(self, limit=100):
+        """Programs used by the most documents, with their document counts"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT p.*, COUNT(DISTINCT u.document_id) AS document_count '
+                'FROM font_programs p JOIN font_program_uses u ON u.hash = p.hash '
+                'GROUP BY p.hash ORDER BY document_count DESC, p.hash LIMIT ?',
+                (limit,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row, identified_as=json.loads(row['identified_as'] or 'null')) for row in rows]
+
+
+font_program_store = FontProgramStore(FONT_STORE_DATABASE)
+
+
+def program_summary(record):
+    """The fields of a program record reported with each font"""
+    return {'hash': record['hash'], 'type': record['font_type'], 'glyph_count': record['glyph_count'],
+            'size': record['size']}
+
+
+def resolve_font_program(spec, rsrcmgr=None, objid=None):
+    """
+    (font program record, identified_as) of a resolved font dictionary
+
+    A font with an embedded program is looked up in the store by the hash of
+    the decoded program and described and identified only the first time the
+    program is seen, or again after the font index changed. Fonts without an
+    embedded program get no record and are identified directly.
+    """
+    program = embedded_program(spec)
+    if program is None:
+        return None, identify_font(spec, rsrcmgr, objid)
+
+    key, stream = program
+    data = stream.get_data()
+    digest = hashlib.sha256(data).hexdigest()
+    index_id = font_index_identity()
+
+    try:
+        record = font_program_store.get(digest)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not read the font program store: {e}")
+        record = None
+    if record is None or record['index_id'] != index_id:
+        record = dict(
+            describe_program(key, stream, data),
+            hash=digest, size=len(data), identified_as=identify_font(spec, rsrcmgr, objid),
+            index_id=index_id, created_at=time.time()
+        )
+        try:
+            font_program_store.put(record)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not write to the font program store: {e}")
+    return record, record['identified_as']
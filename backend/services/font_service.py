@@ -1,56 +1,117 @@
 """
 Font analysis service module
 Handles all font-related PDF analysis functionality
+
+`pdf_path` arguments accept a filesystem path or an open, seekable binary
+buffer such as a spooled upload.
 """
-import pdfplumber
-from pdfminer.pdfparser import PDFParser
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdftypes import resolve1
-from pdfminer.psparser import PSException
-from collections import defaultdict
+from functools import partial
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .aggregation_service import (
+        aggregate_page_fonts, aggregate_page_spans, build_font_statistics, first_seen_fonts,
+        new_font_usage_stats, merge_font_usage_stats, merge_first_seen_fonts
+    )
+    from .parallel_service import should_parallelize, map_page_chunks
+    from .file_service import open_binary, open_pdf
+    from .metrics_service import timed_stage, count
+    from .resource_service import FontResourceIndex, FontResourceWalker, iter_page_resources
+    from .page_selection_service import document_page_count
+    from .memory_service import check_memory_budget, MemoryBudgetExceeded
+    from .deadline_service import lay_out_page, deadline_passed, PageCoverage
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.aggregation_service import (
+        aggregate_page_fonts, aggregate_page_spans, build_font_statistics, first_seen_fonts,
+        new_font_usage_stats, merge_font_usage_stats, merge_first_seen_fonts
+    )
+    from services.parallel_service import should_parallelize, map_page_chunks
+    from services.file_service import open_binary, open_pdf
+    from services.metrics_service import timed_stage, count
+    from services.resource_service import FontResourceIndex, FontResourceWalker, iter_page_resources
+    from services.page_selection_service import document_page_count
+    from services.memory_service import check_memory_budget, MemoryBudgetExceeded
+    from services.deadline_service import lay_out_page, deadline_passed, PageCoverage
+
+
+def _page_chars(page):
+    """Characters of a pdfplumber page, laid out on first access"""
+    with timed_stage('chars'):
+        chars = page.chars if hasattr(page, 'chars') else []
+    count('pages')
+    count('chars', len(chars))
+    return chars
+
 
+def _limited_page_chars(page):
+    """(characters, truncation reason or None) of a page laid out within the page limits and deadline"""
+    with timed_stage('chars'):
+        truncated = lay_out_page(page)
+    return _page_chars(page), truncated
 
-def extract_fonts_from_pdf(pdf_path):
+
+def _release_page(page):
+    """
+    Drop a processed page's characters and layout caches, then check the memory budget
+
+    pdfplumber keeps them on the page otherwise, so memory would grow with
+    every page of the document.
+    """
+    page.close()
+    check_memory_budget()
+
+
+def _detailed_pages(pdf, start, stop, progress=None):
+    """First-seen (fontname, size) entries of pages [start, stop) of an open document"""
+    def pages_chars():
+        for page_index, page in enumerate(pdf.pages[start:stop], start=start):
+            yield page.page_number, _page_chars(page)
+            _release_page(page)
+            if progress:
+                progress(page_index + 1, len(pdf.pages))
+
+    return first_seen_fonts(pages_chars())
+
+
+def _detailed_chunk(pdf_path, start, stop, pages=None):
+    """Process pool worker for extract_fonts_from_pdf"""
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        return _detailed_pages(pdf, start, stop)
+
+
+def extract_fonts_from_pdf(pdf_path, progress=None, pages=None):
     """
     Extract font information from a PDF using pdfplumber (app2.py approach)
+
+    `pages` limits the analysis to those 1-based page numbers; other pages are
+    never parsed. `progress(pages_done, page_count)` is called as pages are
+    completed.
     """
-    fonts_info = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            # Extract character-level information
-            chars = page.chars if hasattr(page, 'chars') else []
-            
-            for char in chars:
-                font_name = char.get('fontname', 'Unknown')
-                font_size = char.get('size', 0)
-                
-                # Check if this font info already exists to avoid duplicates
-                existing_font = None
-                for font in fonts_info:
-                    if font['name'] == font_name and font['size'] == font_size:
-                        existing_font = font
-                        break
-                
-                if not existing_font:
-                    fonts_info.append({
-                        'name': font_name,
-                        'size': font_size,
-                        'page': page_num + 1
-                    })
-    
-    return fonts_info
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        page_count = len(pdf.pages)
+        if not should_parallelize(page_count):
+            return _detailed_pages(pdf, 0, page_count, progress)
+
+    return merge_first_seen_fonts(
+        map_page_chunks(_detailed_chunk, pdf_path, page_count, progress, pages)
+    )
 
 
 def extract_fonts_basic(pdf_path):
     """
     Extract font information from a PDF using pdfminer (app.py approach)
     """
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdftypes import resolve1
+
     font_data = []
 
-    with open(pdf_path, 'rb') as pdf_file:
-        parser = PDFParser(pdf_file)
-        document = PDFDocument(parser)
+    with open_binary(pdf_path) as pdf_file:
+        with timed_stage('parse'):
+            parser = PDFParser(pdf_file)
+            document = PDFDocument(parser)
 
         # Extract font details from the PDF catalog
         try:
@@ -85,130 +146,409 @@ def extract_fonts_basic(pdf_path):
     return font_data
 
 
-def extract_fonts_advanced(pdf_path):
+def list_fonts(pdf_path):
+    """
+    List every font of a PDF with the pages referencing it, from resources alone
+
+    Walks the page tree and the resources of pages, Form XObjects and Type3
+    fonts through pdfminer's object layer. No content stream is interpreted
+    and no page is laid out, so this takes a small fraction of the time of
+    extract_fonts_advanced. Fonts are reported with their encoding and whether
+    their program is embedded, but are not identified.
+    """
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+
+    walker = FontResourceWalker()
+    page_count = 0
+
+    with open_binary(pdf_path) as pdf_file:
+        with timed_stage('parse'):
+            document = PDFDocument(PDFParser(pdf_file))
+            for page_count, resources in enumerate(iter_page_resources(document), start=1):
+                walker.add_page(resources, page_count)
+
+    return {'page_count': page_count, 'fonts': walker.entries()}
+
+
+def _iter_advanced_pages(pdf, start, stop, font_usage_stats, font_index, coverage, progress=None, spans=False):
+    """
+    Analyze pages [start, stop) of an open document one page at a time
+
+    Yields (page_number, basic_info, page_fonts), counting usage into
+    `font_usage_stats`, recording font resources in `font_index` and pages
+    in the PageCoverage `coverage` as it goes. With `spans`, page_fonts holds
+    text runs (see aggregate_page_spans) under `spans` instead of
+    per-position entries under `fonts`. Pages cut short by the page limits
+    carry a `truncated` reason; once the deadline has passed the remaining
+    pages are skipped.
+    """
+    from pdfminer.psparser import PSException
+
+    for page_index, page in enumerate(pdf.pages[start:stop], start=start):
+        page_number = page.page_number
+        if deadline_passed():
+            for skipped in pdf.pages[page_index:stop]:
+                coverage.page_skipped(skipped.page_number, 'deadline')
+            return
+
+        # Resource-level font information from the underlying pdfminer page
+        try:
+            basic_info = font_index.add_page(page.page_obj.resources, page_number, page.pdf.rsrcmgr)
+        except (PSException, TypeError, KeyError) as e:
+            # If pdfminer fails, we'll continue with the character data
+            print(f"Warning: Could not extract fonts using pdfminer: {e}")
+            basic_info = []
+
+        # Extract character-level font information
+        chars, truncated = _limited_page_chars(page)
+
+        with timed_stage('aggregation'):
+            if spans:
+                page_fonts = {'spans': aggregate_page_spans(chars, page_number, font_usage_stats)}
+            else:
+                page_fonts = {'fonts': aggregate_page_fonts(chars, page_number, font_usage_stats)}
+        page_fonts['char_count'] = len(chars)
+        if truncated:
+            page_fonts['truncated'] = truncated
+        coverage.page_done(page_number, truncated)
+
+        yield page_number, basic_info, page_fonts
+        _release_page(page)
+
+        if progress:
+            progress(page_index + 1, len(pdf.pages))
+
+
+def _advanced_pages(pdf, start, stop, progress=None, spans=False):
+    """
+    Analyze pages [start, stop) of an open document for extract_fonts_advanced
+
+    Returns (basic_info, by_page, font_usage_stats, coverage) for the range,
+    where basic_info lists each font object once with the pages referencing
+    it and coverage is a PageCoverage summary.
+    """
+    by_page = {}
+    font_usage_stats = new_font_usage_stats()
+    font_index = FontResourceIndex()
+    coverage = PageCoverage()
+
+    records = _iter_advanced_pages(pdf, start, stop, font_usage_stats, font_index, coverage, progress, spans)
+    for page_number, _, page_fonts in records:
+        by_page[f'page_{page_number}'] = page_fonts
+
+    # A plain dict so the result can be returned from a pool worker
+    return font_index.entries(), by_page, dict(font_usage_stats), coverage.summary()
+
+
+def _advanced_chunk(pdf_path, start, stop, pages=None, spans=False):
+    """Process pool worker for extract_fonts_advanced"""
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        return _advanced_pages(pdf, start, stop, spans=spans)
+
+
+def _resource_basic_info(pdf_path, pages=None):
+    """basic_info of extract_fonts_advanced read from page resources alone, without pdfplumber"""
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFResourceManager
+    from pdfminer.pdftypes import resolve1
+
+    font_index = FontResourceIndex()
+    rsrcmgr = PDFResourceManager()
+    selected = set(pages) if pages is not None else None
+    with open_binary(pdf_path) as pdf_file:
+        with timed_stage('parse'):
+            document = PDFDocument(PDFParser(pdf_file))
+        for page_number, resources in enumerate(iter_page_resources(document), start=1):
+            if selected is None or page_number in selected:
+                font_index.add_page(resolve1(resources), page_number, rsrcmgr)
+    return font_index.entries()
+
+
+def extract_fonts_advanced(pdf_path, progress=None, pages=None, spans=False):
     """
     Extract font information from a PDF using both pdfminer and pdfplumber
+
+    The document is parsed once: pdfplumber pages wrap the pdfminer page
+    objects, so the font resources and the characters of each page are read
+    in the same pass. Each font resource object is described once, and
+    basic_info lists it with the pages that reference it. Large documents are
+    split into page chunks that run on the process pool and are merged in page
+    order. If pdfplumber cannot open or lay out the document, basic_info is
+    still read from the page resources alone.
+
+    `pages` limits the analysis to those 1-based page numbers; other pages are
+    never parsed. `spans` reports each page as merged text runs instead of one
+    entry per character position. `progress(pages_done, page_count)` is
+    called as pages are completed.
+
+    Pages are laid out within PAGE_MAX_CHARS and PAGE_MAX_SECONDS, and the
+    analysis stops at the deadline, if any (see deadline_service); `coverage`
+    reports which pages were completed, truncated or skipped.
     """
     font_data = {
         'basic_info': [],
         'by_page': {},
         'statistics': {}
     }
-    
-    # Use pdfminer for basic font extraction
-    try:
-        from pdfminer.pdfpage import PDFPage
-
-        with open(pdf_path, 'rb') as pdf_file:
-            parser = PDFParser(pdf_file)
-            document = PDFDocument(parser)
 
-            # Try to extract font info from resources
-            fonts = defaultdict(int)
+    try:
+        with open_pdf(pdf_path, pages=pages) as pdf:
+            page_count = len(pdf.pages)
+            if should_parallelize(page_count):
+                chunk_worker = partial(_advanced_chunk, spans=spans)
+                chunks = map_page_chunks(chunk_worker, pdf_path, page_count, progress, pages)
+            else:
+                chunks = [_advanced_pages(pdf, 0, page_count, progress, spans)]
 
-            # Access pages using PDFPage.create_pages() which is the correct method
-            for page in PDFPage.create_pages(document):
-                if hasattr(page, 'resources'):
-                    resources = page.resources
-                    if resources and 'Font' in resources:
-                        font_resources = resolve1(resources['Font'])
-                        for font_name, font_obj in font_resources.items():
-                            resolved_font_obj = resolve1(font_obj)
-                            font_subtype = resolve1(resolved_font_obj.get('Subtype', 'Unknown')) if hasattr(resolved_font_obj, 'get') else 'Unknown'
-                            font_basefont = resolve1(resolved_font_obj.get('BaseFont', 'Unknown')) if hasattr(resolved_font_obj, 'get') else 'Unknown'
+            font_usage_stats = new_font_usage_stats()
+            font_index = FontResourceIndex()
+            coverage = PageCoverage()
+            for basic_info, by_page, chunk_stats, chunk_coverage in chunks:
+                font_index.merge(basic_info)
+                font_data['by_page'].update(by_page)
+                merge_font_usage_stats(font_usage_stats, chunk_stats)
+                coverage.merge(chunk_coverage)
 
-                            fonts[str(font_name)] += 1
+            font_data['basic_info'] = font_index.entries()
+            font_data['coverage'] = coverage.summary()
 
-                            font_data['basic_info'].append({
-                                'name': str(font_name),
-                                'subtype': str(font_subtype),
-                                'basefont': str(font_basefont)
-                            })
-    except (PSException, TypeError, KeyError) as e:
-        # If pdfminer fails, we'll continue with pdfplumber data
-        print(f"Warning: Could not extract fonts using pdfminer: {e}")
-    
-    # Use pdfplumber for detailed character-level analysis
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total_chars = 0
-            font_usage_stats = defaultdict(lambda: {'count': 0, 'pages': set()})
-            
-            for page_num, page in enumerate(pdf.pages):
-                page_fonts = []
-                
-                # Extract character-level font information
-                chars = page.chars if hasattr(page, 'chars') else []
-                
-                for char in chars:
-                    font_name = char.get('fontname', 'Unknown')
-                    font_size = round(char.get('size', 0), 2)
-                    font_color = char.get('non_stroke_color', 'Unknown')
-                    
-                    # Count font usage
-                    font_key = f"{font_name}_{font_size}"
-                    font_usage_stats[font_key]['count'] += 1
-                    font_usage_stats[font_key]['pages'].add(page_num + 1)
-                    
-                    page_font_info = {
-                        'name': font_name,
-                        'size': font_size,
-                        'color': font_color,
-                        'x': round(char.get('x0', 0), 2),
-                        'y': round(char.get('top', 0), 2)
-                    }
-                    
-                    # Check for duplicate entries
-                    if page_font_info not in page_fonts:
-                        page_fonts.append(page_font_info)
-                    
-                    total_chars += 1
-                
-                font_data['by_page'][f'page_{page_num + 1}'] = {
-                    'fonts': page_fonts,
-                    'char_count': len(chars)
-                }
-            
             # Prepare statistics
-            for font_key, stats in font_usage_stats.items():
-                font_name, font_size = font_key.rsplit('_', 1)  # Split only on the last underscore
-                font_data['statistics'][font_key] = {
-                    'font_name': font_name,
-                    'font_size': float(font_size),
-                    'usage_count': stats['count'],
-                    'pages_used': sorted(list(stats['pages']))
-                }
-    
+            font_data['statistics'] = build_font_statistics(font_usage_stats)
+
+    except MemoryBudgetExceeded:
+        raise
     except Exception as e:
         print(f"Error processing with pdfplumber: {e}")
-    
+        try:
+            font_data['basic_info'] = _resource_basic_info(pdf_path, pages)
+        except Exception as e:
+            print(f"Warning: Could not extract fonts using pdfminer: {e}")
+
     return font_data
 
 
-def extract_text_with_fonts(pdf_path):
+def iter_fonts_advanced(pdf_path, pages=None, spans=False):
+    """
+    Stream the extract_fonts_advanced analysis as one record per page
+
+    Yields a `document` record, then a `page` record per page as soon as it
+    is analyzed, and finally a `statistics` record that also carries the
+    unique basic_info fonts and the coverage. Only the usage table and the
+    font index are held across pages, so memory stays flat regardless of page
+    count. `pages`, `spans` and the page limits work as for
+    extract_fonts_advanced.
+    """
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        page_count = len(pdf.pages)
+        yield {'type': 'document', 'page_count': page_count}
+
+        font_usage_stats = new_font_usage_stats()
+        font_index = FontResourceIndex()
+        coverage = PageCoverage()
+        records = _iter_advanced_pages(pdf, 0, page_count, font_usage_stats, font_index, coverage, spans=spans)
+        for page_number, basic_info, page_fonts in records:
+            yield dict(page_fonts, type='page', page=page_number, basic_info=basic_info)
+
+        yield {
+            'type': 'statistics',
+            'basic_info': font_index.entries(),
+            'statistics': build_font_statistics(font_usage_stats),
+            'coverage': coverage.summary()
+        }
+
+
+# Fields of each character reported by extract_text_with_fonts and extract_text_columns
+TEXT_FIELDS = ('text', 'fontname', 'size', 'x', 'y')
+
+
+def _char_text_data(char):
+    """Text and font data of one pdfplumber character"""
+    return {
+        'text': char.get('text', ''),
+        'fontname': char.get('fontname', 'Unknown'),
+        'size': round(char.get('size', 0), 2),
+        'x': char.get('x0', 0),
+        'y': char.get('top', 0)
+    }
+
+
+def _text_pages(pdf, start, stop, progress=None):
+    """Per-character text and font data of pages [start, stop) of an open document"""
+    text_with_fonts = []
+
+    for page_index, page in enumerate(pdf.pages[start:stop], start=start):
+        chars = _page_chars(page)
+
+        with timed_stage('aggregation'):
+            page_text_data = [_char_text_data(char) for char in chars]
+
+        text_with_fonts.append({
+            'page': page.page_number,
+            'characters': page_text_data
+        })
+        _release_page(page)
+
+        if progress:
+            progress(page_index + 1, len(pdf.pages))
+
+    return text_with_fonts
+
+
+def _text_chunk(pdf_path, start, stop, pages=None):
+    """Process pool worker for extract_text_with_fonts"""
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        return _text_pages(pdf, start, stop)
+
+
+def extract_text_with_fonts(pdf_path, progress=None, pages=None):
     """
     Extract text along with font information from a PDF
+
+    `pages` limits the extraction to those 1-based page numbers.
+    `progress(pages_done, page_count)` is called as pages are completed.
     """
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        page_count = len(pdf.pages)
+        if not should_parallelize(page_count):
+            return _text_pages(pdf, 0, page_count, progress)
+
     text_with_fonts = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            chars = page.chars if hasattr(page, 'chars') else []
-            
-            page_text_data = []
-            for char in chars:
-                char_data = {
-                    'text': char.get('text', ''),
-                    'fontname': char.get('fontname', 'Unknown'),
-                    'size': round(char.get('size', 0), 2),
-                    'x': char.get('x0', 0),
-                    'y': char.get('top', 0)
-                }
-                page_text_data.append(char_data)
-            
-            text_with_fonts.append({
-                'page': page_num + 1,
-                'characters': page_text_data
-            })
-    
-    return text_with_fonts
\ No newline at end of file
+    for chunk in map_page_chunks(_text_chunk, pdf_path, page_count, progress, pages):
+        text_with_fonts.extend(chunk)
+    return text_with_fonts
+
+
+def _runs_pages(pdf, start, stop, progress=None):
+    """Page sizes and text runs of pages [start, stop) of an open document"""
+    pages = []
+
+    for page_index, page in enumerate(pdf.pages[start:stop], start=start):
+        chars = _page_chars(page)
+
+        with timed_stage('aggregation'):
+            spans = aggregate_page_spans(chars, page.page_number, new_font_usage_stats())
+
+        pages.append({
+            'page': page.page_number,
+            'width': float(page.width),
+            'height': float(page.height),
+            'spans': spans
+        })
+        _release_page(page)
+
+        if progress:
+            progress(page_index + 1, len(pdf.pages))
+
+    return pages
+
+
+def _runs_chunk(pdf_path, start, stop, pages=None):
+    """Process pool worker for extract_text_runs"""
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        return _runs_pages(pdf, start, stop)
+
+
+def extract_text_runs(pdf_path, progress=None, pages=None):
+    """
+    Extract the text runs of every page with the page size, for the region index
+
+    Runs are the `format=spans` entries of extract_fonts_advanced, with their
+    bounding boxes in the same top-left based coordinates as page.chars.
+    `pages` limits the extraction to those 1-based page numbers.
+    """
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        page_count = len(pdf.pages)
+        if not should_parallelize(page_count):
+            return _runs_pages(pdf, 0, page_count, progress)
+
+    runs = []
+    for chunk in map_page_chunks(_runs_chunk, pdf_path, page_count, progress, pages):
+        runs.extend(chunk)
+    return runs
+
+
+def extract_text_columns(pdf_path, start_page=1, start_char=0, max_chars=10000, max_pages=50):
+    """
+    Extract a window of the extract_text_with_fonts data as columnar arrays
+
+    Reads characters from `start_char` of page `start_page` onwards until
+    `max_chars` characters or `max_pages` pages have been collected. Only the
+    pages in that window are opened and laid out. Each page carries one array
+    per TEXT_FIELDS entry plus its `char_offset` and total `char_count`.
+
+    Returns the pages, the document's page count and `next_position`, the
+    (page, char) to resume from, or None once the document is exhausted.
+    """
+    page_count = document_page_count(pdf_path)
+    last_page = min(page_count, start_page + max_pages - 1)
+    text_pages = []
+    next_position = None
+    remaining = max_chars
+
+    if start_page > last_page:
+        return {'page_count': page_count, 'pages': text_pages, 'next_position': next_position}
+
+    with open_pdf(pdf_path, pages=list(range(start_page, last_page + 1))) as pdf:
+        for page in pdf.pages:
+            chars = _page_chars(page)
+            offset = start_char if page.page_number == start_page else 0
+            window = chars[offset:offset + remaining]
+
+            with timed_stage('aggregation'):
+                columns = {field: [] for field in TEXT_FIELDS}
+                for char in window:
+                    for field, value in _char_text_data(char).items():
+                        columns[field].append(value)
+
+            text_pages.append(dict(columns, page=page.page_number, char_offset=offset, char_count=len(chars)))
+            remaining -= len(window)
+            _release_page(page)
+
+            if offset + len(window) < len(chars):
+                next_position = (page.page_number, offset + len(window))
+                break
+            if remaining <= 0:
+                break
+
+    # The page tree's /Count can exceed its real pages, so no page may have been read
+    if next_position is None and text_pages and text_pages[-1]['page'] < page_count:
+        next_position = (text_pages[-1]['page'] + 1, 0)
+
+    return {'page_count': page_count, 'pages': text_pages, 'next_position': next_position}
+
+
+def extract_document_columns(pdf_path):
+    """
+    Extract every character and font resource of a document in one pass, for the corpus export
+
+    Returns `chars`, one list per TEXT_FIELDS entry plus `page`, and `fonts`,
+    the basic_info entries of extract_fonts_advanced, with the document's
+    `page_count`. Pages are laid out one at a time and released as in the
+    other analyses; the document is never split across processes, since the
+    corpus export already runs one document per pool worker.
+    """
+    from pdfminer.psparser import PSException
+
+    columns = {field: [] for field in ('page',) + TEXT_FIELDS}
+    font_index = FontResourceIndex()
+
+    with open_pdf(pdf_path) as pdf:
+        for page in pdf.pages:
+            try:
+                font_index.add_page(page.page_obj.resources, page.page_number, page.pdf.rsrcmgr)
+            except (PSException, TypeError, KeyError) as e:
+                print(f"Warning: Could not extract fonts using pdfminer: {e}")
+
+            chars = _page_chars(page)
+            with timed_stage('aggregation'):
+                columns['page'].extend([page.page_number] * len(chars))
+                for char in chars:
+                    for field, value in _char_text_data(char).items():
+                        columns[field].append(value)
+            _release_page(page)
+
+        page_count = len(pdf.pages)
+
+    return {'page_count': page_count, 'chars': columns, 'fonts': font_index.entries()}
@@ -0,0 +1,270 @@
+"""
+Background job service module
+Handles queuing, running and persisting long-running analyses
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .font_service import extract_fonts_from_pdf, extract_fonts_basic, extract_fonts_advanced
+    from .ocr_service import extract_text_selective_ocr
+    from .file_service import cleanup_file
+    from .cache_service import result_cache, file_digest
+    from .font_program_service import font_program_store
+    from .deadline_service import depends_on_timing
+    from .metrics_service import recording, pid_alive
+    from .memory_service import memory_budget
+    from ..config import JOB_DATABASE, JOB_WORKERS, JOB_RESULT_TTL, UPLOAD_SWEEP_INTERVAL
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_service import extract_fonts_from_pdf, extract_fonts_basic, extract_fonts_advanced
+    from services.ocr_service import extract_text_selective_ocr
+    from services.file_service import cleanup_file
+    from services.cache_service import result_cache, file_digest
+    from services.font_program_service import font_program_store
+    from services.deadline_service import depends_on_timing
+    from services.metrics_service import recording, pid_alive
+    from services.memory_service import memory_budget
+    from config import JOB_DATABASE, JOB_WORKERS, JOB_RESULT_TTL, UPLOAD_SWEEP_INTERVAL
+
+# Analyses a job can run, called as analysis(filepath, progress)
+JOB_ANALYSES = {
+    'basic': lambda filepath, progress: extract_fonts_basic(filepath),
+    'detailed': extract_fonts_from_pdf,
+    'advanced': extract_fonts_advanced,
+    'ocr': extract_text_selective_ocr
+}
+
+# Minimum interval between progress writes for a running job
+PROGRESS_INTERVAL = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    cache_key TEXT,
+    status TEXT NOT NULL,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobStore:
+    """SQLite-backed job table that survives worker and server restarts"""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.parent.mkdir(exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                conn.execute(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    def create(self, kind, filename, filepath, cache_key=None):
+        """Insert a queued job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            'INSERT INTO jobs (id, kind, filename, filepath, cache_key, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, filename, filepath, cache_key, 'queued', now, now)
+        )
+        return job_id
+
+    def create_completed(self, kind, filename, result, cache_key=None):
+        """Insert a job whose result is already known (e.g. served from the cache)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            'INSERT INTO jobs (id, kind, filename, filepath, cache_key, status, result, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, filename, '', cache_key, 'completed', json.dumps(result), now, now)
+        )
+        return job_id
+
+    def get(self, job_id):
+        """Return the job row as a dict, or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def claim(self, job_id):
+        """Atomically move a queued job to running; False if another worker has it"""
+        return self._execute(
+            "UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (os.getpid(), time.time(), job_id)
+        ) == 1
+
+    def update_progress(self, job_id, pages_done, pages_total):
+        self._execute(
+            'UPDATE jobs SET pages_done = ?, pages_total = ?, updated_at = ? WHERE id = ?',
+            (pages_done, pages_total, time.time(), job_id)
+        )
+
+    def complete(self, job_id, result):
+        self._execute(
+            "UPDATE jobs SET status = 'completed', result = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id, error):
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+            (error, time.time(), job_id)
+        )
+
+    def delete_finished(self, max_age):
+        """Delete completed and failed jobs last updated more than `max_age` seconds ago; returns how many"""
+        return self._execute(
+            "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ?",
+            (time.time() - max_age,)
+        )
+
+    def requeue_interrupted(self):
+        """
+        Put running jobs whose worker process has died back in the queue
+
+        Returns the ids of every queued job, including the requeued ones.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, worker_pid FROM jobs WHERE status = 'running'"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for row in rows:
+            if not pid_alive(row['worker_pid']):
+                self._execute(
+                    "UPDATE jobs SET status = 'queued', worker_pid = NULL, updated_at = ? "
+                    "WHERE id = ? AND status = 'running'",
+                    (time.time(), row['id'])
+                )
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row['id'] for row in rows]
+
+
+class JobRunner:
+    """Local thread pool that executes queued jobs from a JobStore"""
+
+    def __init__(self, store, workers):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+    def submit(self, job_id):
+        self.executor.submit(self._run, job_id)
+
+    def recover(self):
+        """Resubmit jobs left queued or interrupted by a previous process"""
+        job_ids = self.store.requeue_interrupted()
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    def start_sweeper(self, max_age=JOB_RESULT_TTL, interval=UPLOAD_SWEEP_INTERVAL):
+        """Delete finished jobs older than `max_age` now and then every `interval` seconds on a daemon thread"""
+        def sweep():
+            while True:
+                try:
+                    removed = self.store.delete_finished(max_age)
+                except sqlite3.Error as e:
+                    print(f"Warning: Could not remove expired jobs: {e}")
+                else:
+                    if removed:
+                        print(f"Removed {removed} expired job(s)")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=sweep, name='job-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+    def _progress_callback(self, job_id):
+        last_write = [0.0]
+        lock = threading.Lock()
+
+        def progress(pages_done, pages_total):
+            now = time.monotonic()
+            with lock:
+                if pages_done < pages_total and now - last_write[0] < PROGRESS_INTERVAL:
+                    return
+                last_write[0] = now
+            self.store.update_progress(job_id, pages_done, pages_total)
+
+        return progress
+
+    def _record_font_programs(self, job, analysis):
+        """Record the embedded font programs of an advanced job as used by its upload, as the endpoint does"""
+        try:
+            with open(job['filepath'], 'rb') as file:
+                digest = file_digest(file)
+            font_program_store.record_document(digest, job['filename'], analysis)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Could not record the font programs of {job['filename']}: {e}")
+
+    def _run(self, job_id):
+        if not self.store.claim(job_id):
+            return
+
+        job = self.store.get(job_id)
+        try:
+            with recording(), memory_budget():
+                result = JOB_ANALYSES[job['kind']](job['filepath'], self._progress_callback(job_id))
+        except Exception as e:
+            print(f"Error running job {job_id}: {e}")
+            self.store.fail(job_id, str(e))
+        else:
+            self.store.complete(job_id, result)
+            # Pages cut short by PAGE_MAX_SECONDS make the result depend on the server's speed
+            cacheable = not (isinstance(result, dict) and 'error' in result) and not depends_on_timing(result)
+            if job['cache_key'] and cacheable:
+                result_cache.put(job['cache_key'], result)
+            if job['kind'] == 'advanced':
+                self._record_font_programs(job, result)
+        finally:
+            cleanup_file(job['filepath'])
+
+
+job_store = JobStore(JOB_DATABASE)
+job_runner = JobRunner(job_store, JOB_WORKERS)
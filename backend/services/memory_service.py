@@ -0,0 +1,68 @@
+"""
+Memory budget service module
+Handles limiting how much memory a single analysis may add to its process
+
+The budget is checked against the growth of the process's resident set size
+since the analysis started, read from /proc/self/statm after each page. It
+is an approximation: concurrent requests in the same process count towards
+each other's growth, and memory freed by Python is not always returned to the
+OS. Where /proc is not available (macOS, Windows) the budget is not enforced.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..config import REQUEST_MEMORY_BUDGET
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from config import REQUEST_MEMORY_BUDGET
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# (starting RSS, budget in bytes) of the analysis running in this context
+_current_budget = ContextVar('memory_budget', default=None)
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised when an analysis grows its process by more than its memory budget"""
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read cheaply"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def memory_budget(limit=REQUEST_MEMORY_BUDGET):
+    """Enforce `limit` bytes of growth on check_memory_budget() calls made in the block"""
+    start = current_rss() if limit else None
+    if start is None:
+        yield
+        return
+
+    token = _current_budget.set((start, limit))
+    try:
+        yield
+    finally:
+        _current_budget.reset(token)
+
+
+def check_memory_budget():
+    """Raise MemoryBudgetExceeded if the current analysis has outgrown its budget"""
+    budget = _current_budget.get()
+    if budget is None:
+        return
+
+    start, limit = budget
+    growth = current_rss() - start
+    if growth > limit:
+        raise MemoryBudgetExceeded(
+            f'analysis needed more than its memory budget of {limit // (1024 * 1024)}MB; '
+            f'analyze fewer pages at a time with the pages parameter or a stream endpoint'
+        )
@@ -0,0 +1,520 @@
+"""
+Metrics service module
+Handles per-stage timing and counters of analysis work and their Prometheus export
+
+A unit of work (an HTTP request or a background job) runs under a
+StageRecorder. Code inside it wraps each stage in `timed_stage(name)`; the
+recorder sums the time per stage, and when the unit ends each stage total is
+observed once into the `pdf_analysis_stage_seconds` histogram. Stages:
+
+- upload: receiving and spooling the multipart upload
+- hash: hashing the upload for the result cache key
+- cache: reading and writing the result cache
+- parse: opening the document and building its page tree (pdfminer)
+- chars: laying out page content into characters (pdfminer/pdfplumber)
+- aggregation: turning characters into font entries, runs or text records
+- identify: fingerprinting fonts and matching them against the font index
+- lookup: querying a document's region index
+- admission: waiting in an admission gate's queue (see admission_service)
+- image_decode, render, tesseract: the OCR stages
+- serialization, compression: encoding the response body
+
+Work sent to the process pools is run through `recorded_call` and its timings
+are merged back with `merge_recorded`, so a stage total is summed across
+worker processes and can exceed the request's wall time.
+
+With METRICS_ENABLED off, no recorder is ever started and `timed_stage` and
+`count` return after a single check.
+
+Metrics live in the process that records them. Server processes started
+with start_snapshot_writer() (each gunicorn worker) also write a snapshot
+to METRICS_FOLDER every METRICS_FLUSH_INTERVAL seconds, and /metrics adds
+the snapshots of the other processes to its own, as prometheus_client's
+multiprocess mode does:
+
+- counters and histograms are summed over every snapshot; those of exited
+  processes are folded into one archive, so they never go backwards
+- gauges are summed over the processes that wrote recently
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import fcntl
+except ImportError:
+    # Not on Windows, where the development server runs a single process
+    fcntl = None
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from ..config import METRICS_ENABLED, METRICS_FOLDER, METRICS_FLUSH_INTERVAL
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from config import METRICS_ENABLED, METRICS_FOLDER, METRICS_FLUSH_INTERVAL
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_recorder = ContextVar('stage_recorder', default=None)
+
+
+def _add_values(total, value):
+    return value if total is None else total + value
+
+
+def _combine(add, snapshots):
+    """Series of several snapshots of one metric, summed per label combination with `add` and sorted"""
+    combined = {}
+    for snapshot in snapshots:
+        for labels, value in snapshot:
+            labels = tuple(labels)
+            combined[labels] = add(combined.get(labels), value)
+    return sorted(combined.items())
+
+
+class Histogram:
+    """Prometheus histogram with cumulative buckets per label combination"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        """Series of this process as [labels, {buckets, sum, count}] pairs"""
+        with self._lock:
+            return [[list(labels), dict(series, buckets=list(series['buckets']))]
+                    for labels, series in self._series.items()]
+
+    @staticmethod
+    def _add(total, series):
+        if total is None:
+            return dict(series, buckets=list(series['buckets']))
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], series['buckets'])]
+        total['sum'] += series['sum']
+        total['count'] += series['count']
+        return total
+
+    def render(self, snapshots=()):
+        """Exposition lines of this process's series plus those of other processes' `snapshots`"""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in _combine(self._add, [self.snapshot(), *snapshots]):
+            label_text = _label_text(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series['buckets']):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text}le="+Inf"}} {series["count"]}')
+            suffix = f'{{{label_text.rstrip(",")}}}' if label_text else ''
+            lines.append(f'{self.name}_sum{suffix} {series["sum"]}')
+            lines.append(f'{self.name}_count{suffix} {series["count"]}')
+        return lines
+
+
+class Counter:
+    """Prometheus counter without labels"""
+
+    metric_type = 'counter'
+    _add = staticmethod(_add_values)
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self):
+        return [[[], self._value]]
+
+    def render(self, snapshots=()):
+        total = sum(value for _, value in _combine(self._add, [self.snapshot(), *snapshots]))
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter', f'{self.name} {total}']
+
+
+class LabeledCounter:
+    """Prometheus counter per label combination"""
+
+    metric_type = 'counter'
+    _add = staticmethod(_add_values)
+
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def render(self, snapshots=()):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+        for labels, value in _combine(self._add, [self.snapshot(), *snapshots]):
+            lines.append(f'{self.name}{{{_label_text(self.labelnames, labels).rstrip(",")}}} {value}')
+        return lines
+
+
+class Gauge(LabeledCounter):
+    """Prometheus gauge per label combination, set to the current value by its owner"""
+
+    metric_type = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labelnames, labels):
+    """`name="value",` pairs of a series, escaped per the exposition format"""
+    return ''.join(f'{name}="{_escape_label(value)}",' for name, value in zip(labelnames, labels))
+
+
+stage_seconds = Histogram(
+    'pdf_analysis_stage_seconds', 'Time spent per stage of a request or job, summed across pool workers', ('stage',)
+)
+request_seconds = Histogram(
+    'http_request_duration_seconds', 'Wall time of HTTP requests', ('method', 'endpoint', 'status')
+)
+
+# Admission control (see admission_service), per gate
+admission_in_flight = Gauge('pdf_admission_in_flight', 'Requests admitted and running', ('gate',))
+admission_in_flight_cost = Gauge('pdf_admission_in_flight_cost', 'Estimated pages of the requests running', ('gate',))
+admission_queue_depth = Gauge('pdf_admission_queue_depth', 'Requests waiting to be admitted', ('gate',))
+admission_admitted = LabeledCounter('pdf_admission_admitted_total', 'Requests admitted', ('gate',))
+admission_rejected = LabeledCounter(
+    'pdf_admission_rejected_total', 'Requests rejected with 503, by reason', ('gate', 'reason')
+)
+admission_wait_seconds = Histogram(
+    'pdf_admission_wait_seconds', 'Time admitted requests spent queued', ('gate',)
+)
+
+# Counters by the short name passed to count()
+COUNTERS = {
+    'pages': Counter('pdf_analysis_pages_total', 'Pages laid out into characters'),
+    'chars': Counter('pdf_analysis_chars_total', 'Characters extracted from laid-out pages'),
+    'ocr_images': Counter('pdf_ocr_images_total', 'Page renders and images passed to Tesseract'),
+    'upload_bytes': Counter('pdf_upload_bytes_total', 'Bytes of request bodies carrying uploads'),
+    'response_bytes': Counter('pdf_response_bytes_total', 'Bytes of encoded API response bodies')
+}
+
+# Every metric, in /metrics order
+METRICS = [
+    stage_seconds, request_seconds, *COUNTERS.values(), admission_in_flight, admission_in_flight_cost,
+    admission_queue_depth, admission_admitted, admission_rejected, admission_wait_seconds
+]
+
+
+class StageRecorder:
+    """Stage durations and counts of one unit of work"""
+
+    __slots__ = ('started', 'stages', 'counts')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name, amount):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, stages, counts):
+        for stage, seconds in stages.items():
+            self.add(stage, seconds)
+        for name, amount in counts.items():
+            self.count(name, amount)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class _TimedStage:
+    __slots__ = ('recorder', 'stage', 'start')
+
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def timed_stage(stage):
+    """Context manager adding the time spent in its block to `stage` of the current recorder"""
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return _NULL_STAGE
+    return _TimedStage(recorder, stage)
+
+
+def count(name, amount=1):
+    """Add to one of the COUNTERS, through the current recorder when there is one"""
+    if not METRICS_ENABLED:
+        return
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.count(name, amount)
+    else:
+        COUNTERS[name].inc(amount)
+
+
+def start_recording():
+    """Start recording a unit of work in the current context; None when metrics are disabled"""
+    if not METRICS_ENABLED:
+        return None
+    recorder = StageRecorder()
+    _current_recorder.set(recorder)
+    return recorder
+
+
+def finish_recording(recorder):
+    """Stop recording and observe the stage totals and counts of `recorder`"""
+    if recorder is None:
+        return
+    if _current_recorder.get() is recorder:
+        _current_recorder.set(None)
+    for stage, seconds in recorder.stages.items():
+        stage_seconds.observe(seconds, stage)
+    for name, amount in recorder.counts.items():
+        COUNTERS[name].inc(amount)
+
+
+@contextmanager
+def recording():
+    """Record the block as one unit of work"""
+    recorder = start_recording()
+    try:
+        yield recorder
+    finally:
+        finish_recording(recorder)
+
+
+def recorded_call(func, *args, **kwargs):
+    """
+    Process pool entry point: run `func` under its own recorder
+
+    Returns (result, (stages, counts)) for merge_recorded; the recording is
+    None when metrics are disabled.
+    """
+    if not METRICS_ENABLED:
+        return func(*args, **kwargs), None
+
+    recorder = StageRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        _current_recorder.reset(token)
+    return result, (recorder.stages, recorder.counts)
+
+
+def merge_recorded(outcome):
+    """Merge a recorded_call outcome into the current recorder and return its result"""
+    result, recorded = outcome
+    if recorded is not None:
+        stages, counts = recorded
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            recorder.merge(stages, counts)
+        else:
+            for name, amount in counts.items():
+                COUNTERS[name].inc(amount)
+    return result
+
+
+def server_timing(recorder):
+    """Server-Timing header value of a recorder's stages so far, plus the total"""
+    entries = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in recorder.stages.items()]
+    entries.append(f'total;dur={recorder.elapsed() * 1000:.1f}')
+    return ', '.join(entries)
+
+
+# Snapshots of exited processes, folded together
+ARCHIVE_SNAPSHOT = 'archived.json'
+
+# Set in processes that write snapshots and read the other processes' ones
+_snapshot_pid = None
+
+
+def pid_alive(pid):
+    """Whether a process with this pid is still running on this host"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_snapshot():
+    """Every metric of this process, by name"""
+    return {metric.name: metric.snapshot() for metric in METRICS}
+
+
+def _write_json(path, data):
+    partial = path.with_name(f'.{path.name}.tmp')
+    partial.write_text(json.dumps(data))
+    os.replace(partial, path)
+
+
+def _read_snapshot(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        # Removed by another process since it was listed, or not a snapshot
+        return None
+
+
+@contextmanager
+def _snapshot_lock():
+    """Serialize folding snapshots into the archive across processes"""
+    with open(METRICS_FOLDER / '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _archive_snapshots(paths):
+    """Fold process snapshots into the archive and remove them; gauges are dropped. Call under _snapshot_lock"""
+    archive_path = METRICS_FOLDER / ARCHIVE_SNAPSHOT
+    archive = _read_snapshot(archive_path) or {}
+    for path in paths:
+        snapshot = _read_snapshot(path)
+        if snapshot is None:
+            continue
+        for metric in METRICS:
+            if metric.metric_type != 'gauge' and metric.name in snapshot:
+                combined = _combine(metric._add, [archive.get(metric.name, []), snapshot[metric.name]])
+                archive[metric.name] = [[list(labels), value] for labels, value in combined]
+        _write_json(archive_path, archive)
+        path.unlink()
+
+
+def _other_snapshots():
+    """
+    Snapshots of the other server processes, as (all, recent)
+
+    `all` has the archive and every process's snapshot, for counters and
+    histograms; `recent` only those written within three flush intervals,
+    for gauges. Snapshots of exited processes are archived first.
+    """
+    paths = [path for path in METRICS_FOLDER.glob('*.json')
+             if path.name != ARCHIVE_SNAPSHOT and path.stem != str(_snapshot_pid)]
+    exited = [path for path in paths if path.stem.isdigit() and not pid_alive(int(path.stem))]
+    if exited and fcntl is not None:
+        with _snapshot_lock():
+            _archive_snapshots(exited)
+
+    snapshots, recent = [], []
+    for path in [METRICS_FOLDER / ARCHIVE_SNAPSHOT] + [path for path in paths if path not in exited]:
+        try:
+            written = path.stat().st_mtime
+        except OSError:
+            continue
+        snapshot = _read_snapshot(path)
+        if snapshot is None:
+            continue
+        snapshots.append(snapshot)
+        if path.name != ARCHIVE_SNAPSHOT and time.time() - written <= 3 * METRICS_FLUSH_INTERVAL:
+            recent.append(snapshot)
+    return snapshots, recent
+
+
+def start_snapshot_writer(interval=METRICS_FLUSH_INTERVAL):
+    """
+    Share this process's metrics through METRICS_FOLDER, writing a snapshot every `interval` seconds
+
+    Once started, render_prometheus() also reports the other processes'
+    metrics. Called once per server process; does nothing with metrics
+    disabled.
+    """
+    global _snapshot_pid
+    if not METRICS_ENABLED:
+        return None
+    METRICS_FOLDER.mkdir(exist_ok=True)
+    _snapshot_pid = os.getpid()
+    own_path = METRICS_FOLDER / f'{_snapshot_pid}.json'
+    if own_path.exists() and fcntl is not None:
+        # Left by an exited process that had the same pid
+        with _snapshot_lock():
+            _archive_snapshots([own_path])
+
+    def write():
+        while True:
+            try:
+                _write_json(own_path, process_snapshot())
+            except OSError as e:
+                print(f"Warning: Could not write the metrics snapshot: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=write, name='metrics-writer', daemon=True)
+    thread.start()
+    return thread
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format, across server processes when shared"""
+    snapshots, recent = _other_snapshots() if _snapshot_pid == os.getpid() else ([], [])
+    lines = []
+    for metric in METRICS:
+        shared = recent if metric.metric_type == 'gauge' else snapshots
+        lines.extend(metric.render([snapshot[metric.name] for snapshot in shared if metric.name in snapshot]))
+    return '\n'.join(lines) + '\n'
@@ -1,109 +1,366 @@
 """
 OCR analysis service module
 Handles OCR text extraction from PDF images
+
+`pdf_path` arguments accept a filesystem path or an open, seekable binary
+buffer such as a spooled upload.
 """
-import pdfplumber
+import hashlib
+import io
+import time
+from collections import deque
+from contextlib import ExitStack
 
+try:
+    # Try relative imports first (when run as part of the package)
+    from .parallel_service import get_executor, shareable_path, pool_task, in_pool_worker, POOL_WORKERS
+    from .file_service import open_pdf
+    from .metrics_service import timed_stage, count, merge_recorded
+    from .memory_service import check_memory_budget, MemoryBudgetExceeded
+    from .deadline_service import (
+        lay_out_page, deadline_passed, current_deadline, page_time_left, PageCoverage, PageLimitReached
+    )
+    from ..config import OCR_DPI, OCR_MIN_TEXT_CHARS, OCR_IMAGE_COVERAGE
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.parallel_service import get_executor, shareable_path, pool_task, in_pool_worker, POOL_WORKERS
+    from services.file_service import open_pdf
+    from services.metrics_service import timed_stage, count, merge_recorded
+    from services.memory_service import check_memory_budget, MemoryBudgetExceeded
+    from services.deadline_service import (
+        lay_out_page, deadline_passed, current_deadline, page_time_left, PageCoverage, PageLimitReached
+    )
+    from config import OCR_DPI, OCR_MIN_TEXT_CHARS, OCR_IMAGE_COVERAGE
 
-def extract_text_from_images_ocr_simple(pdf_path):
-    """
-    Simpler OCR function that extracts text from PDF pages treated as images
-    """
+OCR_MISSING_ERROR = 'OCR functionality requires pytesseract and PIL packages'
+
+# Pages the selective OCR plans ahead of the page it yields, per OCR worker
+OCR_PAGES_AHEAD_PER_WORKER = 4
+
+# Settings that change the selective OCR output; part of its cache key
+OCR_SETTINGS = {
+    'mode': 'selective',
+    'dpi': OCR_DPI,
+    'min_text_chars': OCR_MIN_TEXT_CHARS,
+    'image_coverage': OCR_IMAGE_COVERAGE
+}
+
+# Settings that change the full-page OCR output; part of its cache key
+FULL_OCR_SETTINGS = {
+    'mode': 'full',
+    'resolution': 300
+}
+
+# Settings that change the per-image OCR output; part of its cache key
+IMAGE_OCR_SETTINGS = {
+    'mode': 'images',
+    'dpi': OCR_DPI
+}
+
+
+def ocr_available():
+    """Whether the optional OCR packages can be imported"""
     try:
         import pytesseract
         from PIL import Image
     except ImportError:
-        return {
-            'error': 'OCR functionality requires pytesseract and PIL packages',
-            'ocr_results': []
-        }
+        return False
+    return True
 
-    ocr_results = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_number, page in enumerate(pdf.pages, start=1):
+
+def _render_page(page, dpi):
+    """PIL image of a whole page rendered at `dpi`"""
+    with timed_stage('render'):
+        return page.to_image(resolution=dpi).original
+
+
+def _image_to_string(image, page_started):
+    """
+    Run Tesseract on a PIL image of a page started at `page_started`
+
+    Tesseract is stopped when the page's time is up (see page_time_left),
+    raising PageLimitReached.
+    """
+    import pytesseract
+
+    time_left, reason = page_time_left(page_started)
+    if time_left is not None and time_left <= 0:
+        raise PageLimitReached(reason)
+
+    count('ocr_images')
+    with timed_stage('tesseract'):
+        try:
+            return pytesseract.image_to_string(image, timeout=time_left or 0)
+        except RuntimeError as e:
+            # pytesseract kills Tesseract and raises this when the timeout expires
+            if time_left is not None and 'timeout' in str(e).lower():
+                raise PageLimitReached(reason) from None
+            raise
+
+
+def _skip_rest(coverage, pages, reason='deadline'):
+    for page in pages:
+        coverage.page_skipped(page.page_number, reason)
+
+
+def iter_text_from_images_ocr_simple(pdf_path, progress=None, pages=None, coverage=None):
+    """
+    Yield the OCR result of each page as soon as it is recognised
+
+    `pages` limits OCR to those 1-based page numbers. Pages are recorded in
+    the PageCoverage `coverage`: a page whose OCR outruns PAGE_MAX_SECONDS
+    is skipped, and once the deadline has passed so are the remaining pages.
+    Requires pytesseract and PIL; check with ocr_available() first.
+    """
+    coverage = coverage if coverage is not None else PageCoverage()
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        for page_index, page in enumerate(pdf.pages):
+            page_number = page.page_number
+            if deadline_passed():
+                _skip_rest(coverage, pdf.pages[page_index:])
+                return
             try:
                 # Convert the page to an image
-                page_image = page.to_image(resolution=300)
-                pil_image = page_image.original
+                started = time.time()
+                pil_image = _render_page(page, FULL_OCR_SETTINGS['resolution'])
                 
                 # Perform OCR on the page image
-                text = pytesseract.image_to_string(pil_image)
-                
-                ocr_results.append({
-                    'page': page_number,
-                    'extracted_text': text.strip()
-                })
+                text = _image_to_string(pil_image, started)
+            except PageLimitReached as e:
+                coverage.page_skipped(page_number, e.reason)
             except Exception as e:
                 print(f"Error performing OCR on page {page_number}: {e}")
-                continue
-    
+                coverage.page_skipped(page_number, 'error')
+            else:
+                coverage.page_done(page_number)
+                yield {
+                    'page': page_number,
+                    'extracted_text': text.strip()
+                }
+            finally:
+                # Release the rendered image and layout objects of the page
+                page.close()
+                if progress:
+                    progress(page_index + 1, len(pdf.pages))
+            check_memory_budget()
+
+
+def extract_text_from_images_ocr_simple(pdf_path, progress=None, pages=None):
+    """
+    Simpler OCR function that extracts text from PDF pages treated as images
+
+    `progress(pages_done, page_count)` is called as pages are completed.
+    """
+    if not ocr_available():
+        return {
+            'error': OCR_MISSING_ERROR,
+            'ocr_results': []
+        }
+
+    coverage = PageCoverage()
     return {
-        'ocr_results': ocr_results
+        'ocr_results': list(iter_text_from_images_ocr_simple(pdf_path, progress, pages, coverage)),
+        'coverage': coverage.summary()
     }
 
 
-def extract_text_from_images_ocr(pdf_path, output_file=None):
+# Filters whose decoded output is an encoded image file PIL can open directly
+ENCODED_IMAGE_FILTERS = {'DCTDecode', 'JPXDecode'}
+
+
+def image_stream_hash(stream):
+    """Identify an image XObject by its raw stream bytes and decoding attributes"""
+    from pdfminer.pdftypes import resolve1
+
+    digest = hashlib.sha256()
+    for attribute in ('Width', 'Height', 'BitsPerComponent', 'ColorSpace', 'Filter', 'DecodeParms', 'ImageMask'):
+        digest.update(f"{attribute}={resolve1(stream.get(attribute))!r};".encode('utf-8'))
+    digest.update(stream.get_rawdata() or b'')
+    return digest.hexdigest()
+
+
+def _colorspace_mode(colorspace):
+    """PIL mode and palette for a PDF image color space, or (None, None) if unsupported"""
+    from pdfminer.pdftypes import PDFStream, resolve1
+    from pdfminer.psparser import literal_name
+
+    colorspace = resolve1(colorspace)
+    if isinstance(colorspace, list) and colorspace:
+        family = literal_name(resolve1(colorspace[0]))
+        if family == 'ICCBased' and len(colorspace) > 1:
+            components = resolve1(resolve1(colorspace[1]).get('N', 3))
+            return {1: 'L', 3: 'RGB', 4: 'CMYK'}.get(components), None
+        if family == 'Indexed' and len(colorspace) == 4:
+            base_mode, _ = _colorspace_mode(colorspace[1])
+            lookup = resolve1(colorspace[3])
+            if isinstance(lookup, PDFStream):
+                lookup = lookup.get_data()
+            if base_mode in ('L', 'RGB') and isinstance(lookup, bytes):
+                if base_mode == 'L':
+                    lookup = bytes(value for gray in lookup for value in (gray, gray, gray))
+                return 'P', lookup
+            return None, None
+        return _colorspace_mode(colorspace[0]) if len(colorspace) == 1 else (None, None)
+
+    name = literal_name(colorspace) if colorspace is not None else 'DeviceGray'
+    return {
+        'DeviceGray': 'L', 'CalGray': 'L', 'G': 'L',
+        'DeviceRGB': 'RGB', 'CalRGB': 'RGB', 'RGB': 'RGB',
+        'DeviceCMYK': 'CMYK', 'CMYK': 'CMYK'
+    }.get(name), None
+
+
+def decode_image_stream(image):
+    """
+    Decode a pdfplumber image object from its XObject stream at its own pixel size
+
+    Returns a PIL image, or None when the encoding is not supported.
+    """
+    from PIL import Image
+    from pdfminer.psparser import literal_name
+
+    stream = image['stream']
+    filters = [literal_name(name) for name, _ in stream.get_filters()]
+    data = stream.get_data()
+
+    if filters and filters[-1] in ENCODED_IMAGE_FILTERS:
+        return Image.open(io.BytesIO(data))
+
+    width, height = image['srcsize']
+    bits = image.get('bits') or 8
+    if image.get('imagemask') or bits == 1:
+        return Image.frombytes('1', (width, height), data)
+    if bits != 8:
+        return None
+
+    mode, palette = _colorspace_mode(stream.get('ColorSpace'))
+    if mode is None:
+        return None
+
+    decoded = Image.frombytes(mode, (width, height), data)
+    if palette:
+        decoded.putpalette(palette)
+    return decoded
+
+
+def _crop_from_page_render(page_render, image, dpi):
+    """Fallback for undecodable images: crop the image's box out of a page render"""
+    scale = dpi / 72
+    x0, top = max(image['x0'], 0), max(image['top'], 0)
+    return page_render.crop((int(x0 * scale), int(top * scale), int(image['x1'] * scale), int(image['bottom'] * scale)))
+
+
+def extract_text_from_images_ocr(pdf_path, output_file=None, progress=None, dpi=OCR_DPI, pages=None):
     """
     Extract text from images within PDF using OCR (app3.py functionality)
+
+    Image XObjects are decoded from their own streams rather than by
+    rendering the page, and identical images (logos, letterheads) are
+    recognised by image_stream_hash() and OCR'd once. Pages without images
+    are rendered and OCR'd whole, as before. `pages` limits OCR to those
+    1-based page numbers. Pages are found and OCR'd within the page limits
+    and the deadline; `coverage` reports which were cut short.
     """
-    try:
-        import pytesseract
-        from PIL import Image
-    except ImportError:
+    if not ocr_available():
         return {
-            'error': 'OCR functionality requires pytesseract and PIL packages',
+            'error': OCR_MISSING_ERROR,
             'ocr_results': []
         }
 
     ocr_results = []
+    texts_by_hash = {}
+    hashes_by_objid = {}
+    coverage = PageCoverage()
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_number, page in enumerate(pdf.pages, start=1):
+    with open_pdf(pdf_path, pages=pages) as pdf:
+        for page_index, page in enumerate(pdf.pages):
+            page_number = page.page_number
+            if deadline_passed():
+                _skip_rest(coverage, pdf.pages[page_index:])
+                break
+            started = time.time()
+            with timed_stage('chars'):
+                layout_truncated = lay_out_page(page)
+            stopped = None
             page_images = []
+            page_render = None
             
-            # Extract images from the page
-            for obj_type, objs in page.objects.items():
-                if obj_type == 'image':
-                    for obj_idx, obj in enumerate(objs):
-                        try:
-                            # Extract the image
-                            # Convert the PDF page to an image with high resolution for better OCR
-                            page_image = page.to_image(resolution=300)
-                            
-                            # Use a different approach to extract the specific image object
-                            # Save the specific image object to a temporary buffer
-                            img = Image.from_dict(obj)
-                            # Perform OCR on the image
-                            text = pytesseract.image_to_string(img)
-                            
-                            page_images.append({
-                                'page': page_number,
-                                'image_index': obj_idx,
-                                'extracted_text': text.strip()
-                            })
-                        except Exception as e:
-                            print(f"Error processing image object: {e}")
-                            continue
+            for obj_idx, obj in enumerate(page.images):
+                try:
+                    stream = obj['stream']
+                    if stream.objid is not None and stream.objid in hashes_by_objid:
+                        image_hash = hashes_by_objid[stream.objid]
+                    else:
+                        image_hash = image_stream_hash(stream)
+                        hashes_by_objid[stream.objid] = image_hash
+
+                    reused = image_hash in texts_by_hash
+                    source = 'stream'
+                    if not reused:
+                        with timed_stage('image_decode'):
+                            try:
+                                img = decode_image_stream(obj)
+                            except (ValueError, OSError) as e:
+                                # e.g. short or still-encoded data, or no JPEG 2000 support in PIL
+                                print(f"Could not decode image {obj_idx} on page {page_number}: {e}")
+                                img = None
+                        if img is None:
+                            # Render the page once for all of its undecodable images
+                            if page_render is None:
+                                page_render = _render_page(page, dpi)
+                            img = _crop_from_page_render(page_render, obj, dpi)
+                            source = 'page_render'
+                        texts_by_hash[image_hash] = _image_to_string(img, started).strip()
+                    
+                    page_images.append({
+                        'page': page_number,
+                        'image_index': obj_idx,
+                        'image_hash': image_hash,
+                        'width': obj['srcsize'][0],
+                        'height': obj['srcsize'][1],
+                        'decoded_from': 'cache' if reused else source,
+                        'extracted_text': texts_by_hash[image_hash]
+                    })
+                except PageLimitReached as e:
+                    stopped = e.reason
+                    break
+                except Exception as e:
+                    print(f"Error processing image object: {e}")
+                    continue
             
-            # Alternative approach: Extract all images using pdfplumber's .to_image() method
-            # This approach handles images differently
-            if not page_images:
+            # Pages without usable images are rendered and OCR'd whole
+            rendered_whole = False
+            if not page_images and not stopped:
                 try:
-                    # Extract using the page image approach
-                    pil_image = page.to_image(resolution=300).original
-                    text = pytesseract.image_to_string(pil_image)
+                    pil_image = _render_page(page, dpi)
+                    text = _image_to_string(pil_image, started)
                     
                     page_images.append({
                         'page': page_number,
                         'image_index': 0,
+                        'decoded_from': 'page_render',
                         'extracted_text': text.strip()
                     })
+                    rendered_whole = True
+                except PageLimitReached as e:
+                    stopped = e.reason
                 except Exception as e:
                     print(f"Error in alternative OCR approach: {e}")
-                    continue
             
+            # A page rendered whole was OCR'd in full, whatever its layout missed
+            truncated = stopped or (None if rendered_whole else layout_truncated)
+            if page_images:
+                coverage.page_done(page_number, truncated)
+            else:
+                coverage.page_skipped(page_number, truncated or 'error')
+            
+            page.close()
+            if page_render is not None:
+                page_render.close()
+            check_memory_budget()
             ocr_results.extend(page_images)
+            if progress:
+                progress(page_index + 1, len(pdf.pages))
     
     # If output file is specified, write results to it
     if output_file:
@@ -113,5 +370,238 @@ def extract_text_from_images_ocr(pdf_path, output_file=None):
                 f.write(f"Extracted text: {result['extracted_text']}\n")
     
     return {
-        'ocr_results': ocr_results
-    }
\ No newline at end of file
+        'ocr_results': ocr_results,
+        'unique_images': len(texts_by_hash),
+        'image_references': sum(1 for result in ocr_results if 'image_hash' in result),
+        'coverage': coverage.summary()
+    }
+
+
+def image_coverage(page):
+    """Fraction of the page area covered by images, capped at 1.0"""
+    page_area = float(page.width * page.height)
+    if page_area <= 0:
+        return 0.0
+
+    covered = 0.0
+    for image in page.images:
+        width = min(image['x1'], page.bbox[2]) - max(image['x0'], page.bbox[0])
+        height = min(image['bottom'], page.bbox[3]) - max(image['top'], page.bbox[1])
+        if width > 0 and height > 0:
+            covered += width * height
+
+    return min(covered / page_area, 1.0)
+
+
+def plan_page(page):
+    """
+    Decide whether a page needs OCR
+
+    A page is sent to OCR when its text layer has fewer than
+    OCR_MIN_TEXT_CHARS characters or images cover at least OCR_IMAGE_COVERAGE
+    of it; every other page is served from its text layer.
+    """
+    with timed_stage('chars'):
+        char_count = len(page.chars)
+    coverage = image_coverage(page)
+
+    if char_count < OCR_MIN_TEXT_CHARS:
+        reason = 'no_text_layer'
+    elif coverage >= OCR_IMAGE_COVERAGE:
+        reason = 'image_heavy'
+    else:
+        reason = None
+
+    return {
+        'page': page.page_number,
+        'char_count': char_count,
+        'image_coverage': round(coverage, 3),
+        'ocr': reason is not None,
+        'reason': reason or 'text_layer'
+    }
+
+
+def plan_ocr(pdf):
+    """Decide which pages of an open document need OCR (see plan_page)"""
+    return [plan_page(page) for page in pdf.pages]
+
+
+def _text_layer(page):
+    """Text of a page's text layer, or None if it cannot be extracted"""
+    try:
+        with timed_stage('aggregation'):
+            return (page.extract_text() or '').strip()
+    except Exception as e:
+        print(f"Error extracting text from page {page.page_number}: {e}")
+        return None
+
+
+def _ocr_page(page, dpi):
+    """Render one page and run Tesseract on it, within the page limits and the deadline"""
+    started = time.time()
+    pil_image = _render_page(page, dpi)
+    try:
+        return _image_to_string(pil_image, started).strip()
+    finally:
+        pil_image.close()
+
+
+def _try_ocr_page(page, dpi):
+    """(text, None) of an OCR'd page, or (None, reason) if it was skipped"""
+    if deadline_passed():
+        return None, 'deadline'
+    try:
+        return _ocr_page(page, dpi), None
+    except PageLimitReached as e:
+        return None, e.reason
+    except Exception as e:
+        print(f"Error performing OCR on page {page.page_number}: {e}")
+        return None, 'error'
+
+
+def _ocr_page_group(pdf_path, page_numbers, dpi):
+    """Process pool worker: OCR the given pages, returning {page: (text, skip reason)} (see _try_ocr_page)"""
+    results = {}
+    with open_pdf(pdf_path, pages=page_numbers) as pdf:
+        for page in pdf.pages:
+            try:
+                results[page.page_number] = _try_ocr_page(page, dpi)
+            finally:
+                page.close()
+            check_memory_budget()
+    return results
+
+
+def _finish_planned_page(item, coverage):
+    """Record a page planned by iter_text_selective_ocr in `coverage`; returns its result, or None if skipped"""
+    entry = item['entry']
+    page_number = entry['page']
+    text, skipped = item['text'], item['skipped']
+    if item['future'] is not None:
+        try:
+            text, skipped = merge_recorded(item['future'].result())[page_number]
+        except MemoryBudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"Error extracting text from page {page_number}: {e}")
+            text, skipped = None, None
+
+    if text is None:
+        coverage.page_skipped(page_number, skipped or 'error')
+        return None
+
+    coverage.page_done(page_number, item['truncated'])
+    result = {
+        'page': page_number,
+        'source': 'ocr' if entry['ocr'] else 'text_layer',
+        'reason': entry['reason'],
+        'extracted_text': text
+    }
+    if item['truncated']:
+        result['truncated'] = item['truncated']
+    return result
+
+
+def iter_text_selective_ocr(pdf_path, progress=None, dpi=OCR_DPI, pages=None, coverage=None):
+    """
+    Yield the text of each page, running OCR only where plan_page() asks for it
+
+    Pages are planned one at a time. A page that needs no OCR is served from
+    its text layer, and a page selected for OCR is submitted to the 'ocr'
+    process pool as soon as it is planned. Results are yielded in page order
+    as soon as they are ready, each with its `source` ('ocr' or
+    'text_layer'). Planning stays at most OCR_PAGES_AHEAD_PER_WORKER pages
+    per worker ahead of the page being yielded, which bounds both the OCR in
+    flight and the text held for pages waiting on it. `pages` limits the
+    work to those 1-based page numbers.
+
+    Pages are laid out and OCR'd within the page limits and the deadline and
+    recorded in the PageCoverage `coverage`; a text layer cut short carries a
+    `truncated` reason, and pages not analyzed in time are skipped. Requires
+    pytesseract and PIL.
+    """
+    coverage = coverage if coverage is not None else PageCoverage()
+    with open_pdf(pdf_path, pages=pages) as pdf, ExitStack() as resources:
+        page_count = len(pdf.pages)
+        workers = 1 if in_pool_worker() else min(POOL_WORKERS['ocr'], page_count)
+        max_pending = max(1, workers * OCR_PAGES_AHEAD_PER_WORKER)
+        shared_path = None
+        pending = deque()
+        finished = 0
+
+        def ready():
+            # The oldest planned page can be yielded, or planning is as far ahead as it may get
+            future = pending[0]['future']
+            return future is None or future.done() or len(pending) >= max_pending
+
+        try:
+            for page_index, page in enumerate(pdf.pages):
+                if deadline_passed():
+                    _skip_rest(coverage, pdf.pages[page_index:])
+                    break
+
+                try:
+                    with timed_stage('chars'):
+                        truncated = lay_out_page(page)
+                    entry = plan_page(page)
+                    item = {'entry': entry, 'text': None, 'skipped': None, 'truncated': None, 'future': None}
+                    if not entry['ocr']:
+                        item['text'], item['truncated'] = _text_layer(page), truncated
+                    elif workers > 1:
+                        if shared_path is None:
+                            shared_path = resources.enter_context(shareable_path(pdf_path))
+                        item['future'] = get_executor('ocr').submit(
+                            pool_task, _ocr_page_group, shared_path, [entry['page']], dpi,
+                            deadline=current_deadline()
+                        )
+                    else:
+                        item['text'], item['skipped'] = _try_ocr_page(page, dpi)
+                finally:
+                    page.close()
+                check_memory_budget()
+                pending.append(item)
+
+                while pending and ready():
+                    result = _finish_planned_page(pending.popleft(), coverage)
+                    finished += 1
+                    if result is not None:
+                        yield result
+                    if progress:
+                        progress(finished, page_count)
+
+            while pending:
+                result = _finish_planned_page(pending.popleft(), coverage)
+                finished += 1
+                if result is not None:
+                    yield result
+                if progress:
+                    progress(finished, page_count)
+        finally:
+            # Pages not started yet are dropped when the consumer stops early
+            for item in pending:
+                if item['future'] is not None:
+                    item['future'].cancel()
+
+
+def extract_text_selective_ocr(pdf_path, progress=None, dpi=OCR_DPI, pages=None):
+    """
+    Extract the text of every page, using OCR only for scanned or image-heavy pages
+
+    `pages` limits the work to those 1-based page numbers.
+    `progress(pages_done, page_count)` is called as pages are completed.
+    """
+    if not ocr_available():
+        return {
+            'error': OCR_MISSING_ERROR,
+            'ocr_results': []
+        }
+
+    coverage = PageCoverage()
+    ocr_results = list(iter_text_selective_ocr(pdf_path, progress, dpi, pages, coverage))
+    return {
+        'ocr_results': ocr_results,
+        'ocr_pages': [result['page'] for result in ocr_results if result['source'] == 'ocr'],
+        'text_layer_pages': [result['page'] for result in ocr_results if result['source'] == 'text_layer'],
+        'dpi': dpi,
+        'coverage': coverage.summary()
+    }
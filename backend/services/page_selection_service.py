@@ -0,0 +1,104 @@
+"""
+Page selection service module
+Handles the `pages` and `sample` parameters that limit an analysis to some pages
+"""
+try:
+    # Try relative imports first (when run as part of the package)
+    from .file_service import open_binary
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.file_service import open_binary
+
+
+def parse_page_ranges(spec):
+    """
+    Parse a 1-based page range list such as "1-3,7,10-"
+
+    Returns [first, last] pairs, where last is None for an open-ended range.
+    Raises ValueError for anything else.
+    """
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        first, dash, last = part.partition('-')
+        if not first.strip().isdigit() or (last.strip() and not last.strip().isdigit()):
+            raise ValueError(f"invalid page range '{part}'")
+
+        first = int(first)
+        last = (int(last) if last.strip() else None) if dash else first
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"invalid page range '{part}'")
+        ranges.append([first, last])
+    return ranges
+
+
+def parse_page_selection(pages=None, sample=None):
+    """
+    Validate the `pages` and `sample` request parameters
+
+    Returns None when neither is given, otherwise a JSON-serializable
+    selection for select_pages() that is also part of the cache key.
+    """
+    if not pages and not sample:
+        return None
+
+    selection = {'pages': None, 'sample': None}
+    if pages:
+        selection['pages'] = parse_page_ranges(pages)
+    if sample:
+        if not sample.isdigit() or int(sample) < 1:
+            raise ValueError('sample must be a positive number of pages')
+        selection['sample'] = int(sample)
+    return selection
+
+
+def document_page_count(pdf_source):
+    """Number of pages of a PDF, read from its page tree without parsing any page"""
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import resolve1
+
+    with open_binary(pdf_source) as pdf_file:
+        document = PDFDocument(PDFParser(pdf_file))
+        try:
+            return int(resolve1(resolve1(document.catalog['Pages'])['Count']))
+        except (KeyError, TypeError, ValueError):
+            # Missing or broken /Count: walk the page tree instead
+            return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def select_pages(selection, page_count):
+    """
+    Resolve a selection to sorted 1-based page numbers of a `page_count` page document
+
+    Ranges are clipped to the document. `sample` then keeps that many evenly
+    spaced pages of the result, always including the first and the last.
+    """
+    if selection['pages'] is None:
+        pages = list(range(1, page_count + 1))
+    else:
+        pages = sorted({
+            page
+            for first, last in selection['pages']
+            for page in range(first, min(last or page_count, page_count) + 1)
+        })
+
+    sample = selection['sample']
+    if sample is not None and sample < len(pages):
+        if sample == 1:
+            pages = pages[:1]
+        else:
+            step = (len(pages) - 1) / (sample - 1)
+            pages = [pages[round(index * step)] for index in range(sample)]
+    return pages
+
+
+def page_selection_summary(pages, page_count):
+    """Describe which pages an analysis covered, for the response"""
+    return {
+        'pages': pages,
+        'pages_analyzed': len(pages),
+        'page_count': page_count,
+        'partial': len(pages) < page_count
+    }
@@ -0,0 +1,138 @@
+"""
+Page-parallel execution service module
+Splits a document's page range into chunks and runs them on a process pool
+"""
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .file_service import is_file_path, open_binary, cleanup_file
+    from .metrics_service import recorded_call, merge_recorded
+    from .memory_service import memory_budget
+    from .deadline_service import deadline_at, current_deadline
+    from ..config import PARALLEL_WORKERS, PARALLEL_PAGE_THRESHOLD, OCR_WORKERS, UPLOAD_FOLDER
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.file_service import is_file_path, open_binary, cleanup_file
+    from services.metrics_service import recorded_call, merge_recorded
+    from services.memory_service import memory_budget
+    from services.deadline_service import deadline_at, current_deadline
+    from config import PARALLEL_WORKERS, PARALLEL_PAGE_THRESHOLD, OCR_WORKERS, UPLOAD_FOLDER
+
+# Worker count of each named process pool
+POOL_WORKERS = {
+    'pages': PARALLEL_WORKERS,
+    'ocr': OCR_WORKERS
+}
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+# Set in pool worker processes so work running there does not start pools of its own
+_in_pool_worker = False
+
+
+def _mark_pool_worker():
+    global _in_pool_worker
+    _in_pool_worker = True
+
+
+def get_executor(pool='pages'):
+    """Return the shared process pool of that name, creating it on first use"""
+    with _executor_lock:
+        if pool not in _executors:
+            _executors[pool] = ProcessPoolExecutor(max_workers=POOL_WORKERS[pool], initializer=_mark_pool_worker)
+        return _executors[pool]
+
+
+def pool_task(func, *args, deadline=None, **kwargs):
+    """
+    Process pool entry point: run `func` within the memory budget, recording its stage timings
+
+    `deadline` is the submitting analysis's current_deadline(), which `func`
+    runs under. Returns a recorded_call outcome; unwrap it with
+    merge_recorded in the submitting process.
+    """
+    with memory_budget(), deadline_at(deadline):
+        return recorded_call(func, *args, **kwargs)
+
+
+def in_pool_worker():
+    """Whether this process is a pool worker, which must not start pools of its own"""
+    return _in_pool_worker
+
+
+def should_parallelize(page_count):
+    """Whether a document is large enough to be worth splitting across processes"""
+    return not _in_pool_worker and PARALLEL_WORKERS > 1 and page_count >= PARALLEL_PAGE_THRESHOLD
+
+
+@contextmanager
+def shareable_path(pdf_source):
+    """
+    Yield a path that pool workers can open for a PDF path or buffer
+
+    Buffers are written to a temporary file in UPLOAD_FOLDER for the duration
+    of the block; this is the only case where an in-memory upload touches disk.
+    """
+    if is_file_path(pdf_source):
+        yield pdf_source
+        return
+
+    fd, filepath = tempfile.mkstemp(suffix='.pdf', dir=UPLOAD_FOLDER)
+    try:
+        with os.fdopen(fd, 'wb') as f, open_binary(pdf_source) as source:
+            shutil.copyfileobj(source, f)
+        yield filepath
+    finally:
+        cleanup_file(filepath)
+
+
+def page_chunks(page_count, chunk_count):
+    """Split pages [0, page_count) into `chunk_count` contiguous (start, stop) ranges"""
+    chunk_count = max(1, min(chunk_count, page_count))
+    size, remainder = divmod(page_count, chunk_count)
+
+    chunks = []
+    start = 0
+    for index in range(chunk_count):
+        stop = start + size + (1 if index < remainder else 0)
+        chunks.append((start, stop))
+        start = stop
+    return chunks
+
+
+def map_page_chunks(worker, pdf_source, page_count, progress=None, pages=None):
+    """
+    Run `worker(pdf_path, start, stop, pages)` over the page range on the process pool
+
+    `pages` is the page selection the document was opened with, if any, and
+    start/stop index into it.
+
+    Returns the chunk results in page order, whatever order the workers finish
+    in, so callers can merge them deterministically. `progress(pages_done,
+    page_count)` is called as each chunk is collected. Each chunk has its own
+    memory budget and the caller's deadline, and the stage timings recorded
+    in the workers are merged into the caller's recorder.
+    """
+    executor = get_executor()
+    chunks = page_chunks(page_count, PARALLEL_WORKERS)
+    results = []
+
+    with shareable_path(pdf_source) as pdf_path:
+        deadline = current_deadline()
+        futures = [
+            executor.submit(pool_task, worker, pdf_path, start, stop, pages, deadline=deadline)
+            for start, stop in chunks
+        ]
+        for (_, stop), future in zip(chunks, futures):
+            results.append(merge_recorded(future.result()))
+            if progress:
+                progress(stop, page_count)
+
+    return results
@@ -0,0 +1,152 @@
+"""
+Region index service module
+Handles "which font is at this point" queries on the text runs of stored documents
+
+The text runs of each page (see extract_text_runs) are placed in a uniform
+grid of REGION_GRID_CELL-point cells, each cell listing the runs whose
+bounding box overlaps it. A point or rectangle query only looks at the runs
+in the cells it covers, however much text the page holds.
+
+The runs of a document are kept in the result cache under its id, so any
+server process can build the grids without laying the document out again.
+The grids of the most recently queried documents are kept in memory.
+"""
+import threading
+from collections import OrderedDict
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .font_service import extract_text_runs
+    from .cache_service import result_cache, cache_key
+    from .metrics_service import timed_stage
+    from .admission_service import admitted
+    from ..config import REGION_GRID_CELL, REGION_INDEX_DOCUMENTS
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_service import extract_text_runs
+    from services.cache_service import result_cache, cache_key
+    from services.metrics_service import timed_stage
+    from services.admission_service import admitted
+    from config import REGION_GRID_CELL, REGION_INDEX_DOCUMENTS
+
+
+class PageRegionIndex:
+    """Uniform grid over the text run bounding boxes of one page"""
+
+    def __init__(self, spans, cell=REGION_GRID_CELL):
+        self.spans = spans
+        self.cell = cell
+        self._cells = {}
+
+        for index, span in enumerate(spans):
+            x0, top, x1, bottom = span['bbox']
+            for column in range(self._cell(x0), self._cell(x1) + 1):
+                for row in range(self._cell(top), self._cell(bottom) + 1):
+                    self._cells.setdefault((column, row), []).append(index)
+
+        columns = [column for column, _ in self._cells] or [0]
+        rows = [row for _, row in self._cells] or [0]
+        self._extent = (min(columns), min(rows), max(columns), max(rows))
+
+    def _cell(self, value):
+        return int(value // self.cell)
+
+    def query(self, x0, top, x1, bottom):
+        """Runs whose bounding box intersects the rectangle, in page order; a point has x0 == x1 and top == bottom"""
+        min_column, min_row, max_column, max_row = self._extent
+        found = set()
+
+        # The rectangle is clipped to the cells holding runs, however large it is
+        for column in range(max(self._cell(x0), min_column), min(self._cell(x1), max_column) + 1):
+            for row in range(max(self._cell(top), min_row), min(self._cell(bottom), max_row) + 1):
+                for index in self._cells.get((column, row), ()):
+                    if index in found:
+                        continue
+                    span_x0, span_top, span_x1, span_bottom = self.spans[index]['bbox']
+                    if span_x0 <= x1 and x0 <= span_x1 and span_top <= bottom and top <= span_bottom:
+                        found.add(index)
+
+        return [self.spans[index] for index in sorted(found)]
+
+
+class DocumentRegionIndex:
+    """Region indexes of the pages of one document, each built on its first query"""
+
+    def __init__(self, pages):
+        self.pages = {page['page']: page for page in pages}
+        self._grids = {}
+
+    def summary(self):
+        """Size and run count of every page"""
+        return [
+            {'page': number, 'width': page['width'], 'height': page['height'], 'span_count': len(page['spans'])}
+            for number, page in self.pages.items()
+        ]
+
+    def page(self, page_number):
+        """(page record, PageRegionIndex) of a page, or None if the document has no such page"""
+        page = self.pages.get(page_number)
+        if page is None:
+            return None
+
+        grid = self._grids.get(page_number)
+        if grid is None:
+            # Concurrent first queries may both build the grid; either result is kept
+            grid = self._grids[page_number] = PageRegionIndex(page['spans'])
+        return page, grid
+
+
+class RegionIndexCache:
+    """In-memory LRU of document region indexes, backed by the text runs in the result cache"""
+
+    def __init__(self, max_documents):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, document_id, pdf_path=None):
+        """
+        Region index of a document, or None if it is neither cached nor given by `pdf_path`
+
+        The text runs are read from the result cache, or extracted from
+        `pdf_path` and cached there when missing, which goes through admission
+        control and may raise AdmissionRejected.
+        """
+        with self._lock:
+            index = self._documents.get(document_id)
+            if index is not None:
+                self._documents.move_to_end(document_id)
+                return index
+
+        key = cache_key(document_id, 'regions')
+        with timed_stage('cache'):
+            pages = result_cache.get(key)
+        if pages is None:
+            if pdf_path is None:
+                return None
+            with admitted('regions', pdf_path):
+                pages = extract_text_runs(pdf_path)
+            with timed_stage('cache'):
+                result_cache.put(key, pages)
+
+        index = DocumentRegionIndex(pages)
+        with self._lock:
+            self._documents[document_id] = index
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return index
+
+
+region_indexes = RegionIndexCache(REGION_INDEX_DOCUMENTS)
+
+
+def summarize_fonts(spans):
+    """Distinct (font, size) pairs of some runs, in order of first appearance, with their run counts"""
+    fonts = {}
+    for span in spans:
+        key = (span['font'], span['size'])
+        if key not in fonts:
+            fonts[key] = {'font': span['font'], 'size': span['size'], 'span_count': 0}
+        fonts[key]['span_count'] += 1
+    return list(fonts.values())
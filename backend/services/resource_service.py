@@ -0,0 +1,276 @@
+"""
+Font resource service module
+Handles resolving and describing the /Font resources of PDF pages
+"""
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .font_program_service import resolve_font_program, program_summary, embedded_program
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_program_service import resolve_font_program, program_summary, embedded_program
+
+
+def describe_font(font_name, font_obj):
+    """Describe one /Font resource entry (subtype, basefont)"""
+    from pdfminer.pdftypes import PDFObjRef, resolve1
+
+    resolved_font_obj = resolve1(font_obj)
+    font_subtype = resolve1(resolved_font_obj.get('Subtype', 'Unknown')) if hasattr(resolved_font_obj, 'get') else 'Unknown'
+    font_basefont = resolve1(resolved_font_obj.get('BaseFont', 'Unknown')) if hasattr(resolved_font_obj, 'get') else 'Unknown'
+
+    return {
+        'name': str(font_name),
+        'subtype': str(font_subtype),
+        'basefont': str(font_basefont),
+        'object_id': font_obj.objid if isinstance(font_obj, PDFObjRef) else None
+    }
+
+
+def describe_font_resources(resources):
+    """
+    Describe the /Font entries of a page resource dictionary (subtype, basefont)
+    """
+    from pdfminer.pdftypes import resolve1
+
+    if not resources or 'Font' not in resources:
+        return []
+
+    font_resources = resolve1(resources['Font'])
+    return [describe_font(font_name, font_obj) for font_name, font_obj in font_resources.items()]
+
+
+def _font_key(font):
+    """Identify a described font by its object id, or by its description if it is inline"""
+    if font['object_id'] is not None:
+        return ('obj', font['object_id'])
+    return ('inline', font['name'], font['subtype'], font['basefont'])
+
+
+class FontResourceIndex:
+    """
+    Unique fonts of a document with the pages that reference them
+
+    Font dictionaries are resolved, described and identified once per
+    indirect object id, and a /Font resource dictionary shared by many pages
+    is walked only once. Embedded font programs are looked up in the font
+    program store (see resolve_font_program) before being identified.
+    """
+
+    def __init__(self):
+        self._fonts = {}
+        # /Font dictionaries already walked: object id (or id() of the inline
+        # dict, kept alive alongside) -> keys of the fonts it names
+        self._font_dicts = {}
+
+    def _record(self, font, font_obj, page_number, rsrcmgr):
+        from pdfminer.pdftypes import resolve1
+
+        key = _font_key(font)
+        entry = self._fonts.get(key)
+        if entry is None:
+            program, identified_as = resolve_font_program(resolve1(font_obj), rsrcmgr, font['object_id'])
+            entry = self._fonts[key] = dict(
+                font, font_program=program_summary(program) if program else None,
+                identified_as=identified_as, pages=[]
+            )
+        if not entry['pages'] or entry['pages'][-1] != page_number:
+            entry['pages'].append(page_number)
+        return key
+
+    def add_page(self, resources, page_number, rsrcmgr=None):
+        """
+        Record the fonts referenced by one page's resources
+
+        Returns the page's font descriptions (without the page lists). Fonts
+        are identified through `rsrcmgr`, the document's pdfminer resource
+        manager, when given, so page layout reuses the fonts loaded here.
+        """
+        from pdfminer.pdftypes import PDFObjRef, resolve1
+
+        if not resources or 'Font' not in resources:
+            return []
+
+        font_dict = resources['Font']
+        dict_key = ('obj', font_dict.objid) if isinstance(font_dict, PDFObjRef) else ('inline', id(font_dict))
+
+        cached = self._font_dicts.get(dict_key)
+        if cached is None:
+            font_resources = resolve1(font_dict)
+            keys = [
+                self._record(describe_font(font_name, font_obj), font_obj, page_number, rsrcmgr)
+                for font_name, font_obj in font_resources.items()
+            ]
+            self._font_dicts[dict_key] = (font_dict, keys)
+        else:
+            keys = cached[1]
+            for key in keys:
+                pages = self._fonts[key]['pages']
+                if pages[-1] != page_number:
+                    pages.append(page_number)
+
+        return [
+            {field: value for field, value in self._fonts[key].items() if field != 'pages'}
+            for key in keys
+        ]
+
+    def merge(self, entries):
+        """Fold the entries of a later page range (see entries()) into this index"""
+        for font in entries:
+            key = _font_key(font)
+            entry = self._fonts.get(key)
+            if entry is None:
+                self._fonts[key] = dict(font, pages=list(font['pages']))
+            else:
+                entry['pages'].extend(page for page in font['pages'] if page > entry['pages'][-1])
+
+    def entries(self):
+        """Unique fonts in order of first reference, each with its `pages`"""
+        return [dict(entry, pages=list(entry['pages'])) for entry in self._fonts.values()]
+
+
+def describe_encoding(font_spec):
+    """
+    The /Encoding of a resolved font dictionary: its name, the BaseEncoding of
+    a differences dictionary, or the CMap name of an embedded CMap; None if absent
+    """
+    from pdfminer.pdftypes import PDFStream, resolve1
+    from pdfminer.psparser import PSLiteral
+
+    encoding = resolve1(font_spec.get('Encoding'))
+    if encoding is None:
+        return None
+    if isinstance(encoding, PSLiteral):
+        return str(encoding)
+    if isinstance(encoding, PDFStream):
+        cmap_name = resolve1(encoding.get('CMapName'))
+        return str(cmap_name) if cmap_name is not None else 'Embedded CMap'
+    if isinstance(encoding, dict):
+        base_encoding = resolve1(encoding.get('BaseEncoding'))
+        return str(base_encoding) if base_encoding is not None else 'Custom'
+    return None
+
+
+def _is_type3(font_spec):
+    from pdfminer.pdftypes import resolve1
+    from pdfminer.psparser import PSLiteral
+
+    subtype = resolve1(font_spec.get('Subtype'))
+    return isinstance(subtype, PSLiteral) and subtype.name == 'Type3'
+
+
+def iter_page_resources(document):
+    """
+    Resource dictionary of each page of a pdfminer document, in page order
+
+    Walks the page tree as PDFPage.create_pages does, with resources
+    inherited from parent nodes, but reads nothing else of a page: its
+    content streams are not even located. Falls back to PDFPage when the
+    tree yields no pages.
+    """
+    from pdfminer.pdftypes import PDFObjRef, resolve1
+    from pdfminer.pdfpage import PDFPage
+
+    found = False
+    stack = [(document.catalog.get('Pages'), None)]
+    visited = set()
+    while stack:
+        node, inherited = stack.pop()
+        if isinstance(node, PDFObjRef):
+            # A page tree that refers back to one of its nodes is only walked once
+            if node.objid in visited:
+                continue
+            visited.add(node.objid)
+        node = resolve1(node)
+        if not isinstance(node, dict):
+            continue
+
+        resources = node.get('Resources', inherited)
+        if 'Kids' in node:
+            stack.extend((kid, resources) for kid in reversed(resolve1(node['Kids']) or []))
+        else:
+            found = True
+            yield resources
+
+    if not found:
+        for page in PDFPage.create_pages(document):
+            yield page.resources
+
+
+class FontResourceWalker:
+    """
+    Unique fonts reachable from page resources, with the pages that reference them
+
+    Fonts are found through the /Font entries of page resources and, nested
+    to any depth, of Form XObjects and Type3 fonts. Only the object layer is
+    read: content streams are never interpreted, so fonts named in a
+    resource dictionary count as referenced even if no text uses them. Each
+    resource dictionary is walked once however many pages share it.
+    """
+
+    def __init__(self):
+        self._fonts = {}
+        # Resource dictionaries already walked: id() -> (dictionary, kept
+        # alive alongside, keys of the fonts reachable from it)
+        self._walked = {}
+
+    def _record(self, font_name, font_obj):
+        from pdfminer.pdftypes import resolve1
+
+        font = describe_font(font_name, font_obj)
+        key = _font_key(font)
+        if key not in self._fonts:
+            spec = resolve1(font_obj)
+            if not hasattr(spec, 'get'):
+                spec = {}
+            self._fonts[key] = dict(
+                font, encoding=describe_encoding(spec),
+                embedded=_is_type3(spec) or embedded_program(spec) is not None, pages=[]
+            )
+        return key
+
+    def _walk(self, resources):
+        """Keys of the fonts reachable from a resource dictionary"""
+        from pdfminer.pdftypes import PDFStream, resolve1
+        from pdfminer.psparser import PSLiteral
+
+        resources = resolve1(resources)
+        if not isinstance(resources, dict):
+            return []
+        walked = self._walked.get(id(resources))
+        if walked is not None:
+            return walked[1]
+
+        keys = []
+        # Recorded before descending, so resources that refer back to themselves end the walk
+        self._walked[id(resources)] = (resources, keys)
+
+        fonts = resolve1(resources.get('Font'))
+        if isinstance(fonts, dict):
+            for font_name, font_obj in fonts.items():
+                keys.append(self._record(font_name, font_obj))
+                spec = resolve1(font_obj)
+                if hasattr(spec, 'get') and _is_type3(spec):
+                    keys.extend(self._walk(spec.get('Resources')))
+
+        xobjects = resolve1(resources.get('XObject'))
+        if isinstance(xobjects, dict):
+            for xobject in xobjects.values():
+                xobject = resolve1(xobject)
+                subtype = resolve1(xobject.get('Subtype')) if isinstance(xobject, PDFStream) else None
+                if isinstance(subtype, PSLiteral) and subtype.name == 'Form':
+                    keys.extend(self._walk(xobject.get('Resources')))
+
+        keys[:] = dict.fromkeys(keys)
+        return keys
+
+    def add_page(self, resources, page_number):
+        """Record the fonts reachable from one page's resources"""
+        for key in self._walk(resources):
+            pages = self._fonts[key]['pages']
+            if not pages or pages[-1] != page_number:
+                pages.append(page_number)
+
+    def entries(self):
+        """Unique fonts in order of first reference, each with its `pages`"""
+        return [dict(entry, pages=list(entry['pages'])) for entry in self._fonts.values()]
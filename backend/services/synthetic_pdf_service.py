@@ -0,0 +1,140 @@
+"""
+Synthetic PDF service module
+Handles generating deterministic PDF documents without any PDF library
+
+Used by the server warm-up and the benchmark suite (benchmarks/synthetic_pdf.py
+writes one from the command line).
+"""
+import random
+import zlib
+
+BASE_FONTS = [
+    'Helvetica', 'Times-Roman', 'Courier', 'Helvetica-Bold', 'Times-Bold', 'Courier-Oblique',
+    'Helvetica-Oblique', 'Times-Italic', 'Courier-Bold', 'Times-BoldItalic', 'Helvetica-BoldOblique', 'Symbol'
+]
+FONT_SIZES = [8, 9, 10, 12, 14, 18]
+TEXT_ALPHABET = 'abcdefghijklmnopqrstuvwxyz      '
+CHARS_PER_LINE = 80
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+
+
+def _image_stream(width, height, seed):
+    """A Flate-compressed 8-bit grayscale gradient image XObject"""
+    data = bytes(((x * 7 + y * 3 + seed) % 256) for y in range(height) for x in range(width))
+    compressed = zlib.compress(data)
+    header = (
+        f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+        f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(compressed)} >>\nstream\n"
+    ).encode()
+    return header + compressed + b"\nendstream"
+
+
+def build_pdf(pages=10, chars_per_page=1500, fonts=4, shared_resources=True,
+              images_per_page=0, image_size=(120, 90), shared_images=True, seed=0):
+    """
+    Build a PDF document and return its bytes
+
+    - `fonts` standard Type1 fonts are used at random sizes, one font and size
+      per line of text.
+    - `shared_resources` points every page at one resource dictionary (as long
+      as the images are shared too); otherwise each page gets its own inline
+      /Font dictionary naming the same fonts.
+    - `images_per_page` grayscale images of `image_size` pixels are drawn on
+      each page. They are the same image objects on every page when
+      `shared_images`, otherwise new objects per page.
+    - `chars_per_page=0` gives image-only pages, like a scanned document.
+
+    The same arguments always produce the same bytes.
+    """
+    rnd = random.Random(seed)
+    objects = []
+
+    def add(data):
+        objects.append(data)
+        return len(objects)
+
+    font_ids = [
+        add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{BASE_FONTS[index % len(BASE_FONTS)]} >>".encode())
+        for index in range(fonts)
+    ]
+    font_dict = "<< " + " ".join(f"/F{index} {font_id} 0 R" for index, font_id in enumerate(font_ids)) + " >>"
+
+    def image_objects(page_index):
+        return [
+            add(_image_stream(image_size[0], image_size[1], seed=index if shared_images else page_index * 31 + index))
+            for index in range(images_per_page)
+        ]
+
+    shared_image_ids = image_objects(0) if shared_images else None
+
+    def resources(image_ids):
+        xobjects = ""
+        if image_ids:
+            xobjects = " /XObject << " + " ".join(f"/Im{index} {oid} 0 R" for index, oid in enumerate(image_ids)) + " >>"
+        return f"<< /Font {font_dict}{xobjects} >>"
+
+    shared_resources_id = add(resources(shared_image_ids).encode()) if shared_resources else None
+
+    pages_id = add(None)
+    kids = []
+    for page_index in range(pages):
+        image_ids = shared_image_ids if shared_images else image_objects(page_index)
+
+        operators = []
+        for index in range(len(image_ids)):
+            width = PAGE_WIDTH // max(len(image_ids), 1)
+            operators.append(f"q {width} 0 0 {width * 3 // 4} {index * width} 20 cm /Im{index} Do Q")
+
+        if chars_per_page:
+            operators.append("BT")
+            written = 0
+            y = PAGE_HEIGHT - 12
+            while written < chars_per_page:
+                count = min(CHARS_PER_LINE, chars_per_page - written)
+                text = ''.join(rnd.choice(TEXT_ALPHABET) for _ in range(count))
+                operators.append(
+                    f"/F{rnd.randrange(fonts)} {rnd.choice(FONT_SIZES)} Tf 1 0 0 1 30 {y} Tm ({text}) Tj"
+                )
+                written += count
+                y = y - 10 if y > 30 else PAGE_HEIGHT - 12
+            operators.append("ET")
+
+        content = "\n".join(operators).encode()
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+        if shared_resources and shared_images:
+            page_resources = f"{shared_resources_id} 0 R"
+        else:
+            page_resources = resources(image_ids)
+        kids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources {page_resources} /Contents {content_id} 0 R >>".encode()
+        ))
+
+    objects[pages_id - 1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+    )
+    catalog_id = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode())
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, data in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + data + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode()
+    return bytes(out)
+
+
+def write_pdf(path, **spec):
+    """Write build_pdf(**spec) to `path`"""
+    with open(path, 'wb') as f:
+        f.write(build_pdf(**spec))
+    return path
@@ -0,0 +1,88 @@
+"""
+Warm-up service module
+Handles loading the PDF libraries and running each analysis once before a server takes traffic
+"""
+import io
+import shutil
+import time
+
+try:
+    # Try relative imports first (when run as part of the package)
+    from .font_service import (
+        extract_fonts_basic, list_fonts, extract_fonts_from_pdf, extract_fonts_advanced, extract_text_with_fonts,
+        extract_text_columns
+    )
+    from .ocr_service import ocr_available, extract_text_selective_ocr, extract_text_from_images_ocr
+    from .metrics_service import recorded_call
+    from .synthetic_pdf_service import build_pdf
+except ImportError:
+    # Fall back to absolute imports (when run directly)
+    from services.font_service import (
+        extract_fonts_basic, list_fonts, extract_fonts_from_pdf, extract_fonts_advanced, extract_text_with_fonts,
+        extract_text_columns
+    )
+    from services.ocr_service import ocr_available, extract_text_selective_ocr, extract_text_from_images_ocr
+    from services.metrics_service import recorded_call
+    from services.synthetic_pdf_service import build_pdf
+
+
+def preload_libraries():
+    """Import the PDF, imaging and OCR libraries that the analyses import on first use"""
+    import pdfplumber
+    import pdfminer.high_level
+    import pdfminer.pdffont
+    import pypdfium2
+
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        return
+    # Register every image format plugin now rather than on the first decode
+    Image.init()
+
+
+def _analyses():
+    """(name, function) of each analysis to warm up"""
+    analyses = [
+        ('basic', extract_fonts_basic),
+        ('list', list_fonts),
+        ('detailed', extract_fonts_from_pdf),
+        ('advanced', extract_fonts_advanced),
+        ('spans', lambda pdf_source: extract_fonts_advanced(pdf_source, spans=True)),
+        ('text', extract_text_with_fonts),
+        ('text_columns', extract_text_columns)
+    ]
+    if ocr_available() and shutil.which('tesseract'):
+        analyses += [
+            ('ocr_selective', extract_text_selective_ocr),
+            ('ocr_images', extract_text_from_images_ocr)
+        ]
+    return analyses
+
+
+def warm_up():
+    """
+    Preload the libraries and run a one-page generated PDF through each analysis
+
+    The page has text in several standard fonts and an image covering most
+    of it, so font metrics, layout, image decoding, page rendering and
+    Tesseract are all exercised. One page keeps every analysis in-process:
+    no process pool is started. Stage timings and counters are discarded.
+
+    Returns the seconds each analysis took. A failing analysis is reported
+    and skipped so the server still starts.
+    """
+    preload_libraries()
+    pdf_bytes = build_pdf(pages=1, chars_per_page=400, fonts=4, images_per_page=1, image_size=(48, 36))
+
+    timings = {}
+    for name, analyze in _analyses():
+        start = time.perf_counter()
+        try:
+            recorded_call(analyze, io.BytesIO(pdf_bytes))
+        except Exception as e:
+            print(f"Warm-up of the {name} analysis failed: {e}")
+            continue
+        timings[name] = round(time.perf_counter() - start, 3)
+    return timings
@@ -0,0 +1,30 @@
+"""
+Production WSGI entry point
+Loads the app and the PDF libraries and warms each analysis up before serving
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (see gunicorn.conf.py) this module is imported once in the
+gunicorn master, so the libraries and everything the warm-up loaded are shared
+copy-on-write with the forked workers instead of being loaded by each one.
+"""
+import gc
+import logging
+import time
+
+from app import app
+from config import WARM_UP
+from services.warmup_service import warm_up
+
+logger = logging.getLogger(__name__)
+
+if WARM_UP:
+    start = time.perf_counter()
+    timings = warm_up()
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s: {timings}")
+
+# Keep the loaded objects out of the workers' garbage collections, which would
+# otherwise touch (and so copy) the pages shared with the master
+gc.collect()
+gc.freeze()
@@ -98,7 +98,7 @@ function App() {
       const formData = new FormData();
       formData.append('pdf_file', pdfFile);
 
-      const response = await axios.post(`${API_BASE_URL}/api/fonts/advanced`, formData, {
+      const response = await axios.post(`${API_BASE_URL}/api/fonts/advanced?format=spans`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data'
         },
@@ -1,6 +1,6 @@
 import React from 'react';
 import { Card, Alert, Table, ListGroup } from 'react-bootstrap';
-import { formatColor } from '../utils/helpers';
+import { formatColor, pageFontEntries } from '../utils/helpers';
 import { FiFileText, FiInfo, FiBarChart2, FiType, FiAlertTriangle, FiCheckCircle, FiXCircle } from 'react-icons/fi';
 import styles from './ResultsDisplay.module.css';
 
@@ -163,15 +163,15 @@ const ResultsDisplay = ({ analysisResult }) => {
                   <FiType className="me-2" style={{ color: 'var(--accent-primary)' }} />
                   Fonts by Page
                 </h6>
-                {Object.entries(analysisResult.font_analysis.by_page).map(([pageKey, pageInfo]) => (
+                {Object.entries(analysisResult.font_analysis.by_page).map(([pageKey, pageInfo]) => [pageKey, pageInfo, pageFontEntries(pageInfo)]).map(([pageKey, pageInfo, pageFonts]) => (
                   <div key={pageKey} className="mb-4 border rounded-3 p-3" style={{ backgroundColor: 'var(--bg-tertiary)', borderColor: 'var(--border)' }}>
                     <h6 className="d-flex align-items-center mb-3" style={{ color: 'var(--text-primary)' }}>
                       <FiType className="me-2" style={{ color: 'var(--accent-primary)' }} />
                       Page {pageKey.replace('page_', '')}
                     </h6>
-                    {pageInfo.fonts && pageInfo.fonts.length > 0 ? (
+                    {pageFonts.length > 0 ? (
                       <ListGroup className="mb-2" style={{ backgroundColor: 'var(--bg-tertiary)' }}>
-                        {pageInfo.fonts.slice(0, 10).map((font, idx) => (
+                        {pageFonts.slice(0, 10).map((font, idx) => (
                           <ListGroup.Item key={idx} className="d-flex justify-content-between align-items-center" style={{ backgroundColor: 'var(--bg-tertiary)', borderColor: 'var(--border)', color: 'var(--text-primary)' }}>
                             <div className="text-start" style={{ color: 'var(--text-primary)' }}>
                               {font.name} (Size: {font.size}, Color: {formatColor(font.color)})
@@ -182,12 +182,12 @@ const ResultsDisplay = ({ analysisResult }) => {
                             </div>
                           </ListGroup.Item>
                         ))}
-                        {pageInfo.fonts.length > 10 && (
+                        {pageFonts.length > 10 && (
                           <ListGroup.Item className="d-flex justify-content-between align-items-center" style={{ backgroundColor: 'var(--bg-tertiary)', borderColor: 'var(--border)', color: 'var(--text-secondary)' }}>
                             <div className="text-start" style={{ color: 'var(--text-secondary)' }}>
-                              ... and {pageInfo.fonts.length - 10} more fonts
+                              ... and {pageFonts.length - 10} more fonts
                             </div>
-                            <span className="badge" style={{ backgroundColor: 'var(--accent-secondary)', color: 'white' }}>{pageInfo.fonts.length - 10}+</span>
+                            <span className="badge" style={{ backgroundColor: 'var(--accent-secondary)', color: 'white' }}>{pageFonts.length - 10}+</span>
                           </ListGroup.Item>
                         )}
                       </ListGroup>
@@ -24,4 +24,12 @@ export const formatColor = (color) => {
     return color.join(',');
   }
   return color;
+};
+
+// Font entries of a page, from either per-position fonts or compact text runs
+export const pageFontEntries = (pageInfo) => {
+  if (Array.isArray(pageInfo.spans)) {
+    return pageInfo.spans.map((span) => ({ name: span.font, size: span.size, color: span.color }));
+  }
+  return pageInfo.fonts || [];
 };
\ No newline at end of file